@@ -12,17 +12,34 @@ import logging
 from collections import namedtuple
 
 from . import errors
+from .aio import AsyncBus
 from .bus import Bus
 from .errors import *
-from .remote import RemoteObject
+from .executor import HandlerExecutor
+from .peer import Peer, Server
+from .reconnect import ReconnectPolicy
+from .remote import RemoteObject, RemoteObjectManager
 from .router import MatchRule
+from .service import (ObjectServer, ServiceObject, dbus_method, dbus_property,
+                      dbus_signal)
 
 __all__ = [
     'Bus',
+    'AsyncBus',
+    'HandlerExecutor',
+    'Peer',
+    'Server',
+    'ReconnectPolicy',
     'MatchRule',
+    'ObjectServer',
+    'ServiceObject',
+    'dbus_method',
+    'dbus_signal',
+    'dbus_property',
     'Variant',
     'UnixFD',
     'RemoteObject',
+    'RemoteObjectManager',
 ] + errors.__all__
 
 logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -0,0 +1,473 @@
+"""Connection to message bus with :mod:`asyncio`."""
+
+import array
+import asyncio
+import inspect
+import logging
+import socket
+from contextlib import suppress
+
+from .address import Address
+from .const import DEFAULT_TIMEOUT_VALUE, MAX_MESSAGE_LEN, MIN_HEADER_SIZE
+from .errors import Error, DBusError, TransportError, TooLongError
+from .message import (HeaderFlag, Message, MessageType, get_sizes,
+                      method_call_message, method_return_message,
+                      error_message, signal_message)
+from .raw import RawReader
+from .router import Signals, Methods
+from .transports import check_for_known_transport, connect, MAX_RECV_UNIX_FDS
+
+__all__ = ['AsyncBus']
+
+_logger = logging.getLogger(__name__)
+
+
+class AsyncBus:
+    """Representation of a client's connection to a message bus for
+    :mod:`asyncio`.
+
+    This is the counterpart of :class:`~dcar.Bus`. All methods which
+    communicate with the message bus are coroutines and there are no
+    threads: the messages are sent and received in the event loop.
+    It can be used as an asynchronous context manager.
+
+    Handler functions for signals and methods can be coroutine functions;
+    they are run as tasks concurrently. Other handler functions are
+    called in the event loop directly and must not block.
+
+    :param address: same as for :class:`~dcar.address.Address` or an
+                    :class:`~dcar.address.Address` object
+    :type address: str or Address
+    :param bool compact_arrays: see :class:`~dcar.Bus`
+    """
+
+    def __init__(self, address='session', *, compact_arrays=False):
+        self._compact_arrays = compact_arrays
+        self._signals = Signals()
+        self._methods = Methods()
+        self._unique_name = None
+        if isinstance(address, str):
+            address = Address(address)
+        check_for_known_transport(address)
+        self._addr = address
+        self._address = None
+        self._sock = None
+        self._guid = None
+        self._unix_fds_enabled = False
+        self._connected = False
+        self._error = None
+        self._loop = None
+        self._send_lock = None
+        self._recv_task = None
+        self._replies = {}
+        self._tasks = set()
+
+    @property
+    def address(self):
+        """Return the actual address the client is connected to."""
+        return self._address
+
+    @property
+    def bus_type(self):
+        """Return the bus type: ``'system'``, ``'session'`` , or ``None``."""
+        return self._addr.bus_type
+
+    @property
+    def compact_arrays(self):
+        """Return whether arrays of fixed types are returned compact."""
+        return self._compact_arrays
+
+    @property
+    def connected(self):
+        """Return whether the client is connected."""
+        return self._connected
+
+    @property
+    def unique_name(self):
+        """Return the unique name of the client's connection."""
+        return self._unique_name
+
+    @property
+    def guid(self):
+        """Return the GUID of the server."""
+        return self._guid
+
+    @property
+    def unix_fds_enabled(self):
+        """Return whether passing of unix file descriptors is enabled."""
+        return self._unix_fds_enabled
+
+    @property
+    def error(self):
+        """Return transport error or ``None``.
+
+        See :attr:`dcar.Bus.error`.
+        """
+        if self._error:
+            if isinstance(self._error, TransportError):
+                ex = TransportError('connection lost')
+                ex.__traceback__ = self._error.__traceback__
+            else:
+                ex = TransportError('connection lost: %s' % self._error)
+                ex.__cause__ = self._error
+            return ex
+
+    def raise_on_error(self):
+        """Re-raises the :attr:`error` or does nothing."""
+        if self._error:
+            raise self.error
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.disconnect()
+        return False
+
+    async def connect(self):
+        """Connect to message bus.
+
+        Connecting and authentication are done in the default executor
+        of the event loop.
+
+        :raises ~dcar.AuthenticationError: if authentication failed
+        :raises OSError: if connection failed
+        """
+        if self._connected:
+            return
+        self._loop = asyncio.get_running_loop()
+        (self._sock, self._address, self._guid,
+         self._unix_fds_enabled) = await self._loop.run_in_executor(
+            None, _connect, self._addr)
+        self._sock.setblocking(False)
+        self._connected = True
+        self._error = None
+        self._send_lock = asyncio.Lock()
+        self._recv_task = self._loop.create_task(self._recv_loop())
+        reply = await self.method_call('/org/freedesktop/DBus',
+                                       'org.freedesktop.DBus',
+                                       'Hello',
+                                       'org.freedesktop.DBus')
+        self._unique_name = reply[0]
+
+    async def disconnect(self):
+        """Disconnect the client."""
+        if self._connected:
+            self._close()
+            with suppress(asyncio.CancelledError):
+                await self._recv_task
+
+    async def block(self, timeout=None):
+        """Wait until the connection is closed or timeout is reached.
+
+        :param float timeout: timeout value in seconds
+                              (``None`` means no timeout)
+        """
+        if self._recv_task:
+            await asyncio.wait({self._recv_task}, timeout=timeout)
+
+    async def send_message(self, msg, timeout=None):
+        """Send a message.
+
+        See :meth:`dcar.Bus.send_message`.
+        """
+        if not self._connected:
+            raise TransportError('not connected')
+        if timeout == 0.0:
+            msg.flags |= HeaderFlag.NO_REPLY_EXPECTED
+        if not msg.reply_expected:
+            await self._send(msg)
+            return None
+        fut = self._loop.create_future()
+        self._replies[msg.serial] = fut
+        try:
+            await self._send(msg)
+            reply = await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            raise TransportError('Timeout: %f secs.' % timeout) from None
+        finally:
+            self._replies.pop(msg.serial, None)
+        reply.raise_on_error()
+        return reply.body
+
+    async def method_call(self, object_path, interface, method_name,
+                          destination, *, sender=None, signature=None,
+                          args=(), timeout=DEFAULT_TIMEOUT_VALUE,
+                          no_auto_start=False,
+                          allow_interactive_authorization=False):
+        """Send a message of type METHOD_CALL.
+
+        See :meth:`dcar.Bus.method_call`.
+        """
+        msg = method_call_message(object_path, interface, method_name,
+                                  destination, sender, signature, args,
+                                  no_auto_start,
+                                  allow_interactive_authorization)
+        return await self.send_message(msg, timeout)
+
+    async def method_return(self, reply_serial, destination, *, sender=None,
+                            signature=None, args=()):
+        """Send a message of type METHOD_RETURN.
+
+        See :meth:`dcar.Bus.method_return`.
+        """
+        msg = method_return_message(reply_serial, destination, sender,
+                                    signature, args)
+        return await self.send_message(msg)
+
+    async def send_error(self, error_name, reply_serial, destination, *,
+                         sender=None, signature=None, args=()):
+        """Send a message of type ERROR.
+
+        See :meth:`dcar.Bus.send_error`.
+        """
+        msg = error_message(error_name, reply_serial, destination, sender,
+                            signature, args)
+        return await self.send_message(msg)
+
+    async def emit_signal(self, object_path, interface, signal_name,
+                          destination=None, *, sender=None, signature=None,
+                          args=()):
+        """Send a message of type SIGNAL.
+
+        See :meth:`dcar.Bus.emit_signal`.
+        """
+        msg = signal_message(object_path, interface, signal_name,
+                             destination, sender, signature, args)
+        return await self.send_message(msg)
+
+    async def register_signal(self, rule, handler, unicast=False,
+                              timeout=DEFAULT_TIMEOUT_VALUE):
+        """Register a signal.
+
+        See :meth:`dcar.Bus.register_signal`.
+        """
+        reg_id = self._signals.add(rule, handler, unicast)
+        if not unicast:
+            try:
+                await self.method_call('/org/freedesktop/DBus',
+                                       'org.freedesktop.DBus',
+                                       'AddMatch',
+                                       'org.freedesktop.DBus',
+                                       signature='s', args=(str(rule),),
+                                       timeout=timeout)
+            except Error:
+                self._signals.remove(reg_id)
+                raise
+        return reg_id
+
+    async def unregister_signal(self, reg_id, timeout=DEFAULT_TIMEOUT_VALUE):
+        """Unregister a signal.
+
+        See :meth:`dcar.Bus.unregister_signal`.
+        """
+        rule = self._signals.remove(reg_id)
+        if rule:
+            await self.method_call('/org/freedesktop/DBus',
+                                   'org.freedesktop.DBus',
+                                   'RemoveMatch',
+                                   'org.freedesktop.DBus',
+                                   signature='s', args=(str(rule),),
+                                   timeout=timeout)
+
+    def register_method(self, object_path, interface, method_name,
+                        handler, signature=None):
+        """Register a method.
+
+        The handler function must take two parameters:
+        an :class:`AsyncBus` object and
+        a :class:`~dcar.message.MessageInfo` object.
+
+        See :meth:`dcar.Bus.register_method`.
+        """
+        return self._methods.add((object_path, interface, method_name),
+                                 handler, signature)
+
+    def unregister_method(self, meth_id):
+        """Unregister a method.
+
+        :param int meth_id: ID returned by :meth:`register_method`
+        """
+        self._methods.remove(meth_id)
+
+    async def _send(self, msg):
+        buf, unix_fds = msg.to_buffer()
+        _logger.debug('\n-> %s', msg)
+        if unix_fds and not self._unix_fds_enabled:
+            raise TransportError('unix fds passing not supported')
+        async with self._send_lock:
+            try:
+                if unix_fds:
+                    await self._sendmsg(buf, unix_fds)
+                else:
+                    await self._loop.sock_sendall(self._sock, buf)
+            except OSError as ex:
+                self._close(ex)
+                raise self.error
+
+    async def _sendmsg(self, buf, unix_fds):
+        anc = [(socket.SOL_SOCKET, socket.SCM_RIGHTS,
+                array.array('i', unix_fds))]
+        while True:
+            try:
+                cnt = self._sock.sendmsg([buf], anc)
+                break
+            except (BlockingIOError, InterruptedError):
+                await self._wait(self._loop.add_writer,
+                                 self._loop.remove_writer)
+        if cnt < len(buf):
+            await self._loop.sock_sendall(self._sock,
+                                          memoryview(buf)[cnt:])
+
+    async def _wait(self, add, remove):
+        fut = self._loop.create_future()
+        fd = self._sock.fileno()
+        add(fd, _set_done, fut)
+        try:
+            await fut
+        finally:
+            remove(fd)
+
+    async def _recvmsg_into(self, view, ancbufsize):
+        while True:
+            try:
+                return self._sock.recvmsg_into([view], ancbufsize)
+            except (BlockingIOError, InterruptedError):
+                await self._wait(self._loop.add_reader,
+                                 self._loop.remove_reader)
+
+    async def _recv_into(self, view, unix_fds=False):
+        fds = array.array('i')
+        pos = 0
+        while pos < len(view):
+            if unix_fds and not pos:
+                cnt, anc, flags, _ = await self._recvmsg_into(
+                    view, socket.CMSG_SPACE(MAX_RECV_UNIX_FDS *
+                                            fds.itemsize))
+                if flags & socket.MSG_CTRUNC:
+                    raise TransportError('too many unix fds')
+                for cmsg_level, cmsg_type, cmsg_data in anc:
+                    if (cmsg_level == socket.SOL_SOCKET and
+                            cmsg_type == socket.SCM_RIGHTS):
+                        fds.frombytes(cmsg_data[:len(cmsg_data) -
+                                      (len(cmsg_data) % fds.itemsize)])
+            else:
+                cnt = await self._loop.sock_recv_into(self._sock, view[pos:])
+            if not cnt:
+                raise TransportError()
+            pos += cnt
+        return fds.tolist()
+
+    async def _recv_loop(self):
+        try:
+            while self._connected:
+                header = bytearray(MIN_HEADER_SIZE)
+                fds = await self._recv_into(memoryview(header),
+                                            self._unix_fds_enabled)
+                total_size, _ = get_sizes(RawReader(header))
+                if total_size > MAX_MESSAGE_LEN:
+                    raise TooLongError('message too long: %d bytes' %
+                                       total_size)
+                buf = bytearray(total_size)
+                buf[:MIN_HEADER_SIZE] = header
+                with memoryview(buf) as view:
+                    await self._recv_into(view[MIN_HEADER_SIZE:])
+                raw = RawReader(buf)
+                raw.compact_arrays = self._compact_arrays
+                if fds:
+                    raw.unix_fds = fds
+                self._incoming(Message.from_bytes(raw, lazy=True))
+        except asyncio.CancelledError:
+            raise
+        except Exception as ex:
+            if self._connected:
+                _logger.debug('recv loop', exc_info=True)
+                self._close(ex)
+        _logger.debug('EXIT recv loop')
+
+    def _incoming(self, msg):
+        _logger.debug('\n<- %s', msg)
+        if msg.message_type is MessageType.INVALID:
+            return  # ignore unknown message types
+        if msg.message_type in (MessageType.METHOD_RETURN, MessageType.ERROR):
+            fut = self._replies.get(msg.reply_serial)
+            if fut and not fut.done():
+                fut.set_result(msg)
+        elif msg.message_type is MessageType.METHOD_CALL:
+            try:
+                method = self._methods.find_handler(msg)
+                info = self._methods.handler_info(method, msg)
+                self._call_handler(method, info, self, info)
+            except DBusError as ex:
+                self._send_error(ex, msg.info.serial, msg.info.sender)
+        elif msg.message_type is MessageType.SIGNAL:
+            for handler in self._signals.matches(msg, self._unique_name):
+                self._call_handler(handler, msg.info, msg.info)
+
+    def _call_handler(self, handler, info, *args):
+        if inspect.iscoroutinefunction(handler):
+            self._create_task(self._run_handler(handler, info, *args))
+        else:
+            try:
+                handler(*args)
+            except Exception as ex:
+                self._handler_failed(ex, info)
+
+    async def _run_handler(self, handler, info, *args):
+        try:
+            await handler(*args)
+        except Exception as ex:
+            self._handler_failed(ex, info)
+
+    def _handler_failed(self, ex, info):
+        if isinstance(ex, DBusError) and not info.is_signal:
+            self._send_error(ex, info.serial, info.sender)
+        else:
+            _logger.error('handler failed', exc_info=ex)
+
+    def _send_error(self, ex, serial, destination):
+        self._create_task(self.send_error(ex.args[0], serial, destination,
+                                          signature='s', args=ex.args[1:]))
+
+    def _create_task(self, coro):
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            _logger.debug('task failed', exc_info=task.exception())
+
+    def _close(self, exc=None):
+        if not self._connected:
+            return
+        self._connected = False
+        if exc is not None:
+            self._error = exc
+        if self._recv_task is not asyncio.current_task():
+            self._recv_task.cancel()
+        with suppress(OSError):
+            self._sock.shutdown(socket.SHUT_RDWR)
+        self._sock.close()
+        error = self.error or TransportError('disconnected')
+        for fut in self._replies.values():
+            if not fut.done():
+                fut.set_exception(error)
+
+
+def _connect(addr):
+    transport, address = connect(addr, None)
+    try:
+        transport.authenticate()
+    except BaseException:
+        transport.detach().close()
+        raise
+    return (transport.detach(), address, transport.guid,
+            transport.unix_fds_enabled)
+
+
+def _set_done(fut):
+    if not fut.done():
+        fut.set_result(None)
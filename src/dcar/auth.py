@@ -6,6 +6,8 @@ Supported mechanisms:
 * DBUS_COOKIE_SHA1
 * ANONYMOUS
 
+The server side (:func:`accept`) supports EXTERNAL and ANONYMOUS.
+
 See: `Authentication Protocol
 <https://dbus.freedesktop.org/doc/dbus-specification.html#auth-protocol>`_
 """
@@ -14,13 +16,16 @@ import binascii
 import hashlib
 import os
 import secrets
+import socket
 import stat
+import struct
 
 from .errors import AuthenticationError
 
-_all_ = ['authenticate']
+_all_ = ['authenticate', 'accept']
 
 COOKIE_DIR = os.path.expanduser(b'~/.dbus-keyrings')
+MAX_LINE_LEN = 16384  #: max. length of a line received by :func:`accept`
 
 
 def _external(sock):
@@ -106,6 +111,92 @@ def authenticate(sock, unix_fds):
     raise AuthenticationError('unexpected reply: %r' % b' '.join(auth_reply))
 
 
+def accept(sock, guid, unix_fds, allow_anonymous=False):
+    """Authenticate a client (server side of the protocol).
+
+    A client is authenticated with EXTERNAL if its unix user ID is the
+    one of this process (the ID of the peer is checked if the socket
+    supports ``SO_PEERCRED``) and with ANONYMOUS if ``allow_anonymous``
+    is ``True``. Nothing after the ``BEGIN`` command is read from the
+    socket.
+
+    :param socket sock: a connected socket
+    :param str guid: the GUID of the server
+    :param bool unix_fds: whether the passing of unix file descriptors
+                          is possible
+    :param bool allow_anonymous: whether ANONYMOUS is accepted
+    :return: ``True`` if the client negotiated the passing of unix file
+             descriptors else ``False``
+    :rtype: bool
+    :raises ~dcar.AuthenticationError: if authentication failed
+    """
+    mechs = b'EXTERNAL ANONYMOUS' if allow_anonymous else b'EXTERNAL'
+    if sock.recv(1) != b'\0':
+        raise AuthenticationError('no NUL byte')
+    authenticated = False
+    agreed = False
+    while True:
+        line = _recv_line_exact(sock)
+        cmd = line[0] if line else b''
+        if cmd == b'AUTH' and not authenticated:
+            mech = line[1] if len(line) > 1 else None
+            if mech == b'EXTERNAL':
+                if len(line) > 2:
+                    data = line[2]
+                else:
+                    sock.sendall(b'DATA\r\n')
+                    reply = _recv_line_exact(sock)
+                    data = (reply[1] if reply[:1] == [b'DATA'] and
+                            len(reply) > 1 else None)
+                authenticated = _check_external(sock, data)
+            elif mech == b'ANONYMOUS':
+                authenticated = allow_anonymous
+            if authenticated:
+                sock.sendall(b'OK %b\r\n' % guid.encode())
+            else:
+                sock.sendall(b'REJECTED %b\r\n' % mechs)
+        elif cmd == b'NEGOTIATE_UNIX_FD' and authenticated:
+            agreed = unix_fds
+            sock.sendall(b'AGREE_UNIX_FD\r\n' if agreed else
+                         b'ERROR unix fd passing not supported\r\n')
+        elif cmd == b'BEGIN' and authenticated:
+            return agreed
+        elif cmd in (b'CANCEL', b'ERROR'):
+            authenticated = agreed = False
+            sock.sendall(b'REJECTED %b\r\n' % mechs)
+        else:
+            sock.sendall(b'ERROR unexpected command\r\n')
+
+
+def _check_external(sock, data):
+    uid = os.getuid()
+    if hasattr(socket, 'SO_PEERCRED') and sock.family == socket.AF_UNIX:
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED,
+                                struct.calcsize('3i'))
+        _, peer_uid, _ = struct.unpack('3i', creds)
+        if peer_uid != uid:
+            return False
+    if not data:  # the identity of the peer is used
+        return True
+    try:
+        return int(binascii.unhexlify(data)) == uid
+    except (binascii.Error, ValueError):
+        return False
+
+
+def _recv_line_exact(sock):
+    # reads byte by byte, so no data after the line is consumed
+    line = bytearray()
+    while not line.endswith(b'\r\n'):
+        b = sock.recv(1)
+        if not b:
+            raise AuthenticationError('connection closed')
+        line += b
+        if len(line) > MAX_LINE_LEN:
+            raise AuthenticationError('line too long')
+    return bytes(line).split()
+
+
 def _recv_line(sock):
     line = b''
     while True:
@@ -0,0 +1,284 @@
+"""Benchmarks for marshalling, messages, signal matching and method calls.
+
+Run with::
+
+    python -m dcar.bench [-r REPEAT] [PATTERN ...]
+
+Only benchmarks whose names contain one of the patterns are run. For each
+benchmark the best time of ``REPEAT`` runs per operation and the
+corresponding number of operations per second are printed.
+
+The end-to-end benchmarks call methods of a service on a
+:class:`~dcar.server.MessageBus` in the same process, so they measure
+dcar as client, message bus and service without a dbus-daemon.
+"""
+
+import argparse
+import sys
+import timeit
+
+from .bus import Bus
+from .marshal import compile_signature
+from .message import (Byteorder, Message, method_call_message,
+                      signal_message)
+from .raw import RawReader, RawWriter
+from .router import MatchRule, Signals
+from .server import MessageBus
+
+__all__ = ['BENCHMARKS', 'run']
+
+BENCHMARKS = {}  #: name -> function that returns (setup function, ops)
+
+
+def _benchmark(name):
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def _marshal_func(signature, data):
+    codec = compile_signature(signature, '<')
+
+    def marshal():
+        raw = RawWriter()
+        raw.byteorder = Byteorder.LITTLE
+        codec.marshal(raw, data)
+    return marshal
+
+
+def _unmarshal_func(signature, data, compact_arrays=False):
+    raw = RawWriter()
+    raw.byteorder = Byteorder.LITTLE
+    compile_signature(signature, '<').marshal(raw, data)
+    buf = raw.getvalue()
+    codec = compile_signature(signature, '<', compact_arrays)
+
+    def unmarshal():
+        reader = RawReader(buf)
+        reader.byteorder = Byteorder.LITTLE
+        codec.unmarshal(reader)
+    return unmarshal
+
+
+def _props(n):
+    return {'Prop%d' % i: [('s', 'value %d' % i), ('u', i), ('b', True),
+                           ('as', ['a', 'b', 'c']), ('d', i / 3)][i % 5]
+            for i in range(n)}
+
+
+_ASV = ('a{sv}', (_props(20),))
+_AY = ('ay', (bytes(2 ** 20),))
+_MANAGED_OBJECTS = ('a(oa{sa{sv}})', ([
+    ('/org/example/Object%d' % i,
+     {'org.example.Interface%d' % j: _props(5) for j in range(3)})
+    for i in range(50)],))
+
+
+@_benchmark('marshal a{sv} (20 entries)')
+def _bench_marshal_asv():
+    return _marshal_func(*_ASV), 1
+
+
+@_benchmark('unmarshal a{sv} (20 entries)')
+def _bench_unmarshal_asv():
+    return _unmarshal_func(*_ASV), 1
+
+
+@_benchmark('marshal ay (1 MB)')
+def _bench_marshal_ay():
+    return _marshal_func(*_AY), 1
+
+
+@_benchmark('unmarshal ay (1 MB)')
+def _bench_unmarshal_ay():
+    return _unmarshal_func(*_AY), 1
+
+
+@_benchmark('unmarshal ay (1 MB, compact_arrays)')
+def _bench_unmarshal_ay_compact():
+    return _unmarshal_func(*_AY, compact_arrays=True), 1
+
+
+@_benchmark('marshal a(oa{sa{sv}}) (50 objects)')
+def _bench_marshal_managed_objects():
+    return _marshal_func(*_MANAGED_OBJECTS), 1
+
+
+@_benchmark('unmarshal a(oa{sa{sv}}) (50 objects)')
+def _bench_unmarshal_managed_objects():
+    return _unmarshal_func(*_MANAGED_OBJECTS), 1
+
+
+def _call_message():
+    return method_call_message('/org/example/Object', 'org.example.Interface',
+                               'Method', 'org.example.Service', None,
+                               *_ASV, False, False)
+
+
+@_benchmark('Message.to_bytes (a{sv})')
+def _bench_to_bytes():
+    msg = _call_message()
+    return msg.to_bytes, 1
+
+
+@_benchmark('Message.from_bytes (a{sv})')
+def _bench_from_bytes():
+    buf, _ = _call_message().to_bytes()
+    return lambda: Message.from_bytes(RawReader(buf)), 1
+
+
+@_benchmark('Message.from_bytes (a{sv}, lazy)')
+def _bench_from_bytes_lazy():
+    buf, _ = _call_message().to_bytes()
+    return lambda: Message.from_bytes(RawReader(buf), lazy=True), 1
+
+
+def _signals_func(n):
+    signals = Signals()
+    for i in range(n):
+        rule = MatchRule(object_path='/org/example/Object%d' % i,
+                         interface='org.example.Interface',
+                         signal_name='Changed')
+        rule.add_arg(0, 'value')
+        signals.add(rule, lambda info: None, False)
+    signals.add(MatchRule(interface='org.example.Interface'),
+                lambda info: None, False)
+    buf, _ = signal_message('/org/example/Object%d' % (n // 2),
+                            'org.example.Interface', 'Changed', None, None,
+                            's', ('value',)).to_bytes()
+    msg = Message.from_bytes(RawReader(buf))
+
+    def matches():
+        for _ in signals.matches(msg, ':1.1'):
+            pass
+    return matches, 1
+
+
+@_benchmark('Signals.matches (10 rules)')
+def _bench_signals_10():
+    return _signals_func(10)
+
+
+@_benchmark('Signals.matches (1000 rules)')
+def _bench_signals_1k():
+    return _signals_func(1000)
+
+
+@_benchmark('Signals.matches (10000 rules)')
+def _bench_signals_10k():
+    return _signals_func(10000)
+
+
+def _echo(bus, info):
+    if info.member == 'GetAll':
+        signature, args = _ASV
+    else:
+        signature, args = 'u', info.args
+    bus.method_return(info.serial, info.sender, signature=signature,
+                      args=args)
+
+
+def _bus_func(func):
+    def bench():
+        message_bus = MessageBus()
+        message_bus.start()
+        _cleanups.append(message_bus.stop)
+        service = Bus(message_bus.address)
+        service.connect()
+        _cleanups.append(service.disconnect)
+        service.method_call('/org/freedesktop/DBus', 'org.freedesktop.DBus',
+                            'RequestName', 'org.freedesktop.DBus',
+                            signature='su', args=('org.example.Service', 0))
+        service.register_method('/org/example/Object',
+                                'org.example.Interface', 'Echo', _echo, 'u')
+        service.register_method('/org/example/Object',
+                                'org.freedesktop.DBus.Properties', 'GetAll',
+                                _echo, 's')
+        bus = Bus(message_bus.address)
+        bus.connect()
+        _cleanups.append(bus.disconnect)
+        return func(bus)
+    return bench
+
+
+_cleanups = []
+
+
+@_benchmark('Bus.method_call (latency)')
+@_bus_func
+def _bench_method_call(bus):
+    return (lambda: bus.method_call('/org/example/Object',
+                                    'org.example.Interface', 'Echo',
+                                    'org.example.Service',
+                                    signature='u', args=(1,))), 1
+
+
+@_benchmark('Bus.method_call (GetAll, a{sv} reply)')
+@_bus_func
+def _bench_method_call_asv(bus):
+    return (lambda: bus.method_call('/org/example/Object',
+                                    'org.freedesktop.DBus.Properties',
+                                    'GetAll', 'org.example.Service',
+                                    signature='s',
+                                    args=('org.example.Interface',))), 1
+
+
+@_benchmark('Bus.method_calls (throughput, 1000 calls)')
+@_bus_func
+def _bench_method_calls(bus):
+    calls = [('/org/example/Object', 'org.example.Interface', 'Echo',
+              'org.example.Service', 'u', (i,)) for i in range(1000)]
+    return (lambda: bus.method_calls(calls)), len(calls)
+
+
+def run(patterns=(), repeat=5, file=None):
+    """Run benchmarks and print the results.
+
+    :param patterns: run only benchmarks whose names contain any of
+                     these strings (all if empty)
+    :param int repeat: number of runs of each benchmark
+    :param file: file object for the output (default: :data:`sys.stdout`)
+    :returns: mapping of benchmark names to seconds per operation
+    :rtype: dict
+    """
+    file = file or sys.stdout
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if patterns and not any(p in name for p in patterns):
+            continue
+        try:
+            func, ops = setup()
+            timer = timeit.Timer(func)
+            number, _ = timer.autorange()
+            secs = min(timer.repeat(repeat, number)) / number / ops
+        finally:
+            while _cleanups:
+                _cleanups.pop()()
+        results[name] = secs
+        print('%-45s %12.2f us %12.0f ops/s' % (name, secs * 1e6, 1 / secs),
+              file=file)
+    return results
+
+
+def main():
+    """Entry point for ``python -m dcar.bench``."""
+    parser = argparse.ArgumentParser(prog='python -m dcar.bench',
+                                     description='Run the dcar benchmarks.')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='number of runs of each benchmark '
+                             '(default: %(default)s)')
+    parser.add_argument('-l', '--list', action='store_true',
+                        help='list the benchmarks and exit')
+    parser.add_argument('patterns', nargs='*', metavar='PATTERN',
+                        help='run only benchmarks whose names contain'
+                             ' PATTERN')
+    args = parser.parse_args()
+    if args.list:
+        print('\n'.join(BENCHMARKS))
+    else:
+        run(args.patterns, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,26 @@
 """Connection to message bus."""
 
+import logging
+from threading import Condition, Event, Lock, Thread, current_thread
+
 from .address import Address
-from .const import DEFAULT_TIMEOUT_VALUE
+from .const import (DEFAULT_TIMEOUT_VALUE, DEFAULT_SEND_BATCH_SIZE,
+                    DEFAULT_RECV_BUFFER_SIZE, MIN_HEADER_SIZE)
 from .errors import Error, TransportError
-from .message import HeaderField, HeaderFields, HeaderFlag, Message, MessageType
+from .executor import HandlerExecutor
+from .message import (HeaderFlag, method_call_message, method_return_message,
+                      error_message, signal_message)
 from .router import Router
 from .transports import check_for_known_transport, connect
 
 __all__ = ['Bus']
 
+_logger = logging.getLogger(__name__)
+
+_shared_lock = Condition()
+_shared_pools = {}  # (address, keyword arguments) -> list of Bus objects
+_shared_pending = {}  # same key -> number of connections being connected
+
 
 class Bus:
     """Representation of a client's connection to a message bus.
@@ -21,17 +33,141 @@ class Bus:
     :param address: same as for :class:`~dcar.address.Address` or an
                     :class:`~dcar.address.Address` object
     :type address: str or Address
+    :param bool compact_arrays: if ``True`` arrays of BYTEs in incoming
+                                messages will be :class:`bytes` objects and
+                                arrays of other numeric fixed types
+                                :class:`array.array` objects instead of lists
+    :param HandlerExecutor handler_executor: executes the handler functions
+                                             for incoming method calls and
+                                             signals (default: in a separate
+                                             thread sequentially); it is not
+                                             shut down when the connection
+                                             is lost, so it can be shared
+    :param int send_batch_size: maximum number of bytes the ``send-loop``
+                                sends with one system call if more than
+                                one message is waiting to be sent
+    :param int recv_buffer_size: size of the buffer into which the
+                                 ``recv-loop`` reads as many messages as
+                                 available with one system call
+                                 (``0`` means one message at a time,
+                                 otherwise at least ``16``)
+    :param int out_queue_size: maximum number of bytes of the messages
+                               waiting to be sent (``0`` means no limit)
+    :param str out_queue_policy: what happens if a message does not fit
+                                 into the queue: ``'block'``, ``'raise'``,
+                                 or ``'drop-oldest'``
+                                 (see :class:`~dcar.router.OutQueue`)
+    :param ReconnectPolicy reconnect: if not ``None`` the bus reconnects
+                                      after the connection was lost
+                                      according to this policy
+    :raises ValueError: if ``recv_buffer_size`` is invalid
     """
 
-    def __init__(self, address='session'):
+    def __init__(self, address='session', *, compact_arrays=False,
+                 handler_executor=None,
+                 send_batch_size=DEFAULT_SEND_BATCH_SIZE,
+                 recv_buffer_size=DEFAULT_RECV_BUFFER_SIZE,
+                 out_queue_size=0, out_queue_policy='block', reconnect=None):
+        if recv_buffer_size and not recv_buffer_size >= MIN_HEADER_SIZE:
+            raise ValueError('recv_buffer_size must be 0 or >= %d' %
+                             MIN_HEADER_SIZE)
+        self._compact_arrays = compact_arrays
+        self._out_queue_size = out_queue_size
+        self._out_queue_policy = out_queue_policy
+        self._send_batch_size = send_batch_size
+        self._recv_buffer_size = recv_buffer_size
+        # an executor passed by the caller may be shared with other buses
+        self._owns_handler_executor = handler_executor is None
+        if handler_executor is None:
+            handler_executor = HandlerExecutor()
+        self._handler_executor = handler_executor
         self._router = Router(self)
         self._unique_name = None
-        if isinstance(address, str):
-            address = Address(address)
-        check_for_known_transport(address)
+        if address is not None:  # None only for peers accepted by a server
+            if isinstance(address, str):
+                address = Address(address)
+            check_for_known_transport(address)
         self._addr = address
         self._transport = None
         self._address = None
+        self._shared_key = None
+        self._shared_refs = 0
+        self._names = {}  # name -> flags (see request_name)
+        self._reconnect = reconnect
+        self._reconnect_lock = Lock()
+        self._reconnect_stop = Event()
+        self._reconnect_thread = None
+
+    @classmethod
+    def shared(cls, address='session', *, pool_size=1, **kwargs):
+        """Return a connected bus that is shared within this process.
+
+        All calls with the same address and keyword arguments share a pool
+        of at most ``pool_size`` connections. A new connection is only
+        created if every connection in the pool is in use; otherwise the
+        one with the fewest users is returned. Each call must be paired with
+        a call of :meth:`disconnect` (e.g. by using the bus as a context
+        manager); the connection is closed when its last user disconnects.
+
+        A bus can be used from many threads concurrently, so normally one
+        connection is enough. A larger pool spreads the load over several
+        sockets when one connection is saturated.
+
+        :param address: same as for :class:`Bus`
+        :type address: str or Address
+        :param int pool_size: maximum number of connections
+        :param kwargs: keyword arguments for :class:`Bus`
+        :returns: a connected bus
+        :rtype: Bus
+        :raises ValueError: if ``pool_size < 1``
+        :raises ~dcar.AuthenticationError: if authentication failed
+        :raises OSError: if connection failed
+        """
+        if pool_size < 1:
+            raise ValueError('pool_size must be >= 1')
+        if isinstance(address, str):
+            address = Address(address)
+        key = (str(address), tuple(sorted(kwargs.items())))
+        with _shared_lock:
+            while True:
+                pool = [bus for bus in _shared_pools.pop(key, ())
+                        if bus.connected or bus.reconnecting]
+                if pool:
+                    _shared_pools[key] = pool
+                pending = _shared_pending.get(key, 0)
+                bus = min(pool, key=lambda bus: bus._shared_refs,
+                          default=None)
+                if bus is not None and not (
+                        bus._shared_refs and len(pool) + pending < pool_size):
+                    bus._shared_refs += 1
+                    return bus
+                if len(pool) + pending < pool_size:
+                    break
+                _shared_lock.wait()  # for a pending connection
+            _shared_pending[key] = pending + 1
+        # connecting can take long, so it is done without holding the lock
+        connected = None
+        try:
+            bus = cls(address, **kwargs)
+            bus.connect()
+            connected = bus
+        finally:
+            with _shared_lock:
+                _shared_pending[key] -= 1
+                if not _shared_pending[key]:
+                    del _shared_pending[key]
+                if connected is not None:
+                    connected._shared_key = key
+                    connected._shared_refs = 1
+                    _shared_pools.setdefault(key, []).append(connected)
+                _shared_lock.notify_all()
+        return connected
+
+    @property
+    def shared_users(self):
+        """Return the number of users of a bus returned by :meth:`shared`
+        (``0`` for other buses)."""
+        return self._shared_refs
 
     @property
     def address(self):
@@ -44,7 +180,88 @@ class Bus:
 
         .. versionadded:: 0.3.0
         """
-        return self._addr.bus_type
+        return self._addr.bus_type if self._addr else None
+
+    @property
+    def compact_arrays(self):
+        """Return whether arrays of fixed types are returned compact.
+
+        See parameter ``compact_arrays``.
+        """
+        return self._compact_arrays
+
+    @property
+    def handler_executor(self):
+        """Return the :class:`~dcar.HandlerExecutor` of this bus."""
+        return self._handler_executor
+
+    @property
+    def send_batch_size(self):
+        """Return the maximum number of bytes sent with one system call.
+
+        See parameter ``send_batch_size``.
+        """
+        return self._send_batch_size
+
+    @property
+    def recv_buffer_size(self):
+        """Return the size of the receive buffer.
+
+        See parameter ``recv_buffer_size``.
+        """
+        return self._recv_buffer_size
+
+    @property
+    def out_queue_size(self):
+        """Return the maximum number of bytes of waiting messages.
+
+        See parameter ``out_queue_size``.
+        """
+        return self._out_queue_size
+
+    @property
+    def out_queue_policy(self):
+        """Return the policy for a full queue of outgoing messages.
+
+        See parameter ``out_queue_policy``.
+        """
+        return self._out_queue_policy
+
+    @property
+    def out_queue_stats(self):
+        """Return the :class:`~dcar.router.OutQueueStats` of the queue for
+        outgoing messages."""
+        return self._router.out_queue.stats
+
+    @property
+    def reconnect_policy(self):
+        """Return the :class:`~dcar.ReconnectPolicy` or ``None``.
+
+        See parameter ``reconnect``.
+        """
+        return self._reconnect
+
+    @property
+    def reconnecting(self):
+        """Return whether the bus is reconnecting after the connection
+        was lost.
+
+        While reconnecting, outgoing messages are held and sent after the
+        session was restored (see :class:`~dcar.ReconnectPolicy`).
+        """
+        return self._reconnect_thread is not None
+
+    @property
+    def send_stats(self):
+        """Return the :class:`~dcar.transports.SendStats` of the current
+        connection or ``None``."""
+        return self._transport.send_stats if self._transport else None
+
+    @property
+    def recv_stats(self):
+        """Return the :class:`~dcar.transports.RecvStats` of the current
+        connection or ``None``."""
+        return self._transport.recv_stats if self._transport else None
 
     @property
     def connected(self):
@@ -106,9 +323,110 @@ class Bus:
         self._unique_name = reply[0]
 
     def disconnect(self):
-        """Disconnect the client."""
+        """Disconnect the client.
+
+        A bus returned by :meth:`shared` is only disconnected if this was
+        its last user. Reconnecting is stopped.
+        """
+        if self._shared_key is not None:
+            with _shared_lock:
+                if self._shared_refs > 0:
+                    self._shared_refs -= 1
+                if self._shared_refs:
+                    return
+                pool = _shared_pools.get(self._shared_key, [])
+                if self in pool:
+                    pool.remove(self)
+                    if not pool:
+                        del _shared_pools[self._shared_key]
+        with self._reconnect_lock:
+            thread = self._reconnect_thread
+            if thread:
+                self._reconnect_stop.set()
         if self.connected:
             self._transport.disconnect()
+        if thread and thread is not current_thread():
+            thread.join()
+
+    def _connection_lost(self):
+        # called by the router when the transport was disconnected
+        transport = self._transport
+        if (self._reconnect is None or self._addr is None or
+                transport is None or transport.error is None):
+            return
+        with self._reconnect_lock:
+            if self._reconnect_thread or self._reconnect_stop.is_set():
+                return
+            self._router.hold(self._reconnect.max_held_bytes)
+            self._reconnect_thread = Thread(target=self._reconnect_loop,
+                                            args=(transport,),
+                                            name='reconnect', daemon=True)
+            self._reconnect_thread.start()
+
+    def _shutdown_handler_executor(self):
+        # called when the connection was lost and is not restored
+        if self._owns_handler_executor:
+            self._handler_executor.shutdown()
+
+    def _reconnect_loop(self, lost):
+        _logger.info('connection lost: %s', lost.error)
+        error = None
+        for delay in self._reconnect.delays():
+            if self._reconnect_stop.wait(delay):
+                break
+            try:
+                transport, address = connect(self._addr, self._router)
+                self._transport = transport
+                transport.authenticate()
+                transport.start_loops()
+                self._restore(self._reconnect.timeout)
+                error = transport.error
+                if error is None:
+                    _logger.info('reconnected to %s', address)
+                    self._address = address
+                    break
+            except Exception as ex:
+                error = ex
+                _logger.debug('reconnect failed', exc_info=True)
+            if self._transport is not lost:
+                self._transport.disconnect()
+                self._transport = lost
+        else:
+            _logger.warning('reconnect failed: %s', error)
+        with self._reconnect_lock:
+            self._reconnect_thread = None
+            stopped = self._reconnect_stop.is_set()
+            self._reconnect_stop.clear()
+        if stopped and self._transport is not lost:
+            self._transport.disconnect()
+        if self._transport is lost or stopped:
+            self._router.release(lost.error or TransportError('disconnected'))
+            self._shutdown_handler_executor()
+        else:
+            self._router.release()
+            if self._transport.error:  # lost again while restoring
+                self._connection_lost()
+
+    def _restore(self, timeout):
+        """Restore the session after reconnecting.
+
+        :param float timeout: timeout in seconds for the replies
+        :raises ~dcar.Error: if *Hello* failed
+        """
+        reply, = self._router.outgoing_many([_bus_message('Hello')],
+                                            timeout, False)
+        if isinstance(reply, Error):
+            raise reply
+        self._unique_name = reply[0]
+        msgs = [_bus_message('AddMatch', 's', (str(rule),))
+                for rule in self._router.signals.rules()]
+        msgs += [_bus_message('RequestName', 'su', (name, flags))
+                 for name, flags in list(self._names.items())]
+        for msg, reply in zip(msgs, self._router.outgoing_many(msgs, timeout,
+                                                               False)):
+            if isinstance(reply, Error):
+                _logger.warning('%s%r failed after reconnect: %s',
+                                msg.info.member, msg.info.args, reply)
 
     def block(self, timeout=None):
         """Blocks until ``send-loop`` and ``recv-loop``\
@@ -139,7 +457,7 @@ class Bus:
         :rtype: tuple or None
         :raises ~dcar.TransportError: if the message could not be sent
         """
-        if not self.connected:
+        if not (self.connected or self.reconnecting):
             raise TransportError('not connected')
         if timeout == 0.0:
             msg.flags |= HeaderFlag.NO_REPLY_EXPECTED
@@ -167,21 +485,73 @@ class Bus:
         :rtype: tuple or None
         :raises ~dcar.TransportError: if the message could not be sent
         """
-        header_fields = HeaderFields()
-        header_fields[HeaderField.PATH] = object_path
-        header_fields[HeaderField.INTERFACE] = interface
-        header_fields[HeaderField.MEMBER] = method_name
-        header_fields[HeaderField.DESTINATION] = destination
-        header_fields[HeaderField.SENDER] = sender
-        header_fields[HeaderField.SIGNATURE] = signature
-        flags = HeaderFlag.NONE
-        if no_auto_start:
-            flags |= HeaderFlag.NO_AUTO_START
-        if allow_interactive_authorization:
-            flags |= HeaderFlag.ALLOW_INTERACTIVE_AUTHORIZATION
-        msg = Message(MessageType.METHOD_CALL, flags, header_fields, args)
+        msg = method_call_message(object_path, interface, method_name,
+                                  destination, sender, signature, args,
+                                  no_auto_start,
+                                  allow_interactive_authorization)
         return self.send_message(msg, timeout)
 
+    def method_call_async(self, object_path, interface, method_name,
+                          destination, *, sender=None, signature=None,
+                          args=(), timeout=DEFAULT_TIMEOUT_VALUE,
+                          no_auto_start=False,
+                          allow_interactive_authorization=False):
+        """Send a message of type METHOD_CALL without waiting for the reply.
+
+        The parameters are the same as for :meth:`method_call` except for
+        ``timeout``. Many calls can be in flight at the same time.
+
+        :param float timeout: ``None`` = no timeout and ``> 0`` = timeout
+                              in seconds for the reply
+        :returns: a future for the return values of the method call;
+                  its result raises :class:`~dcar.DBusError` if an error
+                  was returned and :class:`~dcar.TransportError` if the
+                  connection was lost or the timeout was reached
+        :rtype: concurrent.futures.Future
+        :raises ValueError: if ``timeout`` is not ``None`` or ``> 0``
+        :raises ~dcar.TransportError: if the message could not be sent
+        """
+        if timeout is not None and not timeout > 0:
+            raise ValueError('timeout must be None or > 0')
+        if not (self.connected or self.reconnecting):
+            raise TransportError('not connected')
+        msg = method_call_message(object_path, interface, method_name,
+                                  destination, sender, signature, args,
+                                  no_auto_start,
+                                  allow_interactive_authorization)
+        return self._router.outgoing_async(msg, timeout)
+
+    def method_calls(self, calls, *, sender=None,
+                     timeout=DEFAULT_TIMEOUT_VALUE, no_auto_start=False,
+                     allow_interactive_authorization=False):
+        """Send many messages of type METHOD_CALL as a pipeline.
+
+        All messages are sent before the replies are collected, so the
+        calls need about one round trip instead of one for each call.
+        Each call is a tuple ``(object_path, interface, method_name,
+        destination, signature, args)``; ``signature`` and ``args`` can be
+        omitted. The other parameters are the same as for
+        :meth:`method_call` and apply to all calls.
+
+        :param calls: the method calls
+        :type calls: iterable of tuples
+        :param float timeout: ``None`` = no timeout and ``> 0`` = timeout
+                              in seconds for all replies
+        :returns: the return values of each method call or the
+                  :class:`~dcar.DBusError` if an error was returned
+                  (in the order of the calls)
+        :rtype: list
+        :raises ~dcar.TransportError: if the messages could not be sent
+                                      or not all replies were received
+        """
+        if not (self.connected or self.reconnecting):
+            raise TransportError('not connected')
+        msgs = [method_call_message(*_call_args(call, sender),
+                                    no_auto_start,
+                                    allow_interactive_authorization)
+                for call in calls]
+        return self._router.outgoing_many(msgs, timeout)
+
     def method_return(self, reply_serial, destination, *, sender=None,
                       signature=None, args=()):
         """Send a message of type METHOD_RETURN.
@@ -195,13 +565,8 @@ class Bus:
         :param tuple args: the OUT arguments of the called method
         :raises ~dcar.TransportError: if the message could not be sent
         """
-        header_fields = HeaderFields()
-        header_fields[HeaderField.REPLY_SERIAL] = reply_serial
-        header_fields[HeaderField.DESTINATION] = destination
-        header_fields[HeaderField.SENDER] = sender
-        header_fields[HeaderField.SIGNATURE] = signature
-        msg = Message(MessageType.METHOD_RETURN, HeaderFlag.NONE,
-                      header_fields, args)
+        msg = method_return_message(reply_serial, destination, sender,
+                                    signature, args)
         return self.send_message(msg)
 
     def send_error(self, error_name, reply_serial, destination, *, sender=None,
@@ -217,13 +582,8 @@ class Bus:
         :param tuple args: the arguments
         :raises ~dcar.TransportError: if the message could not be sent
         """
-        header_fields = HeaderFields()
-        header_fields[HeaderField.ERROR_NAME] = error_name
-        header_fields[HeaderField.REPLY_SERIAL] = reply_serial
-        header_fields[HeaderField.DESTINATION] = destination
-        header_fields[HeaderField.SENDER] = sender
-        header_fields[HeaderField.SIGNATURE] = signature
-        msg = Message(MessageType.ERROR, HeaderFlag.NONE, header_fields, args)
+        msg = error_message(error_name, reply_serial, destination, sender,
+                            signature, args)
         return self.send_message(msg)
 
     def emit_signal(self, object_path, interface, signal_name,
@@ -239,14 +599,8 @@ class Bus:
         :param tuple args: the arguments
         :raises ~dcar.TransportError: if the message could not be sent
         """
-        header_fields = HeaderFields()
-        header_fields[HeaderField.PATH] = object_path
-        header_fields[HeaderField.INTERFACE] = interface
-        header_fields[HeaderField.MEMBER] = signal_name
-        header_fields[HeaderField.DESTINATION] = destination
-        header_fields[HeaderField.SENDER] = sender
-        header_fields[HeaderField.SIGNATURE] = signature
-        msg = Message(MessageType.SIGNAL, HeaderFlag.NONE, header_fields, args)
+        msg = signal_message(object_path, interface, signal_name,
+                             destination, sender, signature, args)
         return self.send_message(msg)
 
     def register_signal(self, rule, handler, unicast=False,
@@ -259,7 +613,8 @@ class Bus:
         .. note::
 
            The handler functions for incoming method calls and signals will be
-           executed in a separate thread sequentially.
+           executed by the :attr:`handler_executor` (by default in a separate
+           thread sequentially).
 
         :param ~dcar.MatchRule rule: the match rule
         :param callable handler: handler function for the signal
@@ -303,6 +658,53 @@ class Bus:
                              signature='s', args=(str(rule),),
                              timeout=timeout)
 
+    def request_name(self, name, flags=0, timeout=DEFAULT_TIMEOUT_VALUE):
+        """Request a well-known name.
+
+        Unless the name already existed, it is requested again with the
+        same flags after reconnecting (see parameter ``reconnect``) until
+        :meth:`release_name` is called.
+
+        :param str name: the name
+        :param int flags: flags for *RequestName*
+        :param float timeout: timeout in seconds
+        :returns: the return value of *RequestName*
+                  (``1``: primary owner, ``2``: in queue, ``3``: exists,
+                  ``4``: already owner)
+        :rtype: int
+        :raises ~dcar.TransportError: if the message could not be sent
+        :raises ~dcar.DBusError: if the name could not be requested
+        """
+        reply = self.method_call('/org/freedesktop/DBus',
+                                 'org.freedesktop.DBus',
+                                 'RequestName',
+                                 'org.freedesktop.DBus',
+                                 signature='su', args=(name, flags),
+                                 timeout=timeout)
+        if reply[0] != 3:
+            self._names[name] = flags
+        return reply[0]
+
+    def release_name(self, name, timeout=DEFAULT_TIMEOUT_VALUE):
+        """Release a well-known name.
+
+        :param str name: the name
+        :param float timeout: timeout in seconds
+        :returns: the return value of *ReleaseName*
+                  (``1``: released, ``2``: non-existent, ``3``: not owner)
+        :rtype: int
+        :raises ~dcar.TransportError: if the message could not be sent
+        :raises ~dcar.DBusError: if the name could not be released
+        """
+        self._names.pop(name, None)
+        reply = self.method_call('/org/freedesktop/DBus',
+                                 'org.freedesktop.DBus',
+                                 'ReleaseName',
+                                 'org.freedesktop.DBus',
+                                 signature='s', args=(name,),
+                                 timeout=timeout)
+        return reply[0]
+
     def register_method(self, object_path, interface, method_name,
                         handler, signature=None):
         """Register a method.
@@ -314,7 +716,8 @@ class Bus:
         .. note::
 
            The handler functions for incoming method calls and signals will be
-           executed in a separate thread sequentially.
+           executed by the :attr:`handler_executor` (by default in a separate
+           thread sequentially).
 
         :param str object_path: object path
         :param str interface: interface name
@@ -333,3 +736,18 @@ class Bus:
         :param int meth_id: ID returned by :meth:`register_method`
         """
         self._router.methods.remove(meth_id)
+
+
+def _bus_message(method_name, signature=None, args=()):
+    return method_call_message('/org/freedesktop/DBus', 'org.freedesktop.DBus',
+                               method_name, 'org.freedesktop.DBus', None,
+                               signature, args, False, False)
+
+
+def _call_args(call, sender):
+    object_path, interface, method_name, destination, *rest = call
+    if len(rest) > 2:
+        raise ValueError('too many values in method call: %r' % (call,))
+    signature, args = rest + [None, ()][len(rest):]
+    return (object_path, interface, method_name, destination, sender,
+            signature, args)
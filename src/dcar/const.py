@@ -27,3 +27,5 @@ LOCAL_PATH = '/org/freedesktop/DBus/Local'  #: Reserved local path
 LOCAL_INTERFACE = 'org.freedesktop.DBus.Local'  #: Reserved local interface
 
 DEFAULT_TIMEOUT_VALUE = 25.0  #: Default timeout when waiting for a reply
+DEFAULT_SEND_BATCH_SIZE = 2 ** 16  #: Default max. bytes of a batch of messages
+DEFAULT_RECV_BUFFER_SIZE = 2 ** 16  #: Default size of the receive buffer
@@ -5,6 +5,7 @@ __all__ = [
     'AddressError',
     'AuthenticationError',
     'TransportError',
+    'QueueFullError',
     'ValidationError',
     'RegisterError',
     'MessageError',
@@ -30,6 +31,10 @@ class TransportError(Error):
     """Raised for transport related errors."""
 
 
+class QueueFullError(TransportError):
+    """Raised when the queue for outgoing messages is full."""
+
+
 class ValidationError(Error):
     """Raised when validation failed."""
 
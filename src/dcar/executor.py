@@ -0,0 +1,147 @@
+"""Execution of handler functions."""
+
+from collections import deque
+from itertools import count
+from queue import SimpleQueue
+from threading import Lock, Thread
+
+__all__ = ['HandlerExecutor']
+
+ORDERINGS = (None, 'path', 'sender')
+
+_STOP = object()
+
+
+class HandlerExecutor:
+    """Thread pool for the handler functions of incoming method calls and
+    signals (see parameter ``handler_executor`` of :class:`~dcar.Bus`).
+
+    Handlers for messages with the same ordering key are executed
+    sequentially in the order the messages were received, handlers for
+    messages with different keys concurrently. The ordering key is the
+    object path (``'path'``) or the sender (``'sender'``) of a message;
+    if ``ordering`` is ``None`` there are no ordering guarantees.
+
+    If ``max_queue`` handlers are waiting to be executed, further method
+    calls are answered with an *org.freedesktop.DBus.Error.LimitsExceeded*
+    error and further signals are dropped. The recv-loop is never blocked,
+    so handlers can call methods on the same bus.
+
+    The worker threads are started with the first handlers.
+
+    :param int max_workers: maximum number of worker threads
+    :param str ordering: ``'path'``, ``'sender'``, or ``None``
+    :param int max_queue: maximum number of waiting handlers
+                          (``0`` means no limit)
+    :raises ValueError: if any argument has an invalid value
+    """
+
+    def __init__(self, max_workers=1, ordering=None, max_queue=0):
+        if max_workers < 1:
+            raise ValueError('max_workers must be >= 1')
+        if ordering not in ORDERINGS:
+            raise ValueError('ordering must be one of %r' % (ORDERINGS,))
+        if max_queue < 0:
+            raise ValueError('max_queue must be >= 0')
+        self._max_workers = max_workers
+        self._ordering = ordering
+        self._max_queue = max_queue
+        self._lock = Lock()
+        self._pending = {}  # ordering key -> deque with waiting handlers
+        self._queued = 0
+        self._ready = SimpleQueue()  # keys with waiting handlers
+        self._threads = []
+        self._counter = count()
+
+    @property
+    def max_workers(self):
+        """Return the maximum number of worker threads."""
+        return self._max_workers
+
+    @property
+    def ordering(self):
+        """Return the ordering."""
+        return self._ordering
+
+    @property
+    def max_queue(self):
+        """Return the maximum number of waiting handlers."""
+        return self._max_queue
+
+    @property
+    def queued(self):
+        """Return the number of waiting handlers."""
+        return self._queued
+
+    def submit(self, info, func, *args):
+        """Submit a handler function for execution.
+
+        :param ~dcar.message.MessageInfo info: the info of the message
+                                               for which the handler will be
+                                               called
+        :param callable func: the function which calls the handler
+        :param args: arguments for ``func``
+        :returns: ``False`` if the queue is full else ``True``
+        :rtype: bool
+        """
+        if self._ordering == 'path':
+            key = info.path
+        elif self._ordering == 'sender':
+            key = info.sender
+        else:
+            key = next(self._counter)
+        with self._lock:
+            if self._max_queue and self._queued >= self._max_queue:
+                return False
+            self._queued += 1
+            dq = self._pending.get(key)
+            if dq is None:
+                self._pending[key] = deque([(func, args)])
+                self._ready.put(key)
+            else:
+                dq.append((func, args))
+            if len(self._threads) < self._max_workers:
+                thread = Thread(target=self._work,
+                                args=(self._pending, self._ready),
+                                name='handler-%d' % len(self._threads),
+                                daemon=True)
+                self._threads.append(thread)
+                thread.start()
+        return True
+
+    def shutdown(self):
+        """Stop the worker threads.
+
+        Waiting handlers are discarded. New worker threads are started
+        by the next call of :meth:`submit`.
+        """
+        with self._lock:
+            self._pending.clear()
+            for _ in self._threads:
+                self._ready.put(_STOP)
+            # the stopping threads keep the old objects
+            self._pending = {}
+            self._ready = SimpleQueue()
+            self._queued = 0
+            self._threads = []
+
+    def _work(self, pending, ready):
+        while True:
+            key = ready.get()
+            if key is _STOP:
+                break
+            with self._lock:
+                dq = pending.get(key)
+                if not dq:  # discarded by shutdown
+                    continue
+                func, args = dq.popleft()
+                self._queued -= 1
+            try:
+                func(*args)
+            finally:
+                with self._lock:
+                    if pending.get(key) is dq:
+                        if dq:
+                            ready.put(key)
+                        else:
+                            del pending[key]
@@ -3,16 +3,26 @@
 .. versionadded:: 0.3.0
 """
 
+import json
+import logging
+import os
 import xml.etree.ElementTree as ET
 from collections import namedtuple, defaultdict
+from threading import Lock
+
+from .errors import DBusError
 
 __all__ = [
     'Data',
+    'Cache',
     'Method',
     'Property',
     'Signal',
     ]
 
+_logger = logging.getLogger(__name__)
+_CACHE_SUFFIX = '.dcar-introspect.json'
+
 Method = namedtuple('Method',
                     'name interface in_signature out_signature no_reply')
 Method.__doc__ = 'Representation of an interface member of type `method`.'
@@ -37,23 +47,36 @@ class Data:
       * ``data['member name']``
       * ``data['interface name', 'member name']``
 
+    With a :class:`Cache` the parsed interfaces are shared by all objects
+    of the same bus name. If the names of the interfaces of the object are
+    given and all of them are in the cache, no XML data is needed.
+
     :param dcar.Bus bus: a connected bus object
     :param str name: bus name
     :param str path: object path
     :param str xml: introspection data (will be loaded from D-Bus if ``None``)
+    :param Cache cache: cache for the parsed interfaces
+    :param interfaces: names of the interfaces of the object
+                       (only used with ``cache``)
+    :type interfaces: iterable of str
     :raises RuntimeError: if ``bus`` is not a connected :class:`dcar.Bus` object
     :raises ~dcar.ValidationError: if ``name`` or ``path`` are not valid
     """
 
-    def __init__(self, bus, name, path, xml):
+    def __init__(self, bus, name, path, xml, cache=None, interfaces=None):
         self._bus = bus
         self._name = name
         self._path = path
-        if xml:
-            self._xml = xml
-        else:
-            self._xml = self._introspect()
-        self._data = _interfaces(ET.fromstring(self._xml))
+        self._xml = xml
+        if cache is None:
+            self._data = _interfaces(ET.fromstring(self.xml))
+            return
+        self._data = None
+        owner = cache._owner(bus, name)
+        if not xml and interfaces is not None:
+            self._data = cache.get(name, interfaces, owner)
+        if self._data is None:
+            self._data = cache.parse(name, self.xml, owner)
 
     def _introspect(self):
         reply = self._bus.method_call(self._path,
@@ -64,7 +87,13 @@ class Data:
 
     @property
     def xml(self):
-        """Return XML data."""
+        """Return XML data.
+
+        If the interfaces were found in the cache, the data is loaded from
+        D-Bus on the first access.
+        """
+        if not self._xml:
+            self._xml = self._introspect()
         return self._xml
 
     def __getitem__(self, key):
@@ -78,23 +107,243 @@ class Data:
         raise KeyError(key)
 
 
+class Cache:
+    """Cache for parsed introspection data (see parameter ``cache`` of
+    :class:`Data` and ``introspection_cache`` of
+    :class:`~dcar.RemoteObject`).
+
+    Interfaces are cached by bus name and interface name, so objects of
+    the same bus name that implement the same interfaces share the parsed
+    :class:`Method`, :class:`Signal`, and :class:`Property` objects.
+
+    The interfaces of a bus name are stored together with its owner (the
+    GUID of the message bus and the unique name). :class:`Data` looks up
+    the owner once per connection and bus name; if it changed (e.g. the
+    service was restarted after an update), the cached interfaces of the
+    bus name are dropped. :meth:`clear` drops them in any case.
+
+    If ``directory`` is not ``None``, the interfaces of each well-known bus
+    name are also stored in a JSON file ``<bus name>.dcar-introspect.json``
+    in this directory, so they can be used by other processes and after a
+    restart. Other files in the directory are never touched.
+
+    :param str directory: directory for the cache files
+    """
+
+    def __init__(self, directory=None):
+        self._directory = directory
+        self._lock = Lock()
+        self._interfaces = {}  # bus name -> {interface name: members}
+        self._xml = {}  # bus name -> {interface name: XML} from file
+        self._data = {}  # (bus name, interface names) -> data
+        self._owners = {}  # bus name -> owner of the cached interfaces
+        self._lookups = {}  # (GUID, unique name, bus name) -> owner
+
+    @property
+    def directory(self):
+        """Return the directory for the cache files or ``None``."""
+        return self._directory
+
+    def get(self, name, interfaces, owner=None):
+        """Return the data for an object with the given interfaces.
+
+        :param str name: bus name
+        :param interfaces: names of the interfaces of the object
+        :type interfaces: iterable of str
+        :param str owner: the owner of the bus name; if it is not the owner
+                          of the cached interfaces, they are dropped
+                          (``None`` means not checked)
+        :returns: mapping of member names to lists of members or ``None``
+                  if not all interfaces are in the cache
+        """
+        key = (name, tuple(sorted(set(interfaces), key=_sort_key)))
+        with self._lock:
+            self._check_owner(name, owner)
+            data = self._data.get(key)
+            if data is None:
+                cached = self._cached(name)
+                tables = []
+                for iface in key[1]:
+                    members = cached.get(iface)
+                    if members is None:
+                        xml = self._xml.get(name, {}).get(iface)
+                        if xml is None:
+                            return None
+                        members = cached[iface] = _interface(
+                            ET.fromstring(xml))
+                    tables.append(members)
+                data = self._data[key] = _merge(tables)
+            return data
+
+    def parse(self, name, xml, owner=None):
+        """Parse introspection data and add its interfaces to the cache.
+
+        Interfaces that are already in the cache are not parsed again.
+
+        :param str name: bus name
+        :param str xml: introspection data
+        :param str owner: see :meth:`get`
+        :returns: mapping of member names to lists of members
+        """
+        ifaces = {elem.get('name'): elem for elem in ET.fromstring(xml)
+                  if elem.tag == 'interface'}
+        with self._lock:
+            self._check_owner(name, owner)
+            cached = self._cached(name)
+            new = {iface: elem for iface, elem in ifaces.items()
+                   if iface not in cached}
+            for iface, elem in new.items():
+                cached[iface] = _interface(elem)
+            key = (name, tuple(sorted(ifaces, key=_sort_key)))
+            data = self._data.get(key)
+            if data is None:
+                data = self._data[key] = _merge(cached[iface]
+                                                for iface in key[1])
+            if new:
+                self._store(name, new)
+            return data
+
+    def clear(self, name=None):
+        """Remove all interfaces or those of one bus name from the cache.
+
+        The cache files are removed as well.
+
+        :param str name: bus name (``None`` means all)
+        """
+        with self._lock:
+            if name is None:
+                names = set(self._interfaces) | set(self._xml)
+                self._interfaces.clear()
+                self._xml.clear()
+                self._data.clear()
+                self._owners.clear()
+                self._lookups.clear()
+                if self._directory and os.path.isdir(self._directory):
+                    names.update(fn[:-len(_CACHE_SUFFIX)]
+                                 for fn in os.listdir(self._directory)
+                                 if fn.endswith(_CACHE_SUFFIX))
+            else:
+                names = {name}
+                self._drop(name)
+                self._owners.pop(name, None)
+                for key in [key for key in self._lookups if key[2] == name]:
+                    del self._lookups[key]
+            for name in names:
+                path = self._path(name)
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+    def _owner(self, bus, name):
+        # The owner of a well-known name is looked up once per connection.
+        # Interfaces of unique names are only cached for one connection.
+        if not name or name.startswith(':') or not bus.unique_name:
+            return None
+        key = (bus.guid, bus.unique_name, name)
+        with self._lock:
+            owner = self._lookups.get(key)
+        if owner is None:
+            try:
+                owner = '%s %s' % (bus.guid, bus.method_call(
+                    '/org/freedesktop/DBus', 'org.freedesktop.DBus',
+                    'GetNameOwner', 'org.freedesktop.DBus',
+                    signature='s', args=(name,))[0])
+            except DBusError:
+                owner = ''  # not running: the cache is not checked
+            with self._lock:
+                self._lookups[key] = owner
+        return owner or None
+
+    def _check_owner(self, name, owner):
+        # called with self._lock held
+        if owner is None:
+            return
+        self._cached(name)  # the owner of the file's interfaces
+        if self._owners.get(name) != owner:
+            self._drop(name)
+            self._cached(name)  # the file may have been written meanwhile
+            if self._owners.get(name) != owner:
+                self._drop(name)
+                self._interfaces[name] = {}
+                self._owners[name] = owner
+
+    def _drop(self, name):
+        # called with self._lock held
+        self._interfaces.pop(name, None)
+        self._xml.pop(name, None)
+        for key in [key for key in self._data if key[0] == name]:
+            del self._data[key]
+
+    def _cached(self, name):
+        # called with self._lock held
+        cached = self._interfaces.get(name)
+        if cached is None:
+            cached = self._interfaces[name] = {}
+            path = self._path(name)
+            if path and os.path.exists(path):
+                try:
+                    with open(path, encoding='utf-8') as fh:
+                        content = json.load(fh)
+                    self._xml[name] = dict(content['interfaces'])
+                    self._owners[name] = content['owner']
+                except (OSError, ValueError, KeyError, TypeError):
+                    _logger.warning('cannot read cache file %s', path,
+                                    exc_info=True)
+        return cached
+
+    def _store(self, name, ifaces):
+        # called with self._lock held
+        path = self._path(name)
+        if not path:
+            return
+        xml = self._xml.setdefault(name, {})
+        xml.update((iface, ET.tostring(elem, encoding='unicode'))
+                   for iface, elem in ifaces.items())
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            tmp = '%s.%d.tmp' % (path, os.getpid())
+            with open(tmp, 'w', encoding='utf-8') as fh:
+                json.dump({'owner': self._owners.get(name, ''),
+                           'interfaces': xml}, fh)
+            os.replace(tmp, path)
+        except OSError:
+            _logger.warning('cannot write cache file %s', path, exc_info=True)
+
+    def _path(self, name):
+        # unique names are only valid for one connection
+        if self._directory and not name.startswith(':'):
+            return os.path.join(self._directory, name + _CACHE_SUFFIX)
+        return None
+
+
 def _interfaces(root):
+    return _merge(_interface(elem) for elem in _sort(root)
+                  if elem.tag == 'interface')
+
+
+def _interface(iface):
+    elem = iface.find('annotation[@name="org.freedesktop.DBus.Property'
+                      '.EmitsChangedSignal"]')
+    changed_signal = 'true' if elem is None else elem.get('value')
+    members = []
+    for elem in iface:
+        if elem.tag == 'method':
+            member = _method(elem, iface.get('name'))
+        elif elem.tag == 'signal':
+            member = _signal(elem, iface.get('name'))
+        elif elem.tag == 'property':
+            member = _property(elem, iface.get('name'), changed_signal)
+        else:
+            member = None
+        if member:
+            members.append(member)
+    return members
+
+
+def _merge(tables):
     data = defaultdict(list)
-    for iface in (elem for elem in _sort(root) if elem.tag == 'interface'):
-        elem = iface.find('annotation[@name="org.freedesktop.DBus.Property'
-                          '.EmitsChangedSignal"]')
-        changed_signal = 'true' if elem is None else elem.get('value')
-        for elem in iface:
-            if elem.tag == 'method':
-                member = _method(elem, iface.get('name'))
-            elif elem.tag == 'signal':
-                member = _signal(elem, iface.get('name'))
-            elif elem.tag == 'property':
-                member = _property(elem, iface.get('name'), changed_signal)
-            else:
-                member = None
-            if member:
-                data[member.name].append(member)
+    for members in tables:
+        for member in members:
+            data[member.name].append(member)
     data.default_factory = None
     return data
 
@@ -137,9 +386,12 @@ def _property(root, interface, changed_signal):
 def _sort(root):
     def f(x):
         if x.tag == 'interface':
-            if x.get('name').startswith('org.freedesktop.DBus.'):
-                return (0,)
-            else:
-                return (1, x.get('name'))
+            return _sort_key(x.get('name'))
         return (2,)
     return sorted(root, key=f)
+
+
+def _sort_key(name):
+    if name.startswith('org.freedesktop.DBus.'):
+        return (0, name)
+    return (1, name)
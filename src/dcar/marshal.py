@@ -16,13 +16,16 @@ See:
 
 import array
 import struct
+import sys
+from functools import lru_cache
 
 from .const import MAX_ARRAY_LEN
-from .errors import TooLongError, MessageError
+from .errors import (TooLongError, MessageError, SignatureError,
+                     ValidationError)
 from .signature import Signature
 from .validate import validate_object_path, validate_signature
 
-__all__ = ['types', 'marshal', 'unmarshal']
+__all__ = ['types', 'marshal', 'unmarshal', 'compile_signature', 'Codec']
 
 
 class Type:
@@ -100,7 +103,7 @@ class Fixed(Type):
             return struct.unpack(raw.byteorder.code + self.code, value)[0]
         except struct.error as ex:
             raise MessageError('unmarshal %s %r: %s' %
-                               (self.name, value, ex)) from ex
+                               (self.name, bytes(value), ex)) from ex
 
 
 class Boolean(Fixed):
@@ -200,15 +203,15 @@ class StringLike(Type):
         try:
             # encoding=UTF-8, errors=strict
             value = raw.read(length)
-            s = value.decode()
+            s = str(value, 'utf-8')
         except UnicodeError as ex:
             raise MessageError('unmarshal %s %r: %s' %
-                               (self.name, value, ex)) from ex
+                               (self.name, bytes(value), ex)) from ex
         if self.validate_func:
             self.validate_func(s)
         b = raw.read(1)
         if not b or b[0]:
-            raise MessageError('no NUL byte after string: %s' % b)
+            raise MessageError('no NUL byte after string: %s' % bytes(b))
         return s
 
 
@@ -246,7 +249,7 @@ class Variant(Container):
         with raw.nesting_depth():
             if len(data) != 2:
                 raise MessageError('variant Python tuple must have 2 elements')
-            sig = Signature(data[0])
+            sig = Signature.get(data[0])
             if len(sig) != 1:
                 raise MessageError(
                     'variant signature must be a single complete type')
@@ -255,7 +258,7 @@ class Variant(Container):
 
     def unmarshal(self, raw, signature=None):
         with raw.nesting_depth():
-            sig = Signature(types['g'].unmarshal(raw))
+            sig = Signature.get(types['g'].unmarshal(raw))
             if len(sig) != 1:
                 raise MessageError(
                     'variant signature must be a single complete type')
@@ -349,18 +352,15 @@ def marshal(raw, data, signature):
     The elements of the data tuple must be of appropriate types according
     to the column *Python IN* in the :ref:`types summary <ref-types-table>`.
 
+    The signature is compiled with :func:`compile_signature`.
+
     :param RawData raw: raw message data
     :param tuple data: tuple of data to be marshalled
     :param signature: see :class:`~dcar.signature.Signature`
     :raises ~dcar.MessageError: if the data could not be marshalled
     """
-    signature = _signature(signature)
-    if len(signature) != len(data):
-        raise MessageError('length: signature %d, args %d' %
-                           (len(signature), len(data)))
-    for (sig, d) in zip(signature, data):
-        t, s = sig
-        types[t].marshal(raw, d, s)
+    compile_signature(_signature_str(signature),
+                      raw.byteorder.code).marshal(raw, data)
 
 
 def unmarshal(raw, signature):
@@ -369,22 +369,560 @@ def unmarshal(raw, signature):
     The elements of the returned tuple will be of types according
     to the column *Python OUT* in the :ref:`types summary <ref-types-table>`.
 
+    The signature is compiled with :func:`compile_signature`. If
+    :attr:`RawData.compact_arrays <dcar.raw.RawData.compact_arrays>` is
+    ``True``, arrays of fixed types are returned as described there.
+
     :param RawData raw: raw message data
     :param signature: see :class:`~dcar.signature.Signature`
     :return: tuple of unmarshalled data
     :rtype: tuple
     :raises ~dcar.MessageError: if the data could not be unmarshalled
     """
-    signature = _signature(signature)
-    data = []
-    for t, s in signature:
-        data.append(types[t].unmarshal(raw, s))
-    return tuple(data)
+    return compile_signature(_signature_str(signature), raw.byteorder.code,
+                             raw.compact_arrays).unmarshal(raw)
 
 
-def _signature(signature):
+def _signature_str(signature):
     if isinstance(signature, str):
-        return Signature(signature)
+        return signature
     if signature is None:
-        return Signature('')
-    return signature
+        return ''
+    if isinstance(signature, Signature):
+        return str(signature)
+    # sequence of complete types (see Signature)
+    return ''.join(_ct_str(ct) for ct in signature)
+
+
+def _ct_str(ct):
+    t, children = ct
+    if t == 'a':
+        return 'a' + _ct_str(children[0])
+    if t == 'r':
+        return '(%s)' % ''.join(_ct_str(x) for x in children)
+    if t == 'e':
+        return '{%s}' % ''.join(_ct_str(x) for x in children)
+    return t
+
+
+CODEC_CACHE_SIZE = 1024  #: maximum number of cached :class:`Codec` objects
+
+
+def compile_signature(signature, byteorder_code, compact_arrays=False):
+    """Compile a signature into a :class:`Codec`.
+
+    The codecs are cached (at most :data:`CODEC_CACHE_SIZE`), so compiling
+    the same signature again is cheap.
+
+    :param str signature: D-Bus type signature
+    :param str byteorder_code: :mod:`struct` byteorder code (``'<'`` or
+                               ``'>'``)
+    :param bool compact_arrays: see :class:`Codec`
+    :return: the compiled signature
+    :rtype: Codec
+    :raises ~dcar.SignatureError: if there is a problem with the signature
+    """
+    # the same key for every way of passing the arguments
+    return _compile_signature(signature, byteorder_code, bool(compact_arrays))
+
+
+@lru_cache(maxsize=CODEC_CACHE_SIZE)
+def _compile_signature(signature, byteorder_code, compact_arrays):
+    return Codec(signature, byteorder_code, compact_arrays)
+
+
+class Codec:
+    """A signature compiled into a marshaller and an unmarshaller.
+
+    Instead of walking the parsed signature and looking up the type
+    objects in :data:`types` for every value, the signature is turned
+    into a tree of specialised closures once. Consecutive fixed types
+    (except UNIX_FD) and arrays of fixed types (except UNIX_FD) are packed
+    and unpacked with a single :mod:`struct` call.
+
+    If ``compact_arrays`` is ``True``, unmarshalled arrays of BYTEs are
+    returned as :class:`bytes` and arrays of other numeric fixed types
+    as :class:`array.array` instead of lists.
+
+    Normally :func:`compile_signature` should be used to get a cached codec.
+
+    :param str signature: D-Bus type signature
+    :param str byteorder_code: :mod:`struct` byteorder code (``'<'`` or
+                               ``'>'``)
+    :param bool compact_arrays: OUT type of arrays of fixed types
+    :raises ~dcar.SignatureError: if there is a problem with the signature
+    """
+
+    def __init__(self, signature, byteorder_code, compact_arrays=False):
+        self.signature = Signature.get(signature)
+        self.byteorder_code = byteorder_code
+        self.compact_arrays = compact_arrays
+        self._marshal, self._unmarshal, self._depth = _compile_seq(
+            list(self.signature), byteorder_code, compact_arrays, 0)
+
+    def __len__(self):
+        return len(self.signature)
+
+    def marshal(self, raw, data):
+        """Marshal objects (see :func:`marshal`)."""
+        if len(self.signature) != len(data):
+            raise MessageError('length: signature %d, args %d' %
+                               (len(self.signature), len(data)))
+        raw.check_nesting_depth(self._depth)
+        self._marshal(raw, data)
+
+    def unmarshal(self, raw):
+        """Unmarshal objects (see :func:`unmarshal`)."""
+        raw.check_nesting_depth(self._depth)
+        return self._unmarshal(raw)
+
+    def __repr__(self):
+        return '<%s: %r %r>' % (self.__class__.__name__,
+                                str(self.signature), self.byteorder_code)
+
+
+# fixed types that can be packed together with one struct call
+_PACKABLE = frozenset('ybnqiuxtd')
+
+
+def _compile_seq(cts, bo, compact, level):
+    """Compile a sequence of complete types.
+
+    ``level`` is the static nesting depth of the sequence.
+    Returns a marshal function ``f(raw, data)``, an unmarshal function
+    ``f(raw) -> tuple`` and the nesting depth of the sequence.
+    """
+    steps = []  # (marshal function, index or slice, unmarshal function, run)
+    depth = 0
+    i = 0
+    while i < len(cts):
+        j = i
+        while j < len(cts) and cts[j][0] in _PACKABLE:
+            j += 1
+        if j - i > 1:
+            m, u = _compile_run([t for t, _ in cts[i:j]], bo)
+            steps.append((m, slice(i, j), u, True))
+            i = j
+        else:
+            m, u, _, d = _compile_one(cts[i], bo, compact, level)
+            depth = max(depth, d)
+            steps.append((m, i, u, False))
+            i += 1
+    if len(steps) == 1 and not steps[0][3]:
+        m, _, u, _ = steps[0]
+
+        def marshal_seq(raw, data):
+            m(raw, data[0])
+
+        def unmarshal_seq(raw):
+            return (u(raw),)
+    elif len(steps) == 1:
+        m, idx, u, _ = steps[0]
+
+        def marshal_seq(raw, data):
+            m(raw, data[idx])
+
+        unmarshal_seq = u
+    else:
+        m_steps = [(m, idx) for m, idx, _, _ in steps]
+        u_steps = [(u, run) for _, _, u, run in steps]
+
+        def marshal_seq(raw, data):
+            for m, idx in m_steps:
+                m(raw, data[idx])
+
+        def unmarshal_seq(raw):
+            lst = []
+            for u, run in u_steps:
+                if run:
+                    lst.extend(u(raw))
+                else:
+                    lst.append(u(raw))
+            return tuple(lst)
+    return marshal_seq, unmarshal_seq, depth
+
+
+def _compile_one(ct, bo, compact, level):
+    """Compile a complete type.
+
+    Returns a marshal function ``f(raw, value)``, an unmarshal function
+    ``f(raw) -> value``, the alignment and the nesting depth of the type.
+    Variants do not count for the nesting depth because they check it
+    themselves while (un)marshalling.
+    """
+    t, children = ct
+    if t in ('s', 'o', 'g'):
+        return _compile_string(types[t], bo) + (types[t].alignment, 0)
+    if t == 'v':
+        return _compile_variant(bo, compact, level) + (1, 0)
+    if t == 'a':
+        return _compile_array(children[0], bo, compact, level)
+    if t in ('r', 'e'):
+        return _compile_struct(children, bo, compact, level)
+    if t == 'b':
+        return _compile_boolean(bo) + (types[t].alignment, 0)
+    if t == 'h':
+        return _compile_unix_fd(bo) + (types[t].alignment, 0)
+    return _compile_fixed(types[t], bo) + (types[t].alignment, 0)
+
+
+def _compile_fixed(typ, bo):
+    st = struct.Struct(bo + typ.code)
+    pack, size, alignment = st.pack, st.size, typ.alignment
+
+    def marshal_fixed(raw, data):
+        raw.write_padding(alignment)
+        try:
+            raw.write(pack(data))
+        except struct.error as ex:
+            raise MessageError('marshal %s %r: %s' %
+                               (typ.name, data, ex)) from ex
+
+    def unmarshal_fixed(raw):
+        try:
+            return raw.unpack(st, alignment)[0]
+        except struct.error as ex:
+            raise MessageError('unmarshal %s %r: %s' %
+                               (typ.name, bytes(raw.read(size)), ex)) from ex
+    return marshal_fixed, unmarshal_fixed
+
+
+def _compile_boolean(bo):
+    typ = types['b']
+    m, u = _compile_fixed(typ, bo)
+
+    def marshal_boolean(raw, data):
+        if not isinstance(data, bool):
+            raise MessageError('marshal %s: %r is not a valid boolean' %
+                               (typ.name, data))
+        m(raw, data)
+
+    def unmarshal_boolean(raw):
+        value = u(raw)
+        if value not in (0, 1):
+            raise MessageError('unmarshal %s: %r is not a valid boolean' %
+                               (typ.name, value))
+        return bool(value)
+    return marshal_boolean, unmarshal_boolean
+
+
+def _compile_unix_fd(bo):
+    typ = types['h']
+    m, u = _compile_fixed(typ, bo)
+
+    def marshal_unix_fd(raw, data):
+        if isinstance(data, int):
+            idx = raw.add_unix_fd(data)
+        elif hasattr(data, 'fileno'):
+            idx = raw.add_unix_fd(data.fileno())
+        else:
+            raise MessageError(
+                'marshal %s: %r is not a valid file (descriptor)' %
+                (typ.name, data))
+        m(raw, idx)
+
+    def unmarshal_unix_fd(raw):
+        idx = u(raw)
+        if not raw.unix_fds or idx >= len(raw.unix_fds):
+            raise MessageError(
+                'unmarshal %s: %d is not a valid index for fds' %
+                (typ.name, idx))
+        return raw.unix_fds[idx]
+    return marshal_unix_fd, unmarshal_unix_fd
+
+
+def _compile_run(codes, bo):
+    """Compile a run of fixed types into one struct call.
+
+    The padding between the values depends on the position of the run
+    modulo 8, so there is one layout for each possible start position.
+    If anything goes wrong the values are (un)marshalled one by one
+    to get the same errors as with the single types.
+    """
+    singles = [_compile_one((t, None), bo, False, 0)[:2] for t in codes]
+    bool_idx = [i for i, t in enumerate(codes) if t == 'b']
+    layouts = [None] * 8
+
+    def layout(offset):
+        if layouts[offset] is None:
+            fmt, pos, pads = bo, offset, []
+            for t in codes:
+                typ = types[t]
+                pad = -pos % typ.alignment
+                if pad:
+                    fmt += '%dx' % pad
+                    pads.extend(range(pos - offset, pos - offset + pad))
+                fmt += typ.code
+                pos += pad + typ.size
+            layouts[offset] = struct.Struct(fmt), pads
+        return layouts[offset]
+
+    def marshal_run(raw, data):
+        for i in bool_idx:
+            if not isinstance(data[i], bool):
+                break
+        else:
+            try:
+                raw.write(layout(raw.tell() % 8)[0].pack(*data))
+                return
+            except struct.error:
+                pass
+        for (m, _), d in zip(singles, data):
+            m(raw, d)  # raises the appropriate error
+
+    def unmarshal_run(raw):
+        pos = raw.tell()
+        st, pads = layout(pos % 8)
+        b = raw.read(st.size)
+        if len(b) == st.size and not any(b[i] for i in pads):
+            values = st.unpack(b)
+            if not bool_idx:
+                return values
+            if all(values[i] in (0, 1) for i in bool_idx):
+                values = list(values)
+                for i in bool_idx:
+                    values[i] = bool(values[i])
+                return tuple(values)
+        raw.seek(pos)
+        # raises the appropriate error
+        return tuple(u(raw) for _, u in singles)
+    return marshal_run, unmarshal_run
+
+
+def _compile_string(typ, bo, validate_func=None):
+    len_st = struct.Struct(bo + typ.len_type.code)
+    len_pack, len_alignment = len_st.pack, typ.len_type.alignment
+    _, len_unmarshal = _compile_fixed(typ.len_type, bo)
+    alignment = typ.alignment
+    validate_func = validate_func or typ.validate_func
+
+    def marshal_string(raw, data):
+        if validate_func:
+            validate_func(data)
+        raw.write_padding(alignment)
+        try:
+            # encoding=UTF-8, errors=strict
+            d = data.encode()
+        except UnicodeError as ex:
+            raise MessageError('marshal %s %r: %s' %
+                               (typ.name, data, ex)) from ex
+        try:
+            raw.write(len_pack(len(d)) + d + b'\x00')
+        except struct.error as ex:
+            raise MessageError('marshal %s %r: %s' %
+                               (typ.len_type.name, len(d), ex)) from ex
+
+    def unmarshal_string(raw):
+        value = raw.read_string(len_st, len_alignment)
+        if value is None:
+            return unmarshal_slow(raw)  # raises the appropriate error
+        try:
+            # encoding=UTF-8, errors=strict
+            s = value.decode()
+        except UnicodeError as ex:
+            raise MessageError('unmarshal %s %r: %s' %
+                               (typ.name, value, ex)) from ex
+        if validate_func:
+            validate_func(s)
+        return s
+
+    def unmarshal_slow(raw):
+        length = len_unmarshal(raw)
+        try:
+            # encoding=UTF-8, errors=strict
+            value = raw.read(length)
+            s = str(value, 'utf-8')
+        except UnicodeError as ex:
+            raise MessageError('unmarshal %s %r: %s' %
+                               (typ.name, bytes(value), ex)) from ex
+        if validate_func:
+            validate_func(s)
+        b = raw.read(1)
+        if not b or b[0]:
+            raise MessageError('no NUL byte after string: %s' % bytes(b))
+        return s
+    return marshal_string, unmarshal_string
+
+
+def _compile_variant(bo, compact, level):
+    def validate_signature(sig):
+        # validation by compiling the signature
+        try:
+            compile_signature(sig, bo)
+        except SignatureError as ex:
+            raise ValidationError('not a valid signature: %r' % sig) from ex
+
+    sig_marshal, sig_unmarshal = _compile_string(types['g'], bo,
+                                                 validate_signature)
+
+    def marshal_variant(raw, data):
+        with raw.nesting_depth(level + 1):
+            if len(data) != 2:
+                raise MessageError('variant Python tuple must have 2 elements')
+            if not isinstance(data[0], str):
+                raise SignatureError('must be of type str, not %s' %
+                                     data[0].__class__.__name__)
+            codec = compile_signature(data[0], bo)
+            if len(codec) != 1:
+                raise MessageError(
+                    'variant signature must be a single complete type')
+            sig_marshal(raw, data[0])
+            codec.marshal(raw, (data[1],))
+
+    def unmarshal_variant(raw):
+        with raw.nesting_depth(level + 1):
+            signature = sig_unmarshal(raw)
+            codec = compile_signature(signature, bo, compact)
+            if len(codec) != 1:
+                raise MessageError(
+                    'variant signature must be a single complete type')
+            if raw.variant_signatures:
+                return signature, codec.unmarshal(raw)[0]
+            return codec.unmarshal(raw)[0]
+    return marshal_variant, unmarshal_variant
+
+
+def _compile_array(el_ct, bo, compact, level):
+    el_marshal, el_unmarshal, el_alignment, el_depth = _compile_one(
+        el_ct, bo, compact, level + 1)
+    len_type = types['u']
+    len_marshal, len_unmarshal = _compile_fixed(len_type, bo)
+    alignment = len_type.alignment
+    is_dict = el_ct[0] == 'e'
+    is_bytes = el_ct[0] == 'y'
+    if el_ct[0] in _PACKABLE:
+        bulk_marshal, bulk_unmarshal = _compile_bulk(el_ct[0], bo, compact)
+    else:
+        bulk_marshal = bulk_unmarshal = None
+
+    def marshal_array(raw, data):
+        if is_dict and isinstance(data, dict):
+            data = data.items()
+        elif is_bytes and isinstance(data, (bytes, bytearray)):
+            pass
+        elif not isinstance(data, (list, array.array)):
+            raise MessageError('wrong Python type for array: %r' %
+                               type(data))
+        raw.write_padding(alignment)
+        pos = raw.tell()
+        raw.write_nul_bytes(len_type.size)  # placeholder for length
+        raw.write_padding(el_alignment)
+        start_pos = raw.tell()
+        if not (bulk_marshal and bulk_marshal(raw, data)):
+            for v in data:
+                el_marshal(raw, v)
+        length = raw.tell() - start_pos
+        if length > MAX_ARRAY_LEN:
+            raise TooLongError('array too long: %d bytes' % length)
+        raw.set_value(pos, len_type, length)  # set length
+
+    def unmarshal_array(raw):
+        raw.skip_padding(alignment)
+        length = len_unmarshal(raw)
+        if length > MAX_ARRAY_LEN:
+            raise TooLongError('array too long: %d bytes' % length)
+        raw.skip_padding(el_alignment)
+        if bulk_unmarshal:
+            value = bulk_unmarshal(raw, length)
+            if value is not None:
+                return value
+        end_pos = raw.tell() + length
+        lst = []
+        while raw.tell() < end_pos:
+            lst.append(el_unmarshal(raw))
+        if is_dict:
+            return dict(lst)
+        return lst
+    return marshal_array, unmarshal_array, alignment, el_depth + 1
+
+
+# mapping: dbus type code -> array.array type code
+_ARRAY_CODES = {t: c for t, c in
+                (('y', 'B'), ('n', 'h'), ('q', 'H'), ('i', 'i'), ('u', 'I'),
+                 ('x', 'q'), ('t', 'Q'), ('d', 'd'))
+                if array.array(c).itemsize == types[t].size}
+_NATIVE_CODE = '<' if sys.byteorder == 'little' else '>'
+
+
+def _compile_bulk(t, bo, compact):
+    """Compile the (un)marshalling of a whole array of a fixed type.
+
+    The functions return ``False`` and ``None`` resp. if the array
+    must be (un)marshalled element by element (e.g. to raise the
+    appropriate error).
+    """
+    code, size = types[t].code, types[t].size
+    array_code = _ARRAY_CODES.get(t)
+    swap = bo != _NATIVE_CODE
+
+    def marshal_bulk(raw, data):
+        if len(data) * size > MAX_ARRAY_LEN:
+            return False
+        if isinstance(data, (bytes, bytearray)):
+            raw.write(data)
+            return True
+        if isinstance(data, array.array) and data.typecode == array_code:
+            if swap:
+                data = array.array(array_code, data)
+                data.byteswap()
+            raw.write(data)
+            return True
+        if t == 'b' and not all(isinstance(v, bool) for v in data):
+            return False
+        try:
+            if t == 'y':
+                b = bytes(data)
+            else:
+                b = struct.pack('%s%d%s' % (bo, len(data), code), *data)
+        except (struct.error, ValueError, TypeError):
+            return False
+        raw.write(b)
+        return True
+
+    def unmarshal_bulk(raw, length):
+        if length % size:
+            return None
+        pos = raw.tell()
+        b = raw.read(length)
+        if len(b) != length:
+            raw.seek(pos)
+            return None
+        if compact and array_code:
+            if t == 'y':
+                return bytes(b)
+            a = array.array(array_code)
+            a.frombytes(b)
+            if swap:
+                a.byteswap()
+            return a
+        if t == 'y':
+            return list(b)
+        lst = list(struct.unpack('%s%d%s' % (bo, length // size, code), b))
+        if t == 'b':
+            if not all(v in (0, 1) for v in lst):
+                raw.seek(pos)
+                return None
+            return [bool(v) for v in lst]
+        return lst
+    return marshal_bulk, unmarshal_bulk
+
+
+def _compile_struct(cts, bo, compact, level):
+    seq_marshal, seq_unmarshal, depth = _compile_seq(cts, bo, compact,
+                                                     level + 1)
+    alignment = types['r'].alignment
+    n = len(cts)
+
+    def marshal_struct(raw, data):
+        if not isinstance(data, tuple):
+            raise MessageError('tuple expected not %r' % type(data))
+        raw.write_padding(alignment)
+        if n != len(data):
+            raise MessageError('length: signature %d, args %d' %
+                               (n, len(data)))
+        seq_marshal(raw, data)
+
+    def unmarshal_struct(raw):
+        raw.skip_padding(alignment)
+        return seq_unmarshal(raw)
+    return marshal_struct, unmarshal_struct, alignment, depth + 1
@@ -12,8 +12,9 @@ from threading import Lock
 
 from .const import MAJOR_PROTOCOL_VERSION, MIN_HEADER_SIZE
 from .errors import MessageError, DBusError
-from .raw import RawData
+from .raw import RawReader, RawWriter
 from .marshal import types, marshal, unmarshal
+from .signature import Signature
 from .validate import (validate_object_path, validate_interface_name,
                        validate_member_name, validate_error_name,
                        validate_serial, validate_bus_name,
@@ -21,6 +22,9 @@ from .validate import (validate_object_path, validate_interface_name,
 
 HEADER_ALIGNMENT = 8
 
+# size of the UNIX_FDS header field: (y, (g, u))
+_UNIX_FDS_FIELD_SIZE = 8
+
 __all__ = [
     'Byteorder',
     'MessageType',
@@ -232,12 +236,86 @@ class Message:
         self.length = -1
         self.fields = _validate_type(fields, HeaderFields, 'fields')
         self.fields.check(self.message_type)
-        self.body = _validate_type(body, tuple, 'body')
+        self._body = _validate_type(body, tuple, 'body')
+        self._lazy_body = None
         with Message._lock:
             self.serial = Message._next_serial
             Message._next_serial += 1
         self.unix_fds_cnt = -1
+        self._unix_fds = []
         self._info = None
+        self._has_info = False
+
+    @property
+    def body(self):
+        """Return the body of this message as a tuple.
+
+        If the message was created with :meth:`from_bytes` with
+        ``lazy=True``, the body will be unmarshalled on first access.
+
+        :raises ~dcar.MessageError: if the body could not be unmarshalled
+        """
+        if self._body is None:
+            # the lazy body is kept for unmarshal_body() and to_buffer()
+            self._body = self._lazy_body.unmarshal()
+        return self._body
+
+    def unmarshal_body(self, variant_signatures=False):
+        """Unmarshal the body again without changing this message.
+
+        If ``variant_signatures`` is ``True``, VARIANTs are unmarshalled as
+        tuples ``(signature, value)`` (see :class:`~dcar.raw.RawData`).
+        This needs the raw body of a message created with
+        :meth:`from_bytes` with ``lazy=True``; for other messages
+        :attr:`body` is returned if ``variant_signatures`` is ``False``.
+
+        :param bool variant_signatures: whether to keep the signatures of
+                                        VARIANTs
+        :raises ~dcar.MessageError: if the body could not be unmarshalled
+                                    or there is no raw body
+        """
+        if self._lazy_body is not None:
+            return self._lazy_body.unmarshal(variant_signatures)
+        if variant_signatures:
+            raise MessageError('no raw body')
+        return self.body
+
+    @property
+    def unix_fds(self):
+        """Return the list of unix file descriptors received with this
+        message (empty if it was not created with :meth:`from_bytes`).
+
+        The receiver is responsible for closing them.
+        """
+        return self._unix_fds
+
+    def detach(self):
+        """Copy the data this message still needs out of the buffer it
+        was created from.
+
+        A message created with :meth:`from_bytes` with ``lazy=True``
+        refers to the buffer; after this call the buffer can be reused.
+        If the body has already been unmarshalled, the raw body is dropped
+        instead (:meth:`unmarshal_body` will not work anymore).
+        """
+        if self._lazy_body is not None:
+            if self._body is None:
+                self._lazy_body.detach()
+            else:
+                self._lazy_body = None
+
+    def leading_args(self, n):
+        """Return the first n arguments of the body as a tuple.
+
+        If the body has not been unmarshalled yet, only these arguments
+        will be unmarshalled (e.g. for matching signals).
+
+        :param int n: number of arguments
+        :raises ~dcar.MessageError: if the arguments could not be unmarshalled
+        """
+        if self._body is None:
+            return self._lazy_body.leading_args(n)
+        return self._body[:n]
 
     @property
     def info(self):
@@ -245,6 +323,15 @@ class Message:
 
         Only available for messages of type METHOD_CALL and SIGNAL.
         """
+        if self._info is None and self._has_info:
+            fields = self.fields
+            self._info = MessageInfo(
+                 self.serial, self.body, fields[HeaderField.PATH],
+                 fields[HeaderField.INTERFACE], fields[HeaderField.MEMBER],
+                 fields[HeaderField.SENDER],
+                 bool(self.flags & HeaderFlag.NO_REPLY_EXPECTED),
+                 bool(self.flags & HeaderFlag.ALLOW_INTERACTIVE_AUTHORIZATION),
+                 self.message_type is MessageType.SIGNAL)
         return self._info
 
     @property
@@ -269,21 +356,31 @@ class Message:
             raise DBusError(self.fields[HeaderField.ERROR_NAME], *self.body)
 
     @classmethod
-    def from_bytes(cls, raw):
+    def from_bytes(cls, raw, lazy=False):
         """Create a new message object from bytes.
 
-        :param RawData raw: raw message data
+        A :class:`~dcar.raw.RawReader` avoids copying the data while
+        unmarshalling.
+
+        If ``lazy`` is ``True`` only the header will be unmarshalled here
+        and the body on first access of :attr:`body` (or :attr:`info`).
+        The raw data must not be changed after that.
+
+        :param raw: raw message data
+        :type raw: ~dcar.raw.RawData or ~dcar.raw.RawReader
+        :param bool lazy: whether to unmarshal the body lazily
         :raises ~dcar.MessageError: if the message could not be created
         """
         raw.seek(0)
-        byteorder = Byteorder(raw.read(1))
+        start = bytes(raw.read(4))
+        byteorder = Byteorder(start[:1])
         raw.byteorder = byteorder
         try:
-            message_type = MessageType(raw.read(1))
+            message_type = MessageType(start[1:2])
         except ValueError:
             message_type = MessageType.INVALID
-        flags = HeaderFlag.from_byte(raw.read(1))
-        protocol = raw.read(1)
+        flags = HeaderFlag.from_byte(start[2:3])
+        protocol = start[3:4]
         if protocol != MAJOR_PROTOCOL_VERSION:
             raise MessageError('protocol version error: found %r - allowed %r' %
                                (protocol, MAJOR_PROTOCOL_VERSION))
@@ -295,10 +392,12 @@ class Message:
                                                   HeaderFields.signature)[0])
         fields.check(message_type)
         raw.skip_padding(HEADER_ALIGNMENT)
-        body = unmarshal(raw, fields[HeaderField.SIGNATURE])
-        b = raw.read()
-        if b:
-            raise MessageError('too much data: %r' % b)
+        if lazy:
+            body = None
+            lazy_body = _LazyBody(raw, fields[HeaderField.SIGNATURE])
+        else:
+            body = _unmarshal_body(raw, fields[HeaderField.SIGNATURE])
+            lazy_body = None
         obj = super().__new__(cls)
         obj.byteorder = byteorder
         obj.message_type = message_type
@@ -307,56 +406,173 @@ class Message:
         obj.length = length
         obj.serial = serial
         obj.fields = fields
-        obj.body = body
+        obj._body = body
+        obj._lazy_body = lazy_body
         obj.unix_fds_cnt = len(raw.unix_fds)
-        if message_type in (MessageType.METHOD_CALL, MessageType.SIGNAL):
-            obj._info = MessageInfo(
-                 serial, body, fields[HeaderField.PATH],
-                 fields[HeaderField.INTERFACE], fields[HeaderField.MEMBER],
-                 fields[HeaderField.SENDER],
-                 bool(flags & HeaderFlag.NO_REPLY_EXPECTED),
-                 bool(flags & HeaderFlag.ALLOW_INTERACTIVE_AUTHORIZATION),
-                 message_type is MessageType.SIGNAL)
+        obj._unix_fds = raw.unix_fds
+        obj._info = None
+        obj._has_info = message_type in (MessageType.METHOD_CALL,
+                                         MessageType.SIGNAL)
         return obj
 
     def to_bytes(self):
         """Convert this message to bytes.
 
+        :returns: the message data and the list of unix file descriptors
+        :rtype: bytes, list
+        :raises ~dcar.MessageError: if the message could not be converted
+        """
+        buf, unix_fds = self.to_buffer()
+        return bytes(buf), unix_fds
+
+    def to_buffer(self):
+        """Convert this message to a buffer.
+
+        Header and body are marshalled into one :class:`bytearray`
+        (see :class:`~dcar.raw.RawWriter`), so unlike :meth:`to_bytes`
+        the data is not copied.
+
+        If the message was created with :meth:`from_bytes` with
+        ``lazy=True`` and it still has its raw body (see :meth:`detach`),
+        the raw body is copied instead (e.g. for forwarding a message with
+        changed header fields).
+
+        :returns: the message data and the list of unix file descriptors
+        :rtype: bytearray, list
         :raises ~dcar.MessageError: if the message could not be converted
         """
         signature = self.fields[HeaderField.SIGNATURE]
-        if signature and not self.body or not signature and self.body:
+        lazy_body = self._lazy_body
+        if lazy_body is not None and lazy_body.byteorder is not self.byteorder:
+            lazy_body = None
+        if lazy_body is None and (signature and not self.body or
+                                  not signature and self.body):
             raise MessageError('signature and no body or no signature and body')
-        rawhead = RawData()
-        rawhead.byteorder = self.byteorder
-        rawhead.write(self.byteorder.value)
-        rawhead.write(self.message_type.value)
-        rawhead.write(self.flags.to_byte())
-        rawhead.write(self.protocol)
-        rawbody = RawData()
-        rawbody.byteorder = self.byteorder
-        marshal(rawbody, self.body, signature)
-        self.length = len(rawbody.getvalue())
-        types['u'].marshal(rawhead, self.length)
-        types['u'].marshal(rawhead, self.serial)
-        self.unix_fds_cnt = len(rawbody.unix_fds)
-        if rawbody.unix_fds:
+        raw = RawWriter()
+        raw.byteorder = self.byteorder
+        raw.write(self.byteorder.value)
+        raw.write(self.message_type.value)
+        raw.write(self.flags.to_byte())
+        raw.write(self.protocol)
+        types['u'].marshal(raw, 0)  # placeholder for length
+        types['u'].marshal(raw, self.serial)
+        fields = self.fields.to_list()
+        # The number of unix fds is only known after marshalling the body.
+        # If there can be any, a placeholder for the UNIX_FDS field (always
+        # the last one) is added and removed again if it is not needed.
+        # Unix fds in variants are rare, so the field is inserted afterwards.
+        unix_fds_placeholder = (lazy_body is None and
+                                signature and 'h' in signature and
+                                self.fields[HeaderField.UNIX_FDS] is None)
+        has_unix_fds_field = unix_fds_placeholder or bool(fields) and (
+            fields[-1][0] == HeaderField.UNIX_FDS.value)
+        marshal(raw, (fields,), HeaderFields.signature)
+        if unix_fds_placeholder:
+            # end of the fields without the placeholder and its padding
+            placeholder_start = raw.tell()
+            marshal(raw, ((HeaderField.UNIX_FDS.value, ('u', 0)),), '(yv)')
+            raw.set_value(MIN_HEADER_SIZE - 4, types['u'],
+                          raw.tell() - MIN_HEADER_SIZE)
+        fields_end = raw.tell()
+        raw.write_padding(HEADER_ALIGNMENT)
+        body_start = raw.tell()
+        if lazy_body is not None:
+            raw.write(lazy_body.getbuffer())
+            raw.unix_fds = lazy_body.unix_fds
+            self.length = raw.tell() - body_start
+            raw.set_value(4, types['u'], self.length)
+            return raw.getbuffer(), raw.unix_fds
+        marshal(raw, self.body, signature)
+        self.length = raw.tell() - body_start
+        raw.set_value(4, types['u'], self.length)
+        self.unix_fds_cnt = len(raw.unix_fds)
+        if raw.unix_fds:
             self.fields[HeaderField.UNIX_FDS] = self.unix_fds_cnt
-        marshal(rawhead, (self.fields.to_list(),), HeaderFields.signature)
-        rawhead.write_padding(HEADER_ALIGNMENT)
-        return rawhead.getvalue() + rawbody.getvalue(), rawbody.unix_fds
+            if has_unix_fds_field:
+                raw.set_value(fields_end - 4, types['u'], self.unix_fds_cnt)
+            else:
+                field = RawWriter()
+                field.byteorder = self.byteorder
+                marshal(field, ((HeaderField.UNIX_FDS.value,
+                                 ('u', self.unix_fds_cnt)),), '(yv)')
+                raw.insert(body_start, field.getbuffer())
+                raw.set_value(MIN_HEADER_SIZE - 4, types['u'],
+                              body_start + field.tell() - MIN_HEADER_SIZE)
+        elif unix_fds_placeholder:
+            # the field is an aligned struct of 8 bytes; the padding before
+            # it stays and pads the header, but is not part of the array
+            raw.delete(fields_end - _UNIX_FDS_FIELD_SIZE, _UNIX_FDS_FIELD_SIZE)
+            raw.set_value(MIN_HEADER_SIZE - 4, types['u'],
+                          placeholder_start - MIN_HEADER_SIZE)
+        return raw.getbuffer(), raw.unix_fds
 
     def __repr__(self):
         args = self.__dict__.copy()
+        args['body'] = self.body
         args['class_name'] = self.__class__.__name__
         return ('<%(class_name)s: %(byteorder)r, %(message_type)r, %(flags)r, '
                 '%(protocol)r, length=%(length)r, serial=%(serial)r, '
                 '%(fields)r, %(body)r, %(unix_fds_cnt)s>') % args
 
 
+def _unmarshal_body(raw, signature):
+    body = unmarshal(raw, signature)
+    b = raw.read()
+    if b:
+        raise MessageError('too much data: %r' % bytes(b))
+    return body
+
+
+class _LazyBody:
+    """Body of a message which is unmarshalled on demand.
+
+    Each unmarshalling uses its own :class:`~dcar.raw.RawReader`,
+    so it can be done concurrently.
+    """
+
+    def __init__(self, raw, signature):
+        self._buf = raw.getbuffer()
+        self._pos = raw.tell()
+        self.byteorder = raw.byteorder
+        self._compact_arrays = raw.compact_arrays
+        self.unix_fds = raw.unix_fds
+        self._signature = signature
+        self._leading_args = ()
+
+    def _reader(self):
+        raw = RawReader(self._buf)
+        raw.byteorder = self.byteorder
+        raw.compact_arrays = self._compact_arrays
+        raw.unix_fds = self.unix_fds
+        raw.seek(self._pos)
+        return raw
+
+    def getbuffer(self):
+        """Return the raw body."""
+        return self._buf[self._pos:]
+
+    def detach(self):
+        self._buf = memoryview(bytes(self._buf[self._pos:]))
+        self._pos = 0
+
+    def unmarshal(self, variant_signatures=False):
+        raw = self._reader()
+        raw.variant_signatures = variant_signatures
+        return _unmarshal_body(raw, self._signature)
+
+    def leading_args(self, n):
+        args = self._leading_args
+        if len(args) < n and self._signature:
+            cts = tuple(Signature.get(self._signature))
+            if len(args) < len(cts):
+                args = unmarshal(self._reader(), cts[:n])
+                self._leading_args = args
+        return args[:n]
+
+
 def get_sizes(raw):
     """Get sizes from raw message data."""
-    raw.byteorder = Byteorder(raw.read(1))
+    raw.byteorder = Byteorder(bytes(raw.read(1)))
     raw.read(3)  # skip bytes
     body_size = types['u'].unmarshal(raw)
     raw.read(4)  # skip bytes
@@ -368,8 +584,75 @@ def get_sizes(raw):
 
 def get_unix_fds_cnt(raw):
     """Get number of unix file descriptors from raw message data."""
-    raw.byteorder = Byteorder(raw.read(1))
+    raw.byteorder = Byteorder(bytes(raw.read(1)))
     raw.read(11)  # skip bytes
     fields = HeaderFields.from_list(unmarshal(raw,
                                               HeaderFields.signature)[0])
     return fields[HeaderField.UNIX_FDS] or 0
+
+
+def method_call_message(object_path, interface, method_name, destination,
+                        sender, signature, args, no_auto_start=False,
+                        allow_interactive_authorization=False):
+    """Create a message of type METHOD_CALL.
+
+    See :meth:`dcar.Bus.method_call` for the parameters.
+    """
+    header_fields = HeaderFields()
+    header_fields[HeaderField.PATH] = object_path
+    header_fields[HeaderField.INTERFACE] = interface
+    header_fields[HeaderField.MEMBER] = method_name
+    header_fields[HeaderField.DESTINATION] = destination
+    header_fields[HeaderField.SENDER] = sender
+    header_fields[HeaderField.SIGNATURE] = signature
+    flags = HeaderFlag.NONE
+    if no_auto_start:
+        flags |= HeaderFlag.NO_AUTO_START
+    if allow_interactive_authorization:
+        flags |= HeaderFlag.ALLOW_INTERACTIVE_AUTHORIZATION
+    return Message(MessageType.METHOD_CALL, flags, header_fields, args)
+
+
+def method_return_message(reply_serial, destination, sender, signature, args):
+    """Create a message of type METHOD_RETURN.
+
+    See :meth:`dcar.Bus.method_return` for the parameters.
+    """
+    header_fields = HeaderFields()
+    header_fields[HeaderField.REPLY_SERIAL] = reply_serial
+    header_fields[HeaderField.DESTINATION] = destination
+    header_fields[HeaderField.SENDER] = sender
+    header_fields[HeaderField.SIGNATURE] = signature
+    return Message(MessageType.METHOD_RETURN, HeaderFlag.NONE,
+                   header_fields, args)
+
+
+def error_message(error_name, reply_serial, destination, sender, signature,
+                  args):
+    """Create a message of type ERROR.
+
+    See :meth:`dcar.Bus.send_error` for the parameters.
+    """
+    header_fields = HeaderFields()
+    header_fields[HeaderField.ERROR_NAME] = error_name
+    header_fields[HeaderField.REPLY_SERIAL] = reply_serial
+    header_fields[HeaderField.DESTINATION] = destination
+    header_fields[HeaderField.SENDER] = sender
+    header_fields[HeaderField.SIGNATURE] = signature
+    return Message(MessageType.ERROR, HeaderFlag.NONE, header_fields, args)
+
+
+def signal_message(object_path, interface, signal_name, destination, sender,
+                   signature, args):
+    """Create a message of type SIGNAL.
+
+    See :meth:`dcar.Bus.emit_signal` for the parameters.
+    """
+    header_fields = HeaderFields()
+    header_fields[HeaderField.PATH] = object_path
+    header_fields[HeaderField.INTERFACE] = interface
+    header_fields[HeaderField.MEMBER] = signal_name
+    header_fields[HeaderField.DESTINATION] = destination
+    header_fields[HeaderField.SENDER] = sender
+    header_fields[HeaderField.SIGNATURE] = signature
+    return Message(MessageType.SIGNAL, HeaderFlag.NONE, header_fields, args)
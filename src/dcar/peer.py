@@ -0,0 +1,154 @@
+"""Peer-to-peer connections.
+
+Two processes can exchange messages directly over a private socket
+without a message bus: one side runs a :class:`Server`, the other side
+connects to its address with a :class:`Peer`. On the server side every
+accepted connection is also a :class:`Peer`.
+
+Example::
+
+    def new_peer(peer):
+        peer.register_method('/obj', 'org.example.Iface', 'Echo',
+                             echo_handler, 's')
+
+    with Server(new_peer) as server:
+        with Peer(server.address) as peer:
+            peer.method_call('/obj', 'org.example.Iface', 'Echo', None,
+                             signature='s', args=('hello',))
+"""
+
+import logging
+
+from .bus import Bus
+from .const import DEFAULT_TIMEOUT_VALUE
+from .errors import TransportError
+from .server import Listener
+from .transports import ServerTransport, connect
+
+__all__ = ['Peer', 'Server']
+
+_logger = logging.getLogger(__name__)
+
+
+class Peer(Bus):
+    """A peer-to-peer connection.
+
+    This is a :class:`~dcar.Bus` without a message bus: no *Hello*
+    message is sent (so there is no :attr:`~dcar.Bus.unique_name`),
+    the ``destination`` of messages can be ``None``, and signals are
+    matched only locally (no *AddMatch* and *RemoveMatch* messages). After
+    reconnecting (see parameter ``reconnect`` of :class:`~dcar.Bus`) there
+    is no session to restore.
+
+    :param address: address of a :class:`Server` (``None`` for peers
+                    created by a server)
+    :type address: str or ~dcar.address.Address
+    :param kwargs: the same keyword arguments as for :class:`~dcar.Bus`
+    """
+
+    def __init__(self, address=None, **kwargs):
+        super().__init__(address, **kwargs)
+
+    def connect(self):
+        """Connect to the server.
+
+        :raises ~dcar.AuthenticationError: if authentication failed
+        :raises ~dcar.TransportError: if connection failed or this
+                                      peer was created by a server
+        """
+        if self.connected:
+            return
+        if self._addr is None:
+            raise TransportError('peers of a server cannot reconnect')
+        self._transport, self._address = connect(self._addr, self._router)
+        self._transport.authenticate()
+        self._transport.start_loops()
+
+    def register_signal(self, rule, handler, unicast=False,
+                        timeout=DEFAULT_TIMEOUT_VALUE):
+        """Register a signal.
+
+        See :meth:`~dcar.Bus.register_signal`; ``unicast`` and ``timeout``
+        are ignored.
+        """
+        return self._router.signals.add(rule, handler, False)
+
+    def unregister_signal(self, reg_id, timeout=DEFAULT_TIMEOUT_VALUE):
+        """Unregister a signal.
+
+        See :meth:`~dcar.Bus.unregister_signal`; ``timeout`` is ignored.
+        """
+        self._router.signals.remove(reg_id)
+
+    def _restore(self, timeout):
+        """Do nothing (there is no session to restore)."""
+
+    def _accept(self, sock, guid, allow_anonymous):
+        transport = ServerTransport(sock, self._router, guid,
+                                    allow_anonymous)
+        transport.authenticate()
+        self._transport = transport
+
+
+class Server(Listener):
+    """Server for peer-to-peer connections.
+
+    For every accepted and authenticated connection a :class:`Peer` is
+    created and ``handler`` is called with it in a separate thread (e.g.
+    for registering methods and signals). Incoming messages are handled
+    after the handler returned, so it must not wait for replies. The peer
+    stays connected until either side disconnects.
+
+    The keyword arguments are passed to each :class:`Peer` except
+    ``handler_executor``: each peer gets its own
+    :class:`~dcar.HandlerExecutor`.
+
+    See :class:`~dcar.server.Listener` for the other parameters.
+
+    :param callable handler: function that takes a :class:`Peer`
+    :param kwargs: keyword arguments for :class:`Peer`
+    :raises TypeError: if ``handler_executor`` is in ``kwargs``
+    """
+
+    def __init__(self, handler, address=None, *, allow_anonymous=False,
+                 **kwargs):
+        if 'handler_executor' in kwargs:
+            raise TypeError('handler_executor not allowed')
+        super().__init__(address, allow_anonymous=allow_anonymous)
+        self._handler = handler
+        self._peer_kwargs = kwargs
+        self._peers = set()
+
+    @property
+    def peers(self):
+        """Return a list with the connected peers."""
+        with self._lock:
+            return [peer for peer in self._peers if peer.connected]
+
+    def _handle_connection(self, sock):
+        peer = Peer(None, **self._peer_kwargs)
+        try:
+            peer._accept(sock, self.guid, self._allow_anonymous)
+        except Exception:
+            _logger.debug('authentication failed', exc_info=True)
+            sock.close()
+            return
+        with self._lock:
+            if not self.running:
+                peer.disconnect()
+                return
+            self._peers = {p for p in self._peers if p.connected}
+            self._peers.add(peer)
+        try:
+            self._handler(peer)
+        except Exception:
+            _logger.error('handler %r failed', self._handler, exc_info=True)
+        if peer.connected:
+            peer._transport.start_loops()
+
+    def _close_connections(self):
+        with self._lock:
+            peers = list(self._peers)
+            self._peers.clear()
+        for peer in peers:
+            peer.disconnect()
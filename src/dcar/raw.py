@@ -1,20 +1,23 @@
 """Raw message data."""
 
 import io
+import struct
 from contextlib import contextmanager
 
 from .const import MAX_MESSAGE_LEN, MAX_MSG_UNIX_FDS, MAX_VARIANT_NESTING_DEPTH
 from .errors import MessageError, TooLongError
 
-__all__ = ['RawData']
+__all__ = ['RawData', 'RawReader', 'RawWriter']
 
 
-class RawData(io.BytesIO):
-    """Raw messge data."""
+class _RawMixin:
+    """Mixin class with the common parts of :class:`RawData` and
+    :class:`RawReader`."""
 
-    def __init__(self, initial_bytes=b''):
-        super().__init__(initial_bytes)
+    def _init_raw(self):
         self.byteorder = None
+        self.compact_arrays = False
+        self.variant_signatures = False
         self._unix_fds = []
         self._nesting_depth = 0
 
@@ -30,12 +33,45 @@ class RawData(io.BytesIO):
             raise TooLongError('too many unix fds: %d' % len(fds))
         self._unix_fds = fds
 
-    def write(self, b):
-        """Write bytes."""
-        n = super().write(b)
-        if self.tell() > MAX_MESSAGE_LEN:
-            raise TooLongError('message too long: %d bytes' % self.tell())
-        return n
+    def skip_padding(self, alignment):
+        """Skip padding bytes."""
+        b = self.read(self._padding_len(alignment))
+        if any(b):
+            raise MessageError('none-NUL byte in padding: %s' % bytes(b))
+
+    def _padding_len(self, alignment):
+        x = self.tell() % alignment
+        if x:
+            return alignment - x
+        return 0
+
+    def __repr__(self):
+        return '<%s: byteorder=%s>' % (self.__class__.__name__,
+                                       self.byteorder.name
+                                       if self.byteorder is not None else None)
+
+    @contextmanager
+    def nesting_depth(self, n=1):
+        """Context manager for checking the nesting depth of variants.
+
+        :param int n: number of nesting levels to enter
+        """
+        self.check_nesting_depth(n)
+        self._nesting_depth += n
+        try:
+            yield
+        finally:
+            self._nesting_depth -= n
+
+    def check_nesting_depth(self, n):
+        """Check whether n more nesting levels are allowed."""
+        if self._nesting_depth + n > MAX_VARIANT_NESTING_DEPTH:
+            raise MessageError('nesting depth > %d' % MAX_VARIANT_NESTING_DEPTH)
+
+
+class _WriteMixin:
+    """Mixin class with the common parts of :class:`RawData` and
+    :class:`RawWriter` for marshalling."""
 
     def write_nul_bytes(self, n):
         """Write n NUL bytes."""
@@ -45,18 +81,6 @@ class RawData(io.BytesIO):
         """Write padding bytes."""
         self.write_nul_bytes(self._padding_len(alignment))
 
-    def skip_padding(self, alignment):
-        """Skip padding bytes."""
-        b = self.read(self._padding_len(alignment))
-        if any(list(b)):
-            raise MessageError('none-NUL byte in padding: %s' % b)
-
-    def set_value(self, pos, fixed_type, value):
-        """Set value at position pos."""
-        self.seek(pos)
-        fixed_type.marshal(self, value)
-        self.seek(0, io.SEEK_END)
-
     def add_unix_fd(self, fd):
         """Add unix file descriptor."""
         if fd in self._unix_fds:
@@ -68,24 +92,235 @@ class RawData(io.BytesIO):
                 raise TooLongError('too many unix fds: %d' % fd_cnt)
             return fd_cnt - 1
 
-    def _padding_len(self, alignment):
-        x = self.tell() % alignment
-        if x:
-            return alignment - x
-        return 0
 
-    def __repr__(self):
-        return '<%s: byteorder=%s>' % (self.__class__.__name__,
-                                       self.byteorder.name
-                                       if self.byteorder is not None else None)
+class RawData(_RawMixin, _WriteMixin, io.BytesIO):
+    """Raw messge data.
 
-    @contextmanager
-    def nesting_depth(self):
-        """Context manager for checking the nesting depth of variants."""
-        self._nesting_depth += 1
-        if self._nesting_depth > MAX_VARIANT_NESTING_DEPTH:
-            raise MessageError('nesting depth > %d' % MAX_VARIANT_NESTING_DEPTH)
+    If the attribute ``compact_arrays`` is set to ``True``, unmarshalled
+    arrays of BYTEs will be :class:`bytes` objects and arrays of other
+    numeric fixed types (all except BOOLEAN and UNIX_FD) will be
+    :class:`array.array` objects instead of lists.
+
+    If the attribute ``variant_signatures`` is set to ``True``, unmarshalled
+    VARIANTs will be tuples ``(signature, value)`` (as for marshalling)
+    instead of just the values.
+    """
+
+    def __init__(self, initial_bytes=b''):
+        super().__init__(initial_bytes)
+        self._init_raw()
+
+    def write(self, b):
+        """Write bytes."""
+        n = super().write(b)
+        if self.tell() > MAX_MESSAGE_LEN:
+            raise TooLongError('message too long: %d bytes' % self.tell())
+        return n
+
+    def unpack(self, st, alignment=1):
+        """Unpack values at the current position.
+
+        Padding bytes for ``alignment`` are skipped first. The position
+        is not changed after that if the values could not be unpacked.
+
+        :param struct.Struct st: the struct object
+        :param int alignment: the alignment of the values
+        :raises struct.error: if the values could not be unpacked
+        :raises ~dcar.MessageError: if there are none-NUL padding bytes
+        """
+        self.skip_padding(alignment)
+        pos = self.tell()
         try:
-            yield
-        finally:
-            self._nesting_depth -= 1
+            return st.unpack(self.read(st.size))
+        except struct.error:
+            self.seek(pos)
+            raise
+
+    def read_string(self, len_st, alignment):
+        """Read a string-like value at the current position.
+
+        The padding, the length (unpacked with ``len_st``), the data and the
+        terminating NUL byte are read.
+
+        :param struct.Struct len_st: the struct object for the length
+        :param int alignment: the alignment of the length
+        :returns: the data as :class:`bytes` or ``None`` if the value is not
+                  well-formed (the position is not changed in this case)
+        """
+        with self.getbuffer() as buf:
+            value, pos = _read_string(buf, self.tell(), len_st, alignment)
+        self.seek(pos)
+        return value
+
+    def set_value(self, pos, fixed_type, value):
+        """Set value at position pos."""
+        self.seek(pos)
+        fixed_type.marshal(self, value)
+        self.seek(0, io.SEEK_END)
+
+
+class RawReader(_RawMixin):
+    """Raw message data for unmarshalling without copying.
+
+    It can be used instead of :class:`RawData` for reading. The data is
+    accessed through a :class:`memoryview` with an integer cursor, so
+    :meth:`read` returns slices of the buffer instead of new
+    :class:`bytes` objects and fixed types are unpacked in place.
+    The buffer must not be changed while the reader is in use.
+
+    :param buffer: a :term:`bytes-like object`
+    """
+
+    def __init__(self, buffer):
+        self._buf = memoryview(buffer).cast('B')
+        self._pos = 0
+        self._init_raw()
+
+    def tell(self):
+        """Return the current position."""
+        return self._pos
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        """Change the position and return it."""
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += len(self._buf)
+        self._pos = max(pos, 0)
+        return self._pos
+
+    def read(self, size=-1):
+        """Read at most size bytes.
+
+        :returns: a slice of the buffer
+        :rtype: memoryview
+        """
+        start = self._pos
+        if size is None or size < 0:
+            b = self._buf[start:]
+        else:
+            b = self._buf[start:start + size]
+        self._pos = start + len(b)
+        return b
+
+    def skip_padding(self, alignment):
+        """Skip padding bytes."""
+        pos = self._pos
+        pad = -pos % alignment
+        if pad:
+            b = self._buf[pos:pos + pad]
+            if any(b):
+                raise MessageError('none-NUL byte in padding: %s' % bytes(b))
+            self._pos = pos + len(b)
+
+    def unpack(self, st, alignment=1):
+        """Unpack values at the current position.
+
+        Padding bytes for ``alignment`` are skipped first. The position
+        is not changed after that if the values could not be unpacked.
+
+        :param struct.Struct st: the struct object
+        :param int alignment: the alignment of the values
+        :raises struct.error: if the values could not be unpacked
+        :raises ~dcar.MessageError: if there are none-NUL padding bytes
+        """
+        pos = self._pos
+        if pos % alignment:
+            self.skip_padding(alignment)
+            pos = self._pos
+        values = st.unpack_from(self._buf, pos)
+        self._pos = pos + st.size
+        return values
+
+    def read_string(self, len_st, alignment):
+        """Read a string-like value at the current position.
+
+        See :meth:`RawData.read_string`.
+        """
+        value, self._pos = _read_string(self._buf, self._pos, len_st,
+                                        alignment)
+        return value
+
+    def getbuffer(self):
+        """Return the whole buffer.
+
+        :rtype: memoryview
+        """
+        return self._buf
+
+    def getvalue(self):
+        """Return the whole buffer as :class:`bytes`."""
+        return self._buf.tobytes()
+
+    def release(self):
+        """Release the underlying memoryview."""
+        self._buf.release()
+
+
+class RawWriter(_RawMixin, _WriteMixin):
+    """Raw message data for marshalling into a single buffer.
+
+    It can be used instead of :class:`RawData` for writing. All data is
+    appended to one growable :class:`bytearray` and values are set
+    afterwards with :func:`struct.pack_into`, so a whole message can be
+    marshalled without copying the parts together at the end.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._init_raw()
+
+    def tell(self):
+        """Return the current position (always at the end)."""
+        return len(self._buf)
+
+    def write(self, b):
+        """Write bytes."""
+        self._buf += b
+        if len(self._buf) > MAX_MESSAGE_LEN:
+            raise TooLongError('message too long: %d bytes' % len(self._buf))
+
+    def set_value(self, pos, fixed_type, value):
+        """Set value at position pos."""
+        try:
+            struct.pack_into(self.byteorder.code + fixed_type.code,
+                             self._buf, pos, value)
+        except struct.error as ex:
+            raise MessageError('marshal %s %r: %s' %
+                               (fixed_type.name, value, ex)) from ex
+
+    def insert(self, pos, b):
+        """Insert bytes at position pos."""
+        self._buf[pos:pos] = b
+        if len(self._buf) > MAX_MESSAGE_LEN:
+            raise TooLongError('message too long: %d bytes' % len(self._buf))
+
+    def delete(self, pos, size):
+        """Delete size bytes at position pos."""
+        del self._buf[pos:pos + size]
+
+    def getbuffer(self):
+        """Return the buffer.
+
+        :rtype: bytearray
+        """
+        return self._buf
+
+    def getvalue(self):
+        """Return the data as :class:`bytes`."""
+        return bytes(self._buf)
+
+
+def _read_string(buf, pos, len_st, alignment):
+    pad = -pos % alignment
+    if pad and any(buf[pos:pos + pad]):
+        return None, pos
+    start = pos + pad + len_st.size
+    try:
+        length = len_st.unpack_from(buf, pos + pad)[0]
+    except struct.error:
+        return None, pos
+    end = start + length
+    if end >= len(buf) or buf[end]:
+        return None, pos
+    return buf[start:end].tobytes(), end + 1
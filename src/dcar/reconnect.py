@@ -0,0 +1,80 @@
+"""Reconnecting after a lost connection."""
+
+import random
+from dataclasses import dataclass
+from itertools import count
+
+from .const import DEFAULT_TIMEOUT_VALUE
+
+__all__ = ['ReconnectPolicy']
+
+
+@dataclass(frozen=True)
+class ReconnectPolicy:
+    """Policy for reconnecting a :class:`~dcar.Bus` that lost its
+    connection (see parameter ``reconnect`` of :class:`~dcar.Bus`).
+
+    Attempt ``n`` (starting with ``1``) is made after a delay of
+    ``initial_delay * factor ** (n - 1)`` seconds, but at most
+    ``max_delay`` seconds. Each delay is shortened by a random fraction of
+    up to ``jitter`` so that many clients do not reconnect at the same time.
+
+    After reconnecting, the session is restored: *Hello* is sent, every
+    registered signal (that is not unicast) is added again with *AddMatch*,
+    and every name that was requested with :meth:`~dcar.Bus.request_name`
+    is requested again. Replies to messages that were sent before the
+    connection was lost fail with a :class:`~dcar.TransportError`.
+    Messages that are sent while reconnecting are held and sent after the
+    session was restored.
+
+    :param float initial_delay: delay in seconds before the first attempt
+    :param float max_delay: maximum delay in seconds
+    :param float factor: factor by which the delay increases
+    :param float jitter: maximum fraction by which a delay is shortened
+                         (between ``0`` and ``1``)
+    :param int max_attempts: maximum number of attempts
+                             (``None`` means no limit)
+    :param int max_held_bytes: maximum number of bytes of the messages held
+                               while reconnecting (``0`` means no limit);
+                               if a message does not fit, a
+                               :class:`~dcar.QueueFullError` is raised
+    :param float timeout: timeout in seconds for the replies to the
+                          messages that restore the session
+    :raises ValueError: if any argument has an invalid value
+    """
+
+    initial_delay: float = 0.1
+    max_delay: float = 30.0
+    factor: float = 2.0
+    jitter: float = 0.5
+    max_attempts: int = None
+    max_held_bytes: int = 2 ** 20
+    timeout: float = DEFAULT_TIMEOUT_VALUE
+
+    def __post_init__(self):
+        if self.initial_delay < 0:
+            raise ValueError('initial_delay must be >= 0')
+        if self.max_delay < self.initial_delay:
+            raise ValueError('max_delay must be >= initial_delay')
+        if self.factor < 1:
+            raise ValueError('factor must be >= 1')
+        if not 0 <= self.jitter <= 1:
+            raise ValueError('jitter must be between 0 and 1')
+        if self.max_attempts is not None and self.max_attempts < 1:
+            raise ValueError('max_attempts must be >= 1 or None')
+        if self.max_held_bytes < 0:
+            raise ValueError('max_held_bytes must be >= 0')
+        if self.timeout <= 0:
+            raise ValueError('timeout must be > 0')
+
+    def delays(self):
+        """Return an iterator over the delays before each attempt.
+
+        :rtype: iterator of float
+        """
+        delay = self.initial_delay
+        attempts = count() if self.max_attempts is None else range(
+            self.max_attempts)
+        for _ in attempts:
+            yield delay * (1 - self.jitter * random.random())
+            delay = min(delay * self.factor, self.max_delay)
@@ -3,22 +3,28 @@
 .. versionadded:: 0.3.0
 """
 
+import logging
 from contextlib import suppress
+from threading import Lock, Thread
 
 from .bus import Bus
 from .router import MatchRule
 from .const import DEFAULT_TIMEOUT_VALUE
-from .introspection import Data, Method, Property, Signal
+from .errors import DBusError
+from .introspection import Cache, Data, Method, Property, Signal
 from .validate import validate_bus_name, validate_object_path
 
 __all__ = [
     'RemoteObject',
+    'RemoteObjectManager',
     'DBus',
     'Notifications',
     'PowerManagement',
     'Login1',
     ]
 
+_logger = logging.getLogger(__name__)
+
 
 class RemoteObject:
     """An instance of this class is a proxy for an object on the D-Bus.
@@ -41,25 +47,56 @@ class RemoteObject:
     ``obj.SomeSignal = function``. The handler can be removed by assigning
     ``None``.
 
+    Properties annotated with `EmitsChangedSignal` ``const`` are always
+    cached. If ``cache_properties`` is ``True``, the first access to a
+    property of an interface gets all its properties with one *GetAll*
+    call and the cache is kept up to date with the *PropertiesChanged*
+    signals of the object: properties with `EmitsChangedSignal` ``true``
+    are updated, properties with ``invalidates`` are got again on the next
+    access, and properties with ``false`` are never cached. The signal
+    handlers are unregistered by :meth:`close`.
+
+    With an ``introspection_cache`` the parsed introspection data is shared
+    by all proxies for objects of the same bus name with the same
+    interfaces. If ``interfaces`` are given as well, no *Introspect* call
+    is needed once they are in the cache.
+
     See also: :ref:`ref-types-table`
 
     :param dcar.Bus bus: a connected bus object
     :param str name: bus name
     :param str path: object path
     :param str xml: introspection data (will be loaded from D-Bus if ``None``)
+    :param bool cache_properties: whether properties are cached
+    :param ~dcar.introspection.Cache introspection_cache: cache for the
+                                                          introspection data
+    :param interfaces: names of the interfaces of the object
+                       (only used with ``introspection_cache``)
+    :type interfaces: iterable of str
     :raises RuntimeError: if ``bus`` is not a connected :class:`dcar.Bus` object
     :raises ~dcar.ValidationError: if ``name`` or ``path`` are not valid
     """
 
-    def __init__(self, bus, name, path, xml=None):
+    def __init__(self, bus, name, path, xml=None, *, cache_properties=False,
+                 introspection_cache=None, interfaces=None):
         if not isinstance(bus, Bus) or not bus.connected:
             raise RuntimeError('bus must be a connected dcar.Bus object')
         self._bus = bus
         self._name = validate_bus_name(name)
         self._path = validate_object_path(path)
-        self._data = Data(bus, name, path, xml)
+        self._data = Data(bus, name, path, xml, introspection_cache,
+                          interfaces)
         self._signal_ids = {}
         self._props_cache = {}
+        self._cache_properties = cache_properties
+        self._props_lock = Lock()
+        self._props_load_lock = Lock()
+        self._props_loaded = set()  # interfaces
+        self._props_changes = 0  # incremented by the signal handlers
+        self._props_pending = {}  # interface -> names changed during GetAll
+        self._props_signal_ids = []
+        self._props_managed = False  # signals handled by a manager
+        self._owner = None
 
     @property
     def xml(self):
@@ -121,9 +158,35 @@ class RemoteObject:
             return reply
         return m
 
+    @property
+    def cache_properties(self):
+        """Return whether properties are cached.
+
+        See parameter ``cache_properties``.
+        """
+        return self._cache_properties
+
+    def close(self):
+        """Unregister the signal handlers of the property cache and
+        clear the cache."""
+        with self._props_lock:
+            signal_ids = self._props_signal_ids
+            self._props_signal_ids = []
+            self._props_loaded.clear()
+            self._props_cache.clear()
+        for signal_id in signal_ids:
+            self._bus.unregister_signal(signal_id)
+
     def _getprop(self, prop):
-        if prop in self._props_cache:
+        with suppress(KeyError):
             return self._props_cache[prop]
+        if self._cache_properties and prop.changed_signal != 'false':
+            with self._props_load_lock:
+                if prop.interface not in self._props_loaded:
+                    self._load_props(prop.interface)
+            with suppress(KeyError):
+                return self._props_cache[prop]
+        changes = self._props_changes
         reply = self._bus.method_call(
             self._path,
             'org.freedesktop.DBus.Properties',
@@ -133,8 +196,100 @@ class RemoteObject:
             args=(prop.interface, prop.name))
         if prop.changed_signal == 'const':
             self._props_cache[prop] = reply[0]
+        elif self._cache_properties and prop.changed_signal != 'false':
+            with self._props_lock:
+                # the value may be outdated if a signal was handled
+                if (prop.interface in self._props_loaded and
+                        changes == self._props_changes):
+                    self._props_cache[prop] = reply[0]
         return reply[0]
 
+    def _load_props(self, interface):
+        if not (self._props_signal_ids or self._props_managed):
+            self._subscribe()
+        with self._props_lock:
+            self._props_pending[interface] = set()
+        try:
+            reply = self._bus.method_call(
+                self._path,
+                'org.freedesktop.DBus.Properties',
+                'GetAll',
+                self._name,
+                signature='s',
+                args=(interface,))
+        except Exception:
+            with self._props_lock:
+                del self._props_pending[interface]
+            raise
+        with self._props_lock:
+            # values that changed while waiting for the reply are newer
+            changed = self._props_pending.pop(interface)
+            for name, value in reply[0].items():
+                if name in changed:
+                    continue
+                with suppress(KeyError):
+                    prop = self._data[interface, name]
+                    if prop.changed_signal != 'false':
+                        self._props_cache[prop] = value
+            self._props_loaded.add(interface)
+
+    def _subscribe(self):
+        ids = [self._bus.register_signal(
+            MatchRule(self._path, 'org.freedesktop.DBus.Properties',
+                      'PropertiesChanged'), self._props_changed)]
+        with self._props_lock:
+            self._props_signal_ids.extend(ids)
+        self._owner, ids = _watch_owner(self._bus, self._name,
+                                        self._owner_changed)
+        with self._props_lock:
+            self._props_signal_ids.extend(ids)
+
+    def _preload(self, interface, props):
+        with self._props_lock:
+            for name, value in props.items():
+                with suppress(KeyError):
+                    prop = self._data[interface, name]
+                    if prop.changed_signal != 'false':
+                        self._props_cache[prop] = value
+            self._props_loaded.add(interface)
+
+    def _unload(self, interfaces):
+        with self._props_lock:
+            for prop in list(self._props_cache):
+                if prop.interface in interfaces:
+                    del self._props_cache[prop]
+            self._props_loaded.difference_update(interfaces)
+
+    def _props_changed(self, info):
+        if info.sender != self._owner:
+            return
+        interface, changed, invalidated = info.args
+        with self._props_lock:
+            self._props_changes += 1
+            pending = self._props_pending.get(interface)
+            if pending is not None:
+                pending.update(changed, invalidated)
+            if interface not in self._props_loaded:
+                return
+            for name, value in changed.items():
+                with suppress(KeyError):
+                    prop = self._data[interface, name]
+                    if prop.changed_signal == 'true':
+                        self._props_cache[prop] = value
+            for name in invalidated:
+                with suppress(KeyError):
+                    self._props_cache.pop(self._data[interface, name], None)
+
+    def _owner_changed(self, info):
+        with self._props_lock:
+            self._props_changes += 1
+            self._owner = info.args[2] or None
+            # a new owner has its own values
+            for prop in list(self._props_cache):
+                if prop.changed_signal != 'const':
+                    del self._props_cache[prop]
+            self._props_loaded.clear()
+
     def _setprop(self, prop, value):
         self._bus.method_call(
             self._path,
@@ -143,6 +298,10 @@ class RemoteObject:
             self._name,
             signature='ssv',
             args=(prop.interface, prop.name, (prop.signature, value)))
+        if prop.changed_signal != 'const':
+            # got again on the next access if no signal has updated it
+            with self._props_lock:
+                self._props_cache.pop(prop, None)
 
     def _signal(self, signal, func):
         if func is None:
@@ -154,6 +313,234 @@ class RemoteObject:
                 MatchRule(self._path, signal.interface, signal.name), func)
 
 
+class RemoteObjectManager:
+    """Proxies for all objects of a service that implements the interface
+    `org.freedesktop.DBus.ObjectManager`.
+
+    All objects and their properties are got with one *GetManagedObjects*
+    call. For each object a :class:`RemoteObject` with cached properties
+    (see parameter ``cache_properties``) is created. The introspection data
+    is shared by the objects with the same interfaces (see parameter
+    ``introspection_cache``), so only objects with interfaces that are not
+    in the cache are introspected.
+
+    The proxies are kept up to date with the *InterfacesAdded*,
+    *InterfacesRemoved*, and *PropertiesChanged* signals (one match rule
+    for each of them for all objects) until :meth:`close` is called. If the
+    service gets a new owner, the objects are got again in a new thread.
+
+    The proxies can be accessed by their object paths:
+    ``manager['/some/path']``. Iterating over a manager yields the paths.
+
+    :param dcar.Bus bus: a connected bus object
+    :param str name: bus name
+    :param str path: object path of the object manager
+    :param ~dcar.introspection.Cache introspection_cache: cache for the
+                                                          introspection data
+                                                          (default: a new
+                                                          cache)
+    :raises RuntimeError: if ``bus`` is not a connected :class:`dcar.Bus` object
+    :raises ~dcar.ValidationError: if ``name`` or ``path`` are not valid
+    :raises ~dcar.DBusError: if *GetManagedObjects* failed
+    """
+
+    def __init__(self, bus, name, path='/', *, introspection_cache=None):
+        if not isinstance(bus, Bus) or not bus.connected:
+            raise RuntimeError('bus must be a connected dcar.Bus object')
+        self._bus = bus
+        self._name = validate_bus_name(name)
+        self._path = validate_object_path(path)
+        if introspection_cache is None:
+            introspection_cache = Cache()
+        self._cache = introspection_cache
+        self._lock = Lock()
+        self._objects = {}  # path -> RemoteObject
+        self._interfaces = {}  # path -> set of interface names
+        self._signal_ids = []
+        self._owner = None
+        try:
+            self._subscribe()
+            self.refresh()
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def objects(self):
+        """Return a dictionary with the object paths and the proxies."""
+        with self._lock:
+            return dict(self._objects)
+
+    def __getitem__(self, path):
+        with self._lock:
+            return self._objects[path]
+
+    def __contains__(self, path):
+        with self._lock:
+            return path in self._objects
+
+    def __iter__(self):
+        return iter(self.objects)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._objects)
+
+    def refresh(self):
+        """Get all objects again.
+
+        The proxies of objects that still exist are kept.
+
+        :raises ~dcar.DBusError: if *GetManagedObjects* failed
+        """
+        reply = self._bus.method_call(self._path,
+                                      'org.freedesktop.DBus.ObjectManager',
+                                      'GetManagedObjects',
+                                      self._name)
+        with self._lock:
+            gone = set(self._objects) - set(reply[0])
+        for path in gone:
+            self._update(path, {}, exact=True)
+        for path, interfaces in reply[0].items():
+            self._update(path, interfaces, exact=True)
+
+    def close(self):
+        """Unregister the signal handlers.
+
+        The proxies are not updated anymore.
+        """
+        with self._lock:
+            signal_ids = self._signal_ids
+            self._signal_ids = []
+        for signal_id in signal_ids:
+            self._bus.unregister_signal(signal_id)
+
+    def _subscribe(self):
+        rules = [
+            (MatchRule(self._path, 'org.freedesktop.DBus.ObjectManager'),
+             self._interfaces_changed),
+            # path_namespace '/' would match all paths anyway
+            (MatchRule(interface='org.freedesktop.DBus.Properties',
+                       signal_name='PropertiesChanged',
+                       path_namespace=(self._path if self._path != '/'
+                                       else None)),
+             self._props_changed),
+        ]
+        for rule, handler in rules:
+            signal_id = self._bus.register_signal(rule, handler)
+            with self._lock:
+                self._signal_ids.append(signal_id)
+        self._owner, ids = _watch_owner(self._bus, self._name,
+                                        self._owner_changed)
+        with self._lock:
+            self._signal_ids.extend(ids)
+
+    def _update(self, path, added, removed=(), exact=False):
+        # added: interface name -> properties; with exact=True these are
+        # all interfaces of the object. Creating the introspection data
+        # can be an Introspect round trip, so it is done without holding
+        # the lock; if the object was changed meanwhile, it is done again.
+        while True:
+            with self._lock:
+                obj = self._objects.get(path)
+                old = self._interfaces.get(path, set())
+            if exact:
+                names = set(added)
+            else:
+                names = (old | set(added)) - set(removed)
+            if obj is None and not names:
+                return
+            new_obj = data = None
+            if names and obj is None:
+                new_obj = RemoteObject(self._bus, self._name, path,
+                                       cache_properties=True,
+                                       introspection_cache=self._cache,
+                                       interfaces=names)
+                new_obj._props_managed = True
+            elif names and names != old:
+                data = Data(self._bus, self._name, path, None, self._cache,
+                            names)
+            with self._lock:
+                if (self._objects.get(path) is not obj or
+                        self._interfaces.get(path, set()) != old):
+                    continue
+                if not names:
+                    del self._objects[path]
+                    del self._interfaces[path]
+                    return
+                if new_obj is not None:
+                    obj = self._objects[path] = new_obj
+                elif data is not None:
+                    obj._data = data
+                self._interfaces[path] = names
+                obj._owner = self._owner
+                obj._unload(old - names)
+                for interface, props in added.items():
+                    obj._unload((interface,))
+                    obj._preload(interface, props)
+                return
+
+    def _interfaces_changed(self, info):
+        if info.sender != self._owner:
+            return
+        if info.member == 'InterfacesAdded':
+            self._update(*info.args)
+        elif info.member == 'InterfacesRemoved':
+            path, interfaces = info.args
+            self._update(path, {}, interfaces)
+
+    def _props_changed(self, info):
+        with self._lock:
+            obj = self._objects.get(info.path)
+        if obj:
+            obj._props_changed(info)
+
+    def _owner_changed(self, info):
+        with self._lock:
+            self._owner = info.args[2] or None
+            for obj in self._objects.values():
+                obj._owner_changed(info)
+            if self._owner is None:
+                self._objects.clear()
+                self._interfaces.clear()
+            owner = self._owner
+        if owner:
+            # not in the signal handler: refresh() waits for replies
+            Thread(target=self._refresh, args=(owner,), daemon=True).start()
+
+    def _refresh(self, owner):
+        with self._lock:
+            if owner != self._owner:
+                return  # the owner changed again
+        try:
+            self.refresh()
+        except Exception:
+            _logger.warning('cannot refresh objects of %s', self._name,
+                            exc_info=True)
+
+
+def _watch_owner(bus, name, handler):
+    # Returns the owner of a bus name and the IDs of the signals that
+    # call handler when the owner changes. Handlers of signals from the
+    # name must check the sender because the bus matches a rule with a
+    # well-known name as sender but the local registry does not.
+    if name.startswith(':'):
+        return name, []
+    rule = MatchRule('/org/freedesktop/DBus', 'org.freedesktop.DBus',
+                     'NameOwnerChanged', 'org.freedesktop.DBus')
+    rule.add_arg(0, name)
+    ids = [bus.register_signal(rule, handler)]
+    owner = None
+    with suppress(DBusError):
+        owner = bus.method_call('/org/freedesktop/DBus',
+                                'org.freedesktop.DBus',
+                                'GetNameOwner',
+                                'org.freedesktop.DBus',
+                                signature='s',
+                                args=(name,))[0]
+    return owner, ids
+
+
 class DBus(RemoteObject):
     """Convenience subclass of :class:`RemoteObject`.
 
@@ -1,20 +1,24 @@
 """Message routing."""
 
+import heapq
 import inspect
 import logging
+from collections import deque, namedtuple
+from concurrent.futures import Future
 from contextlib import suppress
 from dataclasses import dataclass, field, astuple
 from functools import partial
-from queue import SimpleQueue
+from queue import Empty
 from threading import Condition, Lock, Thread
+from time import monotonic
 
 from . import validate
 from .const import MAX_MATCH_RULE_LEN, MAX_MATCH_RULE_ARG_NUM
 from .errors import (Error, TransportError, RegisterError,
-                     TooLongError, DBusError)
-from .message import HeaderField, MessageType
+                     TooLongError, DBusError, QueueFullError)
+from .message import HeaderField, MessageType, error_message
 
-__all__ = ['Router', 'MatchRule']
+__all__ = ['Router', 'MatchRule', 'OutQueue', 'OutQueueStats']
 
 _logger = logging.getLogger(__name__)
 
@@ -33,23 +37,33 @@ class Router:
     """Class for routing in- and outgoing messages."""
 
     def __init__(self, bus):
-        self._cv = Condition()
-        self._replies = {}
+        self._lock = Lock()
+        self._replies = {}  # serial -> Future
+        self._timeouts = []  # heap with (deadline, serial, Future, timeout)
+        self._timer = None
+        self._held = None  # serial -> (item, droppable) while reconnecting
+        self._held_bytes = 0
+        self._max_held_bytes = 0
         self.signals = Signals()
         self.methods = Methods()
-        self.out_queue = SimpleQueue()
-        self._handler_queue = SimpleQueue()
-        self._handler_thread = Thread(target=self._handle, daemon=True)
-        self._handler_thread.start()
+        self.out_queue = OutQueue(bus.out_queue_size, bus.out_queue_policy)
         self._bus = bus
+        self._executor = bus.handler_executor
+
+    @property
+    def compact_arrays(self):
+        """Return the ``compact_arrays`` setting of the bus."""
+        return self._bus.compact_arrays
 
-    def _check_replies(self, serial):
-        if self._bus.connected:
-            return self._replies[serial] is not None
-        else:
-            if self._bus.error:
-                return self._bus.error
-            return TransportError('disconnected')
+    @property
+    def send_batch_size(self):
+        """Return the ``send_batch_size`` setting of the bus."""
+        return self._bus.send_batch_size
+
+    @property
+    def recv_buffer_size(self):
+        """Return the ``recv_buffer_size`` setting of the bus."""
+        return self._bus.recv_buffer_size
 
     def outgoing(self, msg, timeout):
         """Handle outgoing messages.
@@ -62,28 +76,210 @@ class Router:
         :raises ~dcar.TransportError: if the message could not be sent
         :raises ~dcar.MessageError: if the message could not be marshalled
         """
-        msg_bytes, unix_fds = msg.to_bytes()
+        future = self.outgoing_async(msg, timeout)
+        if future is None:
+            return None
+        return future.result()
+
+    def outgoing_async(self, msg, timeout=None):
+        """Handle outgoing messages without waiting for a reply.
+
+        If a reply is expected and ``timeout`` is not ``None``, the future
+        fails with a :class:`~dcar.TransportError` when the reply was not
+        received in time.
+
+        :param ~dcar.message.Message msg: the message
+        :param float timeout: timeout in seconds
+        :returns: a future for the return values of a message call if a reply
+                  is expected or ``None``
+        :rtype: concurrent.futures.Future or None
+        :raises ~dcar.TransportError: if the message could not be sent
+        :raises ~dcar.MessageError: if the message could not be marshalled
+        """
+        return self._enqueue(msg, *self._marshal(msg), timeout)
+
+    def outgoing_many(self, msgs, timeout, hold=True):
+        """Handle outgoing method calls as a pipeline.
+
+        All messages are marshalled and put into the queue before the
+        replies are collected, so they need only one round trip.
+
+        :param list msgs: the messages of type METHOD_CALL
+        :param float timeout: timeout in seconds for all replies
+        :param bool hold: if ``False`` the messages are sent even if
+                          outgoing messages are held (see :meth:`hold`)
+        :returns: return values or :class:`~dcar.DBusError` for each message
+        :rtype: list
+        :raises ~dcar.TransportError: if the messages could not be sent
+        :raises ~dcar.MessageError: if a message could not be marshalled
+        """
+        bufs = [self._marshal(msg) for msg in msgs]
+        futures = []
+        try:
+            for msg, (msg_bytes, unix_fds) in zip(msgs, bufs):
+                futures.append(self._enqueue(msg, msg_bytes, unix_fds,
+                                             timeout, hold))
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except DBusError as ex:
+                    results.append(ex)
+            return results
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _marshal(self, msg):
+        msg_bytes, unix_fds = msg.to_buffer()
         _logger.debug('\n-> %s', msg)
         if unix_fds and not self._bus.unix_fds_enabled:
             raise TransportError('unix fds passing not supported')
-        self.out_queue.put((msg_bytes, unix_fds))
-        if msg.reply_expected:
-            with self._cv:
-                self._replies[msg.serial] = None
-                result = self._cv.wait_for(partial(self._check_replies,
-                                                   msg.serial),
-                                           timeout)
-                if result:
-                    if isinstance(result, Error):
-                        raise result
-                    reply = self._replies.pop(msg.serial)
-                    reply.raise_on_error()
-                    return reply.body
+        return msg_bytes, unix_fds
+
+    def _enqueue(self, msg, msg_bytes, unix_fds, timeout, hold=True,
+                 block=True):
+        future = Future() if msg.reply_expected else None
+        item = (msg_bytes, unix_fds)
+        droppable = msg.message_type is MessageType.SIGNAL
+        with self._lock:
+            held = hold and self._held is not None
+            if held:
+                size = len(msg_bytes)
+                if (self._max_held_bytes and self._held_bytes and
+                        self._held_bytes + size > self._max_held_bytes):
+                    raise QueueFullError('queue for messages held while '
+                                         'reconnecting full: %d bytes' %
+                                         self._held_bytes)
+                self._held[msg.serial] = (item, droppable)
+                self._held_bytes += size
+            if future:
+                self._replies[msg.serial] = future
+                if timeout is not None:
+                    self._add_timeout(msg.serial, future, timeout)
+        if future:
+            future.add_done_callback(partial(self._reply_done, msg.serial))
+        if held:
+            return future
+        try:
+            self.out_queue.put(item, droppable, block)
+        except Error:
+            if future:
+                with self._lock:
+                    self._replies.pop(msg.serial, None)
+            raise
+        if future and not self._bus.connected:
+            self._fail_replies()
+        return future
+
+    def hold(self, max_bytes=0):
+        """Hold outgoing messages until :meth:`release` is called.
+
+        This is used while reconnecting. Replies to held messages are not
+        failed when the connection is lost.
+
+        :param int max_bytes: maximum number of bytes of the held messages
+                              (``0`` means no limit)
+        """
+        with self._lock:
+            if self._held is None:
+                self._held = {}
+                self._held_bytes = 0
+                self._max_held_bytes = max_bytes
+
+    def release(self, error=None):
+        """Stop holding outgoing messages.
+
+        The held messages are put into the queue in the order they were
+        sent or, if ``error`` is not ``None``, dropped.
+
+        :param Exception error: the exception for the replies to the held
+                                messages if they are dropped
+        """
+        failed = []
+        with self._lock:
+            held, self._held = self._held or {}, None
+            self._held_bytes = 0
+            for serial, (item, droppable) in held.items():
+                if error is None:
+                    try:
+                        # in the lock, so no newer message gets ahead
+                        self.out_queue.put(item, droppable)
+                        continue
+                    except Error as ex:
+                        failed.append((self._replies.pop(serial, None), ex))
                 else:
-                    del self._replies[msg.serial]
-                    raise TransportError('Timeout: %f secs.' % timeout)
-        else:
-            return None
+                    failed.append((self._replies.pop(serial, None), error))
+        for future, ex in failed:
+            if future and future.set_running_or_notify_cancel():
+                future.set_exception(ex)
+
+    def _reply_done(self, serial, future):
+        if future.cancelled():
+            with self._lock:
+                self._replies.pop(serial, None)
+
+    def _add_timeout(self, serial, future, timeout):
+        # called with self._lock held
+        timeouts = self._timeouts
+        if len(timeouts) > 2 * len(self._replies) + 64:
+            # remove the entries of replies that were already received
+            timeouts[:] = [t for t in timeouts if not t[2].done()]
+            heapq.heapify(timeouts)
+        heapq.heappush(timeouts,
+                       (monotonic() + timeout, serial, future, timeout))
+        if self._timer is None:
+            self._timer = Condition(self._lock)
+            Thread(target=self._expire_replies, args=(self._timer,),
+                   name='reply-timer', daemon=True).start()
+        elif timeouts[0][2] is future:  # new earliest deadline
+            self._timer.notify()
+
+    def _expire_replies(self, timer):
+        """Fail the futures of replies that were not received in time.
+
+        The thread ends if there are no more pending timeouts.
+        """
+        timeouts = self._timeouts
+        with self._lock:
+            while timeouts:
+                deadline, serial, future, timeout = timeouts[0]
+                wait = deadline - monotonic()
+                if wait > 0 and not future.done():
+                    timer.wait(wait)
+                    continue
+                heapq.heappop(timeouts)
+                if future.done() or self._replies.get(serial) is not future:
+                    continue
+                del self._replies[serial]
+                # set outside of the lock; a done callback may use it
+                self._lock.release()
+                try:
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(
+                            TransportError('Timeout: %f secs.' % timeout))
+                finally:
+                    self._lock.acquire()
+            self._timer = None
+
+    def _fail_replies(self):
+        with self._lock:
+            if self._held:  # held messages were not sent yet
+                futures = [self._replies.pop(serial)
+                           for serial in list(self._replies)
+                           if serial not in self._held]
+            else:
+                futures = list(self._replies.values())
+                self._replies.clear()
+            if self._timer is not None:  # let the timer thread end
+                self._timer.notify()
+        error = self._bus.error or TransportError('disconnected')
+        for future in futures:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+        with self._lock:
+            if self._timer is not None:  # let the timer thread end
+                self._timer.notify()
 
     def incoming(self, msg):
         """Handle incoming messages.
@@ -92,33 +288,45 @@ class Router:
         """
         _logger.debug('\n<- %s', msg)
         if msg is None:  # transport disconnected
-            with self._cv:
-                self.out_queue.put((None, None))  # unblock send-loop
-                self._handler_queue.put((None, None))
-                self._cv.notify_all()
+            self.out_queue.close()  # unblock send-loop
+            self._fail_replies()
+            self._bus._connection_lost()
+            # waiting handlers are kept while reconnecting
+            if not self._bus.reconnecting:
+                self._bus._shutdown_handler_executor()
             return
         if msg.message_type is MessageType.INVALID:
             return  # ignore unknown message types
         if msg.message_type in (MessageType.METHOD_RETURN, MessageType.ERROR):
-            with self._cv:
-                if msg.reply_serial in self._replies:
-                    self._replies[msg.reply_serial] = msg
-                    self._cv.notify_all()
+            with self._lock:
+                future = self._replies.pop(msg.reply_serial, None)
+            if future and future.set_running_or_notify_cancel():
+                # only the caller waiting for this reply is woken up
+                try:
+                    msg.raise_on_error()
+                    future.set_result(msg.body)
+                except Error as ex:
+                    future.set_exception(ex)
         elif msg.message_type is MessageType.METHOD_CALL:
             try:
-                method = self._find_method(msg)
-                self._handler_queue.put((method, msg.info))
+                method = self.methods.find_handler(msg)
+                info = self.methods.handler_info(method, msg)
+                if not self._executor.submit(info, self._handle, method,
+                                             info):
+                    raise DBusError(
+                        'org.freedesktop.DBus.Error.LimitsExceeded',
+                        'too many method calls waiting to be handled')
             except DBusError as ex:
-                self._send_error(ex, msg.info.serial, msg.info.sender)
+                self._send_error_nowait(ex, msg.serial,
+                                        msg.fields[HeaderField.SENDER])
         elif msg.message_type is MessageType.SIGNAL:
             for handler in self.signals.matches(msg, self._bus.unique_name):
-                self._handler_queue.put((handler, msg.info))
+                if not self._executor.submit(msg.info, self._handle, handler,
+                                             msg.info):
+                    _logger.debug('signal dropped: %s', msg)
 
-    def _handle(self):
-        while True:
-            func, info = self._handler_queue.get()
-            if func is None:
-                break
+    def _handle(self, func, info):
+        try:
             if info.is_signal:
                 func(info)
             else:
@@ -126,24 +334,8 @@ class Router:
                     func(self._bus, info)
                 except DBusError as ex:
                     self._send_error(ex, info.serial, info.sender)
-
-    def _find_method(self, msg):
-        method, signature = self.methods.find(msg)
-        if not method:
-            raise DBusError('org.freedesktop.DBus.Error.UnknownMethod',
-                            'Method %r not found in interface %r '
-                            'on object path %r' %
-                            (msg.fields[HeaderField.MEMBER],
-                             msg.fields[HeaderField.INTERFACE],
-                             msg.fields[HeaderField.PATH]))
-        if not (not signature and not msg.fields[HeaderField.SIGNATURE] or
-                signature == msg.fields[HeaderField.SIGNATURE]):
-            raise DBusError('org.freedesktop.DBus.Error.InvalidArgs',
-                            'the message signature "%s" is not the '
-                            'expected "%s"' %
-                            (msg.fields[HeaderField.SIGNATURE] or '',
-                             signature or ''))
-        return method
+        except Exception:
+            _logger.error('handler %r failed', func, exc_info=True)
 
     def _send_error(self, ex, serial, destination):
         self._bus.send_error(ex.args[0],
@@ -152,6 +344,167 @@ class Router:
                              signature='s',
                              args=ex.args[1:])
 
+    def _send_error_nowait(self, ex, serial, destination):
+        # Used in the recv-loop: waiting for space in the out queue would
+        # stop the handling of incoming messages, and a QueueFullError
+        # would end the connection, so the error reply is dropped instead.
+        msg = error_message(ex.args[0], serial, destination, None, 's',
+                            ex.args[1:])
+        try:
+            self._enqueue(msg, *self._marshal(msg), None, block=False)
+        except Error as err:
+            _logger.warning('error reply %s to %s dropped: %s',
+                            ex.args[0], destination, err)
+
+
+OUT_QUEUE_POLICIES = ('block', 'raise', 'drop-oldest')
+
+OutQueueStats = namedtuple('OutQueueStats',
+                           'messages bytes peak_bytes dropped')
+OutQueueStats.__doc__ += '\nCounters of the queue for outgoing messages.'
+OutQueueStats.messages.__doc__ = 'number of waiting messages'
+OutQueueStats.bytes.__doc__ = 'number of bytes of the waiting messages'
+OutQueueStats.peak_bytes.__doc__ = 'maximum of ``bytes`` so far'
+OutQueueStats.dropped.__doc__ = 'number of dropped signals'
+
+
+class OutQueue:
+    """Queue for outgoing messages that are waiting for the ``send-loop``.
+
+    If ``max_bytes`` is not ``0`` and a message does not fit into the
+    queue, the ``policy`` decides what happens:
+
+    * ``'block'``: wait until there is enough space
+    * ``'raise'``: raise a :class:`~dcar.QueueFullError`
+    * ``'drop-oldest'``: drop the oldest waiting signals; if that is not
+      enough, wait like ``'block'``
+
+    A message that is bigger than ``max_bytes`` is accepted if the queue
+    is empty.
+
+    :param int max_bytes: maximum number of bytes of all waiting messages
+                          (``0`` means no limit)
+    :param str policy: ``'block'``, ``'raise'``, or ``'drop-oldest'``
+    :raises ValueError: if any argument has an invalid value
+    """
+
+    def __init__(self, max_bytes=0, policy='block'):
+        if max_bytes < 0:
+            raise ValueError('max_bytes must be >= 0')
+        if policy not in OUT_QUEUE_POLICIES:
+            raise ValueError('policy must be one of %r' %
+                             (OUT_QUEUE_POLICIES,))
+        self._max_bytes = max_bytes
+        self._policy = policy
+        lock = Lock()
+        self._not_empty = Condition(lock)
+        self._not_full = Condition(lock)
+        self._entries = deque()  # [item, size, droppable]
+        self._droppable = deque()  # entries of waiting signals
+        self._count = 0
+        self._bytes = 0
+        self._peak_bytes = 0
+        self._dropped = 0
+        self._closed = False
+
+    @property
+    def stats(self):
+        """Return the counters of this queue.
+
+        :rtype: OutQueueStats
+        """
+        return OutQueueStats(self._count, self._bytes, self._peak_bytes,
+                             self._dropped)
+
+    def put(self, item, droppable=False, block=True):
+        """Put an item into the queue.
+
+        :param tuple item: message data and list of unix fds
+        :param bool droppable: ``True`` for signals
+        :param bool block: if ``False``, never wait for space in the queue
+        :raises ~dcar.QueueFullError: if the queue is full and the policy
+                                      is ``'raise'`` or it would have to
+                                      wait but ``block`` is ``False``
+        :raises ~dcar.TransportError: if the queue is closed
+        """
+        size = len(item[0])
+        with self._not_full:
+            if self._closed:
+                raise TransportError('disconnected')
+            while (self._max_bytes and self._bytes and
+                   self._bytes + size > self._max_bytes):
+                if self._policy == 'drop-oldest' and self._droppable:
+                    entry = self._droppable.popleft()
+                    self._bytes -= entry[1]
+                    self._count -= 1
+                    self._dropped += 1
+                    entry[0] = None
+                    continue
+                if self._policy == 'raise' or not block:
+                    raise QueueFullError('queue for outgoing messages full: '
+                                         '%d bytes' % self._bytes)
+                self._not_full.wait()
+                if self._closed:
+                    raise TransportError('disconnected')
+            entry = [item, size, droppable]
+            self._entries.append(entry)
+            if droppable:
+                self._droppable.append(entry)
+            self._count += 1
+            self._bytes += size
+            if self._bytes > self._peak_bytes:
+                self._peak_bytes = self._bytes
+            self._not_empty.notify()
+
+    def get(self, block=True):
+        """Remove and return an item from the queue.
+
+        :param bool block: whether to wait for an item
+        :returns: the item or ``(None, None)`` if the queue is closed
+        :raises queue.Empty: if ``block`` is ``False`` and the queue is empty
+        """
+        with self._not_empty:
+            while not self._closed:
+                while self._entries:
+                    item, size, droppable = self._entries.popleft()
+                    if item is None:  # dropped
+                        continue
+                    if droppable:
+                        self._droppable.popleft()
+                    self._count -= 1
+                    self._bytes -= size
+                    if self._max_bytes:
+                        self._not_full.notify_all()
+                    return item
+                if not block:
+                    raise Empty
+                self._not_empty.wait()
+            return None, None
+
+    def get_nowait(self):
+        """Same as ``get(False)``."""
+        return self.get(False)
+
+    def open(self):
+        """Open the queue; all items are removed."""
+        with self._not_empty:
+            self._entries.clear()
+            self._droppable.clear()
+            self._count = 0
+            self._bytes = 0
+            self._closed = False
+
+    def close(self):
+        """Close the queue.
+
+        A waiting :meth:`get` returns ``(None, None)`` and a waiting
+        :meth:`put` raises a :class:`~dcar.TransportError`.
+        """
+        with self._not_empty:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
 
 @dataclass(frozen=True)
 class MatchRule:
@@ -266,27 +619,85 @@ class Signals(Registry):
 
     params = ('msginfo',)  #: handler parameters
 
+    def __init__(self):
+        super().__init__()
+        self._keys = set()  # for finding duplicates
+        # Every rule is in the index under its most selective header field:
+        # ('path', object_path), ('namespace', path_namespace),
+        # ('member', signal_name), ('interface', interface) or ().
+        self._index = {}
+
     def _add(self, rule, handler, unicast):
         if not isinstance(rule, MatchRule):
             raise TypeError('first argument must be a MatchRule')
-        if (rule, handler, unicast) in self._data.values():
+        key = (_rule_key(rule), handler, unicast)
+        if key in self._keys:
             raise RegisterError('rule %r exists with same handler %r' %
                                 (str(rule), handler))
         self._counter += 1
-        self._data[self._counter] = (rule, handler, unicast)
+        self._data[self._counter] = (rule, handler, unicast, key)
+        self._keys.add(key)
+        self._index.setdefault(_index_key(rule), {})[self._counter] = None
         return self._counter
 
+    def add_rule(self, rule, data):
+        """Add a rule without a handler function.
+
+        :meth:`matches` yields ``data`` instead of a handler (this is used
+        by :class:`~dcar.server.MessageBus` for the rules of its clients).
+
+        :param MatchRule rule: the rule
+        :param data: any hashable object
+        :returns: the ID of the rule
+        """
+        with self._lock:
+            return self._add(rule, data, False)
+
+    def rules(self):
+        """Return the match rules that were added with *AddMatch*.
+
+        :returns: the rules of all registered signals that are not unicast
+        :rtype: list
+        """
+        with self._lock:
+            return [rule for rule, _, unicast, _ in self._data.values()
+                    if not unicast]
+
     def _remove(self, rule_id):
         with suppress(KeyError):
-            rule, _, _ = self._data[rule_id]
-            del self._data[rule_id]
+            rule, _, _, key = self._data.pop(rule_id)
+            self._keys.discard(key)
+            index_key = _index_key(rule)
+            bucket = self._index[index_key]
+            del bucket[rule_id]
+            if not bucket:
+                del self._index[index_key]
             return rule
 
+    def _candidates(self, object_path, interface, signal_name):
+        index = self._index
+        buckets = [index.get(('path', object_path)),
+                   index.get(('member', signal_name)),
+                   index.get(('interface', interface)),
+                   index.get(())]
+        if object_path:
+            # the object path and all its parents are namespaces
+            buckets.append(index.get(('namespace', object_path)))
+            pos = object_path.rfind('/')
+            while pos > 0:
+                buckets.append(index.get(('namespace', object_path[:pos])))
+                pos = object_path.rfind('/', 0, pos)
+        ids = [rule_id for bucket in buckets if bucket for rule_id in bucket]
+        ids.sort()  # in the order of registration
+        return ids
+
     def matches(self, msg, unique_name):
         """Match a SIGNAL message to a rule.
 
         This function is a generator which yields the handler function
-        for each matching rule.
+        for each matching rule. Only rules found in an index of the
+        object path, path namespace, signal name, and interface are
+        checked.
         """
         fields = msg.fields
         object_path = fields[HeaderField.PATH]
@@ -294,31 +705,43 @@ class Signals(Registry):
         signal_name = fields[HeaderField.MEMBER]
         sender = fields[HeaderField.SENDER]
         destination = fields[HeaderField.DESTINATION]
+        args = ()  # leading args of the body as far as needed
+        handlers = []
         with self._lock:
-            for rule, handler, unicast in self._data.values():
+            for rule_id in self._candidates(object_path, interface,
+                                            signal_name):
+                rule, handler, unicast, _ = self._data[rule_id]
                 if unicast:
                     rule_destination = unique_name
                 else:
                     rule_destination = rule.destination
-                if all(((rule.object_path is None or
-                         rule.object_path == object_path),
-                        rule.interface is None or rule.interface == interface,
+                if not ((rule.object_path is None or
+                         rule.object_path == object_path) and
+                        (rule.interface is None or
+                         rule.interface == interface) and
                         (rule.signal_name is None or
-                         rule.signal_name == signal_name),
-                        rule.sender is None or rule.sender == sender,
+                         rule.signal_name == signal_name) and
+                        (rule.sender is None or rule.sender == sender) and
                         (rule_destination is None or
-                         rule_destination == destination),
+                         rule_destination == destination) and
                         (rule.path_namespace is None or
                          rule.path_namespace == object_path or
-                         object_path.startswith(rule.path_namespace + '/')),
-                        (rule.arg0namespace is None or
-                         msg.body and isinstance(msg.body[0], str) and
-                         (rule.arg0namespace == msg.body[0] or
-                          msg.body[0].startswith(rule.arg0namespace + '.'))),
-                        not rule.args or self._match_args(rule.args, msg.body),
+                         object_path.startswith(rule.path_namespace + '/'))):
+                    continue
+                # only the args needed by the rule are unmarshalled
+                args_cnt = _args_cnt(rule)
+                if args_cnt > len(args):
+                    args = msg.leading_args(args_cnt)
+                if ((rule.arg0namespace is None or
+                     args and isinstance(args[0], str) and
+                     (rule.arg0namespace == args[0] or
+                      args[0].startswith(rule.arg0namespace + '.'))) and
+                        (not rule.args or
+                         self._match_args(rule.args, args)) and
                         (not rule.argpaths or
-                         self._match_argpaths(rule.argpaths, msg.body)))):
-                    yield handler
+                         self._match_argpaths(rule.argpaths, args))):
+                    handlers.append(handler)
+        yield from handlers
 
     def _match_args(self, args, body):
         if not body or len(body) - 1 < max(args):
@@ -345,6 +768,32 @@ class Signals(Registry):
         return True
 
 
+def _rule_key(rule):
+    return (astuple(rule)[:7] + (tuple(sorted(rule.args.items())),
+                                 tuple(sorted(rule.argpaths.items()))))
+
+
+def _index_key(rule):
+    if rule.object_path is not None:
+        return ('path', rule.object_path)
+    if rule.path_namespace is not None:
+        return ('namespace', rule.path_namespace)
+    if rule.signal_name is not None:
+        return ('member', rule.signal_name)
+    if rule.interface is not None:
+        return ('interface', rule.interface)
+    return ()
+
+
+def _args_cnt(rule):
+    cnt = 1 if rule.arg0namespace is not None else 0
+    if rule.args:
+        cnt = max(cnt, max(rule.args) + 1)
+    if rule.argpaths:
+        cnt = max(cnt, max(rule.argpaths) + 1)
+    return cnt
+
+
 class Methods(Registry):
     """Methods registry.
 
@@ -355,6 +804,13 @@ class Methods(Registry):
 
     params = ('bus', 'msginfo')  #: handler parameters
 
+    def __init__(self):
+        super().__init__()
+        self._ids = {}  # ID -> (object_path, interface, method_name)
+        # (object_path, method_name) -> tuples in the order of registration
+        self._members = {}
+        self._fallbacks = []
+
     def _add(self, tup, handler, signature):
         if len(tup) != 3 or not (all(tup) and handler):
             raise RegisterError('invalid arguments: %r, %r' % (tup, handler))
@@ -363,13 +819,40 @@ class Methods(Registry):
                                 'on object %r already exists' % tup)
         self._counter += 1
         self._data[tup] = (self._counter, handler, signature)
+        self._ids[self._counter] = tup
+        self._members.setdefault((tup[0], tup[2]), {})[tup] = None
         return self._counter
 
     def _remove(self, meth_id):
-        with suppress(KeyError, IndexError):
-            tup = list(filter(lambda x: self._data[x][0] == meth_id,
-                              self._data))[0]
+        with suppress(KeyError):
+            tup = self._ids.pop(meth_id)
             del self._data[tup]
+            member_key = (tup[0], tup[2])
+            tups = self._members[member_key]
+            del tups[tup]
+            if not tups:
+                del self._members[member_key]
+
+    def add_fallback(self, func):
+        """Add a function that finds handlers for methods that are not
+        registered.
+
+        The function is called with a METHOD_CALL message and returns a
+        handler function and the signature or ``(None, None)``. If the
+        handler has an attribute ``variant_signatures`` set to ``True``,
+        VARIANTs in its arguments are tuples ``(signature, value)`` (see
+        :meth:`~dcar.message.Message.unmarshal_body`). This is used by
+        :class:`~dcar.service.ObjectServer`.
+
+        :param callable func: the function
+        """
+        with self._lock:
+            self._fallbacks = self._fallbacks + [func]
+
+    def remove_fallback(self, func):
+        """Remove a function added with :meth:`add_fallback`."""
+        with self._lock:
+            self._fallbacks = [f for f in self._fallbacks if f != func]
 
     def find(self, msg):
         """Return handler function and signature for a METHOD_CALL message."""
@@ -382,7 +865,45 @@ class Methods(Registry):
                 if (object_path, interface, method_name) in self._data:
                     return self._data[(object_path, interface, method_name)][1:]
             else:
-                for t in self._data:
-                    if t[0] == object_path and t[2] == method_name:
-                        return self._data[t][1:]
+                tups = self._members.get((object_path, method_name))
+                if tups:
+                    return self._data[next(iter(tups))][1:]
+        for func in self._fallbacks:
+            handler, signature = func(msg)
+            if handler:
+                return handler, signature
         return None, None
+
+    def find_handler(self, msg):
+        """Return handler function for a METHOD_CALL message.
+
+        :raises ~dcar.DBusError: *UnknownMethod* if there is no handler or
+                                 *InvalidArgs* if the signature does not
+                                 match
+        """
+        method, signature = self.find(msg)
+        if not method:
+            raise DBusError('org.freedesktop.DBus.Error.UnknownMethod',
+                            'Method %r not found in interface %r '
+                            'on object path %r' %
+                            (msg.fields[HeaderField.MEMBER],
+                             msg.fields[HeaderField.INTERFACE],
+                             msg.fields[HeaderField.PATH]))
+        if not (not signature and not msg.fields[HeaderField.SIGNATURE] or
+                signature == msg.fields[HeaderField.SIGNATURE]):
+            raise DBusError('org.freedesktop.DBus.Error.InvalidArgs',
+                            'the message signature "%s" is not the '
+                            'expected "%s"' %
+                            (msg.fields[HeaderField.SIGNATURE] or '',
+                             signature or ''))
+        return method
+
+    def handler_info(self, method, msg):
+        """Return the :class:`~dcar.message.MessageInfo` object for a
+        handler function returned by :meth:`find_handler`.
+
+        :raises ~dcar.MessageError: if the body could not be unmarshalled
+        """
+        if getattr(method, 'variant_signatures', False):
+            return msg.info._replace(args=msg.unmarshal_body(True))
+        return msg.info
@@ -0,0 +1,658 @@
+"""Minimal message bus.
+
+:class:`MessageBus` is a message bus daemon in pure Python that runs in
+threads of the current process. It is meant for testing and benchmarking
+services and clients without a system or session bus.
+
+Supported are:
+
+* listening on a unix domain socket (addresses with ``path``,
+  ``abstract``, or ``tmpdir``)
+* authentication with EXTERNAL and optionally ANONYMOUS
+  (see :func:`dcar.auth.accept`)
+* unique names (``Hello``) and well-known names (``RequestName``,
+  ``ReleaseName``; there are no queues of waiting owners)
+* routing of method calls, replies and unicast signals to their
+  destinations and of broadcast signals according to the match rules
+  (``AddMatch``, ``RemoveMatch``)
+* passing of unix file descriptors
+
+Not supported are activation, policies, eavesdropping and monitoring.
+
+Example::
+
+    with MessageBus() as message_bus:
+        with Bus(message_bus.address) as bus:
+            ...
+"""
+
+import logging
+import os
+import re
+import secrets
+import socket
+import sys
+import tempfile
+import threading
+from contextlib import suppress
+
+from .address import Address, optionally_escaped
+from .const import DEFAULT_SEND_BATCH_SIZE, DEFAULT_RECV_BUFFER_SIZE
+from .errors import AddressError, DBusError, Error, TransportError
+from .message import (HeaderField, MessageType,
+                      error_message, method_return_message, signal_message)
+from .router import MatchRule, OutQueue, Signals
+from .transports import ServerTransport
+from .validate import is_valid_bus_name
+
+__all__ = ['Listener', 'MessageBus']
+
+_logger = logging.getLogger(__name__)
+
+BUS_NAME = 'org.freedesktop.DBus'  #: name of the message bus
+BUS_PATH = '/org/freedesktop/DBus'  #: object path of the message bus
+
+# flags and return values of RequestName and ReleaseName
+NAME_FLAG_ALLOW_REPLACEMENT = 0x1
+NAME_FLAG_REPLACE_EXISTING = 0x2
+REQUEST_NAME_REPLY_PRIMARY_OWNER = 1
+REQUEST_NAME_REPLY_EXISTS = 3
+REQUEST_NAME_REPLY_ALREADY_OWNER = 4
+RELEASE_NAME_REPLY_RELEASED = 1
+RELEASE_NAME_REPLY_NON_EXISTENT = 2
+RELEASE_NAME_REPLY_NOT_OWNER = 3
+
+_ERROR = 'org.freedesktop.DBus.Error.'
+_INTERFACES = (None, BUS_NAME, 'org.freedesktop.DBus.Introspectable',
+               'org.freedesktop.DBus.Peer')
+_XML = '''<!DOCTYPE node PUBLIC
+ "-//freedesktop//DTD D-BUS Object Introspection 1.0//EN"
+ "http://www.freedesktop.org/standards/dbus/1.0/introspect.dtd">
+<node>
+  <interface name="org.freedesktop.DBus">
+    <method name="Hello"><arg direction="out" type="s"/></method>
+    <method name="RequestName">
+      <arg direction="in" type="s"/><arg direction="in" type="u"/>
+      <arg direction="out" type="u"/>
+    </method>
+    <method name="ReleaseName">
+      <arg direction="in" type="s"/><arg direction="out" type="u"/>
+    </method>
+    <method name="GetNameOwner">
+      <arg direction="in" type="s"/><arg direction="out" type="s"/>
+    </method>
+    <method name="NameHasOwner">
+      <arg direction="in" type="s"/><arg direction="out" type="b"/>
+    </method>
+    <method name="ListNames"><arg direction="out" type="as"/></method>
+    <method name="ListActivatableNames">
+      <arg direction="out" type="as"/>
+    </method>
+    <method name="AddMatch"><arg direction="in" type="s"/></method>
+    <method name="RemoveMatch"><arg direction="in" type="s"/></method>
+    <method name="GetId"><arg direction="out" type="s"/></method>
+    <signal name="NameOwnerChanged">
+      <arg type="s"/><arg type="s"/><arg type="s"/>
+    </signal>
+    <signal name="NameLost"><arg type="s"/></signal>
+    <signal name="NameAcquired"><arg type="s"/></signal>
+  </interface>
+  <interface name="org.freedesktop.DBus.Introspectable">
+    <method name="Introspect">
+      <arg direction="out" type="s" name="data"/>
+    </method>
+  </interface>
+  <interface name="org.freedesktop.DBus.Peer">
+    <method name="Ping"/>
+    <method name="GetMachineId">
+      <arg direction="out" type="s" name="machine_uuid"/>
+    </method>
+  </interface>
+</node>
+'''
+_ARG_KEY_RE = re.compile(r'arg(\d+)(path)?$')
+_MESSAGE_TYPES = ('signal', 'method_call', 'method_return', 'error')
+
+
+class Listener:
+    """Base class for servers that listen on a unix domain socket.
+
+    Every accepted connection is passed to :meth:`_handle_connection`
+    in a separate thread. It can be used as a context manager. On entering
+    the runtime context the :meth:`start` method will be called, on exiting
+    the :meth:`stop` method.
+
+    If no address is given, a socket in the default directory for
+    temporary files is used.
+
+    :param str address: D-Bus server address to listen on
+    :param bool allow_anonymous: whether ANONYMOUS authentication is
+                                 accepted
+    :raises ~dcar.AddressError: if there is no supported address
+    """
+
+    def __init__(self, address=None, *, allow_anonymous=False):
+        if address is None:
+            address = 'unix:tmpdir=%s' % _escape(tempfile.gettempdir())
+        self._listen_address = Address(address)
+        self._allow_anonymous = allow_anonymous
+        self._guid = secrets.token_hex(16)
+        self._lock = threading.RLock()
+        self._sock = None
+        self._address = None
+        self._path = None  # socket file to be removed
+
+    @property
+    def address(self):
+        """Return the address for clients (``None`` if not running)."""
+        return self._address
+
+    @property
+    def guid(self):
+        """Return the GUID of this server."""
+        return self._guid
+
+    @property
+    def running(self):
+        """Return ``True`` if the server is running."""
+        return self._sock is not None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
+
+    def start(self):
+        """Start listening for connections.
+
+        :raises OSError: if the socket could not be created
+        """
+        with self._lock:
+            if self.running:
+                return
+            self._sock, self._address, self._path = _listen(
+                self._listen_address, self._guid)
+            threading.Thread(target=self._accept_loop, args=(self._sock,),
+                             name='accept-loop', daemon=True).start()
+
+    def stop(self):
+        """Stop listening and close all connections."""
+        with self._lock:
+            if not self.running:
+                return
+            with suppress(OSError):
+                self._sock.shutdown(socket.SHUT_RDWR)
+            self._sock.close()
+            self._sock = self._address = None
+            if self._path:
+                with suppress(OSError):
+                    os.unlink(self._path)
+                self._path = None
+        self._close_connections()
+
+    def _accept_loop(self, sock):
+        while True:
+            try:
+                client_sock, _ = sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._handle_connection,
+                             args=(client_sock,), name='auth',
+                             daemon=True).start()
+        _logger.debug('EXIT accept loop')
+
+    def _handle_connection(self, sock):
+        """Authenticate and start an accepted connection."""
+        raise NotImplementedError
+
+    def _close_connections(self):
+        """Close all connections."""
+        raise NotImplementedError
+
+
+class MessageBus(Listener):
+    """A minimal message bus.
+
+    See :class:`Listener` for the parameters.
+    """
+
+    def __init__(self, address=None, *, allow_anonymous=False):
+        super().__init__(address, allow_anonymous=allow_anonymous)
+        self._counter = 0
+        self._connections = set()
+        self._unique_names = {}  # unique name -> connection
+        self._names = {}  # name -> [owner, allow replacement]
+        self._signals = Signals()
+        self._methods = {
+            'Hello': ('', 's', self._hello),
+            'RequestName': ('su', 'u', self._request_name),
+            'ReleaseName': ('s', 'u', self._release_name),
+            'GetNameOwner': ('s', 's', self._get_name_owner),
+            'NameHasOwner': ('s', 'b', self._name_has_owner),
+            'ListNames': ('', 'as', self._list_names),
+            'ListActivatableNames': ('', 'as', lambda conn: ([BUS_NAME],)),
+            'AddMatch': ('s', '', self._add_match),
+            'RemoveMatch': ('s', '', self._remove_match),
+            'GetId': ('', 's', lambda conn: (self._guid,)),
+            'Ping': ('', '', lambda conn: ()),
+            'GetMachineId': ('', 's', lambda conn: (self._guid,)),
+            'Introspect': ('', 's', lambda conn: (_XML,)),
+        }
+
+    def _close_connections(self):
+        with self._lock:
+            connections = list(self._connections)
+        for conn in connections:
+            conn.transport.disconnect()
+
+    def _handle_connection(self, sock):
+        conn = _Connection(self, sock)
+        try:
+            conn.transport.authenticate()
+        except Exception:
+            _logger.debug('authentication failed', exc_info=True)
+            sock.close()
+            return
+        with self._lock:
+            if not self.running:
+                sock.close()
+                return
+            self._connections.add(conn)
+        conn.transport.start_loops()
+
+    def _remove_connection(self, conn):
+        conn.out_queue.close()
+        with self._lock:
+            if conn not in self._connections:
+                return
+            self._connections.discard(conn)
+            for rule_ids in conn.matches.values():
+                for rule_id in rule_ids:
+                    self._signals.remove(rule_id)
+            for name in list(conn.names):
+                self._release(conn, name)
+            if conn.unique_name:
+                del self._unique_names[conn.unique_name]
+                self._name_owner_changed(conn.unique_name,
+                                         conn.unique_name, '')
+
+    def _incoming(self, conn, msg):
+        if msg is None:  # connection closed
+            self._remove_connection(conn)
+            return
+        try:
+            self._route(conn, msg)
+        finally:
+            for fd in msg.unix_fds:  # every receiver got its own duplicates
+                with suppress(OSError):
+                    os.close(fd)
+
+    def _route(self, conn, msg):
+        if msg.message_type is MessageType.INVALID:
+            return
+        fields = msg.fields
+        destination = fields[HeaderField.DESTINATION]
+        with self._lock:
+            if conn.unique_name is None and not (
+                    destination == BUS_NAME and
+                    fields[HeaderField.MEMBER] == 'Hello'):
+                _logger.debug('message before Hello: %s', msg)
+                conn.transport.disconnect()
+                return
+            fields[HeaderField.SENDER] = conn.unique_name
+            if destination == BUS_NAME:
+                if msg.message_type is MessageType.METHOD_CALL:
+                    self._call_bus_method(conn, msg)
+                return
+            # the header is marshalled again, the body is copied
+            data = msg.to_buffer()
+            if destination is not None:
+                target = self._owner(destination)
+                if target is None:
+                    self._reply_error(
+                        conn, msg, _ERROR + 'ServiceUnknown',
+                        'The name %s was not provided by any .service files'
+                        % destination)
+                elif msg.unix_fds_cnt and not target.unix_fds_enabled:
+                    self._reply_error(
+                        conn, msg, _ERROR + 'NotSupported',
+                        'The destination does not support unix fds')
+                else:
+                    target.send(data)
+            elif msg.message_type is MessageType.SIGNAL:
+                self._broadcast(msg, data)
+
+    def _broadcast(self, msg, data):
+        sender = msg.fields[HeaderField.SENDER]
+        targets = []
+        for match in self._signals.matches(msg, None):
+            if match.conn in targets or (
+                    match.sender is not None and
+                    self._owner(match.sender) is not self._owner(sender)):
+                continue
+            if msg.unix_fds_cnt and not match.conn.unix_fds_enabled:
+                continue
+            targets.append(match.conn)
+        for target in targets:
+            target.send(data)
+
+    def _owner(self, name):
+        if name.startswith(':'):
+            return self._unique_names.get(name)
+        owner = self._names.get(name)
+        return owner[0] if owner else None
+
+    def _call_bus_method(self, conn, msg):
+        fields = msg.fields
+        try:
+            if fields[HeaderField.INTERFACE] not in _INTERFACES:
+                raise DBusError(_ERROR + 'UnknownInterface',
+                                'Unknown interface %s' %
+                                fields[HeaderField.INTERFACE])
+            member = fields[HeaderField.MEMBER]
+            try:
+                in_sig, out_sig, func = self._methods[member]
+            except KeyError:
+                raise DBusError(_ERROR + 'UnknownMethod',
+                                '%s does not understand message %s' %
+                                (BUS_NAME, member)) from None
+            if (fields[HeaderField.SIGNATURE] or '') != in_sig:
+                raise DBusError(_ERROR + 'InvalidArgs',
+                                'Invalid arguments for %s' % member)
+            result = func(conn, *msg.body)
+        except DBusError as ex:
+            self._reply_error(conn, msg, *ex.args)
+            return
+        if msg.reply_expected:
+            conn.send(method_return_message(msg.serial, conn.unique_name,
+                                            BUS_NAME, out_sig or None,
+                                            result).to_buffer())
+        if member == 'Hello':
+            self._send_signal('NameAcquired', conn.unique_name, 's',
+                              (conn.unique_name,))
+            self._name_owner_changed(conn.unique_name, '', conn.unique_name)
+
+    def _reply_error(self, conn, msg, error_name, text=None):
+        if msg.reply_expected:
+            conn.send(error_message(error_name, msg.serial, conn.unique_name,
+                                    BUS_NAME, 's' if text else None,
+                                    (text,) if text else ()).to_buffer())
+
+    def _send_signal(self, signal_name, destination, signature, args):
+        msg = signal_message(BUS_PATH, BUS_NAME, signal_name, destination,
+                             BUS_NAME, signature, args)
+        if destination is None:
+            self._broadcast(msg, msg.to_buffer())
+        else:
+            target = self._owner(destination)
+            if target:
+                target.send(msg.to_buffer())
+
+    def _name_owner_changed(self, name, old_owner, new_owner):
+        self._send_signal('NameOwnerChanged', None, 'sss',
+                          (name, old_owner, new_owner))
+
+    def _hello(self, conn):
+        if conn.unique_name is not None:
+            raise DBusError(_ERROR + 'Failed',
+                            'Already handled an Hello message')
+        self._counter += 1
+        conn.unique_name = ':1.%d' % self._counter
+        self._unique_names[conn.unique_name] = conn
+        return (conn.unique_name,)
+
+    def _request_name(self, conn, name, flags):
+        if name.startswith(':') or not is_valid_bus_name(name):
+            raise DBusError(_ERROR + 'InvalidArgs',
+                            'Cannot acquire a service named %r' % name)
+        if name == BUS_NAME:
+            raise DBusError(_ERROR + 'InvalidArgs',
+                            'Connection is not allowed to own the service'
+                            ' %r because it is reserved' % name)
+        allow_replacement = bool(flags & NAME_FLAG_ALLOW_REPLACEMENT)
+        owner = self._names.get(name)
+        if owner is None:
+            self._names[name] = [conn, allow_replacement]
+            conn.names.add(name)
+            self._send_signal('NameAcquired', conn.unique_name, 's', (name,))
+            self._name_owner_changed(name, '', conn.unique_name)
+            return (REQUEST_NAME_REPLY_PRIMARY_OWNER,)
+        old_conn, old_allow_replacement = owner
+        if old_conn is conn:
+            owner[1] = allow_replacement
+            return (REQUEST_NAME_REPLY_ALREADY_OWNER,)
+        if old_allow_replacement and flags & NAME_FLAG_REPLACE_EXISTING:
+            self._names[name] = [conn, allow_replacement]
+            old_conn.names.discard(name)
+            conn.names.add(name)
+            self._send_signal('NameLost', old_conn.unique_name, 's', (name,))
+            self._send_signal('NameAcquired', conn.unique_name, 's', (name,))
+            self._name_owner_changed(name, old_conn.unique_name,
+                                     conn.unique_name)
+            return (REQUEST_NAME_REPLY_PRIMARY_OWNER,)
+        return (REQUEST_NAME_REPLY_EXISTS,)
+
+    def _release_name(self, conn, name):
+        if name.startswith(':') or not is_valid_bus_name(name):
+            raise DBusError(_ERROR + 'InvalidArgs',
+                            'Cannot release a service named %r' % name)
+        owner = self._names.get(name)
+        if owner is None:
+            return (RELEASE_NAME_REPLY_NON_EXISTENT,)
+        if owner[0] is not conn:
+            return (RELEASE_NAME_REPLY_NOT_OWNER,)
+        self._release(conn, name)
+        return (RELEASE_NAME_REPLY_RELEASED,)
+
+    def _release(self, conn, name):
+        del self._names[name]
+        conn.names.discard(name)
+        self._send_signal('NameLost', conn.unique_name, 's', (name,))
+        self._name_owner_changed(name, conn.unique_name, '')
+
+    def _get_name_owner(self, conn, name):
+        if name == BUS_NAME:
+            return (BUS_NAME,)
+        owner = self._owner(name)
+        if owner is None:
+            raise DBusError(_ERROR + 'NameHasNoOwner',
+                            "Could not get owner of name '%s': no such name"
+                            % name)
+        return (owner.unique_name,)
+
+    def _name_has_owner(self, conn, name):
+        return (name == BUS_NAME or self._owner(name) is not None,)
+
+    def _list_names(self, conn):
+        return ([BUS_NAME] +
+                list(self._unique_names) +
+                list(self._names),)
+
+    def _add_match(self, conn, rule_str):
+        try:
+            key, msg_type, rule, sender = _parse_match_rule(rule_str)
+        except (Error, ValueError, TypeError, IndexError) as ex:
+            raise DBusError(_ERROR + 'MatchRuleInvalid', str(ex)) from None
+        rule_ids = conn.matches.setdefault(key, [])
+        if msg_type == 'signal':  # other types are only for eavesdropping
+            rule_ids.append(self._signals.add_rule(rule,
+                                                   _Match(conn, sender)))
+        else:
+            rule_ids.append(None)
+        return ()
+
+    def _remove_match(self, conn, rule_str):
+        try:
+            key = _parse_match_rule(rule_str)[0]
+        except (Error, ValueError, TypeError, IndexError) as ex:
+            raise DBusError(_ERROR + 'MatchRuleInvalid', str(ex)) from None
+        rule_ids = conn.matches.get(key)
+        if not rule_ids:
+            raise DBusError(_ERROR + 'MatchRuleNotFound',
+                            'The given match rule wasn\'t found and can\'t'
+                            ' be removed')
+        rule_id = rule_ids.pop()
+        if not rule_ids:
+            del conn.matches[key]
+        if rule_id is not None:
+            self._signals.remove(rule_id)
+        return ()
+
+
+class _Connection:
+    """A connection to a client.
+
+    It is the router of its :class:`~dcar.transports.ServerTransport`.
+    """
+
+    compact_arrays = False
+    send_batch_size = DEFAULT_SEND_BATCH_SIZE
+    recv_buffer_size = DEFAULT_RECV_BUFFER_SIZE
+
+    def __init__(self, message_bus, sock):
+        self.transport = ServerTransport(sock, self, message_bus.guid,
+                                         message_bus._allow_anonymous)
+        self.out_queue = OutQueue()
+        self.unique_name = None
+        self.names = set()  # owned well-known names
+        self.matches = {}  # parsed match rule -> list of rule IDs
+        self._message_bus = message_bus
+
+    @property
+    def unix_fds_enabled(self):
+        """Return ``True`` if unix fds can be passed to the client."""
+        return self.transport.unix_fds_enabled
+
+    def incoming(self, msg):
+        """Handle a message from the client."""
+        self._message_bus._incoming(self, msg)
+
+    def send(self, data):
+        """Send a message to the client.
+
+        The client gets its own duplicates of the unix fds.
+
+        :param data: the message data and the list of unix fds
+                     (see :meth:`~dcar.message.Message.to_buffer`)
+        """
+        buf, unix_fds = data
+        try:
+            self.out_queue.put((buf, [os.dup(fd) for fd in unix_fds]))
+        except TransportError:
+            pass  # disconnected
+
+
+class _Match:
+    """A match rule of a connection.
+
+    It is added to :class:`~dcar.router.Signals` with
+    :meth:`~dcar.router.Signals.add_rule`. A well-known name in ``sender``
+    is compared with the current owner when a signal is matched.
+    """
+
+    def __init__(self, conn, sender):
+        self.conn = conn
+        self.sender = sender
+
+
+def _parse_match_rule(rule_str):
+    """Parse a match rule.
+
+    :returns: a hashable key for the rule, the message type, the
+              :class:`~dcar.MatchRule`, and a well-known sender name or
+              ``None``
+    :raises ValueError: if the rule could not be parsed
+    :raises ~dcar.Error: if there is an invalid value
+    """
+    items = {}
+    pos = 0
+    while pos < len(rule_str):
+        eq = rule_str.find('=', pos)
+        if eq < 0:
+            raise ValueError('no value in %r' % rule_str[pos:])
+        key = rule_str[pos:eq]
+        pos = eq + 1
+        value = []
+        while pos < len(rule_str) and rule_str[pos] != ',':
+            if rule_str[pos] == "'":
+                end = rule_str.find("'", pos + 1)
+                if end < 0:
+                    raise ValueError('unterminated quoted value')
+                value.append(rule_str[pos + 1:end])
+                pos = end + 1
+            elif rule_str.startswith("\\'", pos):
+                value.append("'")
+                pos += 2
+            else:
+                value.append(rule_str[pos])
+                pos += 1
+        if key in items:
+            raise ValueError('duplicate key %r' % key)
+        items[key] = ''.join(value)
+        pos += 1
+    items.pop('eavesdrop', None)
+    msg_type = items.get('type', 'signal')
+    if msg_type not in _MESSAGE_TYPES:
+        raise ValueError('invalid type %r' % msg_type)
+    if 'path' in items and 'path_namespace' in items:
+        raise ValueError('path and path_namespace in the same rule')
+    sender = items.get('sender')
+    rule = MatchRule(
+        object_path=items.get('path'), interface=items.get('interface'),
+        signal_name=items.get('member'),
+        sender=sender if sender is None or sender.startswith(':') or
+        sender == BUS_NAME else None,
+        path_namespace=items.get('path_namespace'),
+        destination=items.get('destination'),
+        arg0namespace=items.get('arg0namespace'))
+    for key, value in items.items():
+        if key in ('type', 'sender', 'interface', 'member', 'path',
+                   'path_namespace', 'destination', 'arg0namespace'):
+            continue
+        mo = _ARG_KEY_RE.match(key)
+        if not mo:
+            raise ValueError('unknown key %r' % key)
+        if mo.group(2):
+            rule.add_argpath(int(mo.group(1)), value)
+        else:
+            rule.add_arg(int(mo.group(1)), value)
+    if rule.sender is not None:
+        sender = None  # compared by the rule
+    return (tuple(sorted(items.items())), msg_type, rule, sender)
+
+
+def _listen(address, guid):
+    for name, params in address:
+        if name != 'unix':
+            continue
+        path = None
+        if 'path' in params:
+            path = params['path']
+        elif 'tmpdir' in params or 'dir' in params:
+            path = os.path.join(params.get('tmpdir') or params['dir'],
+                                'dcar-%s' % secrets.token_hex(8))
+        if path is not None:
+            sock_addr = path
+            client_address = 'unix:path=%s' % _escape(path)
+        elif 'abstract' in params and sys.platform.startswith('linux'):
+            sock_addr = b'\0' + params['abstract'].encode()
+            client_address = 'unix:abstract=%s' % _escape(params['abstract'])
+        else:
+            continue
+        sock = socket.socket(socket.AF_UNIX)
+        try:
+            sock.bind(sock_addr)
+            sock.listen()
+        except OSError:
+            sock.close()
+            raise
+        return sock, '%s,guid=%s' % (client_address, guid), path
+    raise AddressError('no supported address: %s' % address)
+
+
+def _escape(s):
+    return ''.join(chr(b) if b in optionally_escaped else '%%%02x' % b
+                   for b in s.encode(sys.getfilesystemencoding()))
@@ -0,0 +1,759 @@
+"""Export of Python objects on a message bus.
+
+The D-Bus members of a :class:`ServiceObject` are declared with the
+decorators :func:`dbus_method`, :func:`dbus_signal`, and
+:func:`dbus_property`. An :class:`ObjectServer` exports the objects and
+implements the standard interfaces for them.
+
+Example::
+
+    class Counter(ServiceObject):
+        interface = 'org.example.Counter'
+
+        def __init__(self):
+            self._value = 0
+
+        @dbus_method('u', 'u')
+        def Add(self, n):
+            self.Value = self._value + n  # emits PropertiesChanged
+            if self._value > 100:
+                self.Overflow(self._value)
+            return self._value
+
+        @dbus_signal('u')
+        def Overflow(self, value):
+            return value
+
+        @dbus_property('u', access='readwrite')
+        def Value(self):
+            return self._value
+
+        @Value.setter
+        def Value(self, value):
+            self._value = value
+
+    server = ObjectServer(bus, manager_path='/org/example')
+    server.export('/org/example/Counter1', Counter())
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+from .errors import DBusError, RegisterError, TransportError
+from .message import HeaderField
+from .signature import Signature
+from .validate import (validate_interface_name, validate_member_name,
+                       validate_object_path)
+
+__all__ = [
+    'ServiceObject',
+    'ObjectServer',
+    'dbus_method',
+    'dbus_signal',
+    'dbus_property',
+]
+
+_logger = logging.getLogger(__name__)
+
+_ERROR = 'org.freedesktop.DBus.Error.'
+_INTROSPECTABLE = 'org.freedesktop.DBus.Introspectable'
+_PROPERTIES = 'org.freedesktop.DBus.Properties'
+_OBJECT_MANAGER = 'org.freedesktop.DBus.ObjectManager'
+_ACCESS = ('read', 'write', 'readwrite')
+_EMITS_CHANGED = ('true', 'invalidates', 'const', 'false')
+
+_DOCTYPE = '''<!DOCTYPE node PUBLIC
+ "-//freedesktop//DTD D-BUS Object Introspection 1.0//EN"
+ "http://www.freedesktop.org/standards/dbus/1.0/introspect.dtd">
+'''
+_STANDARD_XML = '''  <interface name="org.freedesktop.DBus.Introspectable">
+    <method name="Introspect">
+      <arg direction="out" type="s" name="xml_data"/>
+    </method>
+  </interface>
+'''
+_PROPERTIES_XML = '''  <interface name="org.freedesktop.DBus.Properties">
+    <method name="Get">
+      <arg direction="in" type="s" name="interface_name"/>
+      <arg direction="in" type="s" name="property_name"/>
+      <arg direction="out" type="v" name="value"/>
+    </method>
+    <method name="GetAll">
+      <arg direction="in" type="s" name="interface_name"/>
+      <arg direction="out" type="a{sv}" name="properties"/>
+    </method>
+    <method name="Set">
+      <arg direction="in" type="s" name="interface_name"/>
+      <arg direction="in" type="s" name="property_name"/>
+      <arg direction="in" type="v" name="value"/>
+    </method>
+    <signal name="PropertiesChanged">
+      <arg type="s" name="interface_name"/>
+      <arg type="a{sv}" name="changed_properties"/>
+      <arg type="as" name="invalidated_properties"/>
+    </signal>
+  </interface>
+'''
+_OBJECT_MANAGER_XML = '''  <interface name="org.freedesktop.DBus.ObjectManager">
+    <method name="GetManagedObjects">
+      <arg direction="out" type="a{oa{sa{sv}}}"
+           name="object_paths_interfaces_and_properties"/>
+    </method>
+    <signal name="InterfacesAdded">
+      <arg type="o" name="object_path"/>
+      <arg type="a{sa{sv}}" name="interfaces_and_properties"/>
+    </signal>
+    <signal name="InterfacesRemoved">
+      <arg type="o" name="object_path"/>
+      <arg type="as" name="interfaces"/>
+    </signal>
+  </interface>
+'''
+
+
+def dbus_method(in_signature='', out_signature='', *, name=None,
+                interface=None, no_reply=False):
+    """Decorator for a method of a :class:`ServiceObject`.
+
+    The decorated function is called with the IN arguments. It returns
+    ``None`` if there are no OUT arguments, the value if there is one, and
+    a tuple if there are more. A :class:`~dcar.DBusError` is sent as error
+    reply, any other exception as *org.freedesktop.DBus.Error.Failed*.
+
+    :param str in_signature: D-Bus type signature of the IN arguments
+    :param str out_signature: D-Bus type signature of the OUT arguments
+    :param str name: member name (default: name of the function)
+    :param str interface: interface name (default: attribute ``interface``
+                          of the class)
+    :param bool no_reply: whether the method has the annotation
+                          `org.freedesktop.DBus.Method.NoReply`
+    :raises ~dcar.SignatureError: if a signature is not valid
+    """
+    in_types = _complete_types(in_signature)
+    out_types = _complete_types(out_signature)
+
+    def decorator(func):
+        return _Method(func, name, interface, in_signature, in_types,
+                       out_signature, out_types, no_reply)
+    return decorator
+
+
+def dbus_signal(signature='', *, name=None, interface=None):
+    """Decorator for a signal of a :class:`ServiceObject`.
+
+    Calling the signal on an exported object calls the decorated function
+    and emits the signal with the returned arguments (``None``, a single
+    value, or a tuple like the return value of a :func:`dbus_method`).
+    Nothing is emitted if the object is not exported.
+
+    :param str signature: D-Bus type signature of the arguments
+    :param str name: member name (default: name of the function)
+    :param str interface: interface name (default: attribute ``interface``
+                          of the class)
+    :raises ~dcar.SignatureError: if the signature is not valid
+    """
+    types = _complete_types(signature)
+
+    def decorator(func):
+        return _Signal(func, name, interface, signature, types)
+    return decorator
+
+
+def dbus_property(signature, *, name=None, interface=None, access='read',
+                  emits_changed='true'):
+    """Decorator for the getter of a property of a :class:`ServiceObject`.
+
+    It works like :class:`property`; a setter is added with the decorator
+    ``@<name>.setter``. The setter is used for *Set* calls if ``access``
+    allows writing and it can always be used from Python.
+
+    Setting the property emits *PropertiesChanged* according to
+    ``emits_changed``: ``'true'`` with the new value, ``'invalidates'``
+    without it, and ``'const'`` or ``'false'`` not at all. If the value
+    changes in another way, :meth:`ServiceObject.properties_changed` must
+    be called.
+
+    :param str signature: D-Bus type signature (a single complete type)
+    :param str name: member name (default: name of the getter)
+    :param str interface: interface name (default: attribute ``interface``
+                          of the class)
+    :param str access: ``'read'``, ``'write'``, or ``'readwrite'``
+    :param str emits_changed: value of the annotation
+                              `org.freedesktop.DBus.Property
+                              .EmitsChangedSignal`
+    :raises ValueError: if any argument has an invalid value
+    :raises ~dcar.SignatureError: if the signature is not valid
+    """
+    if access not in _ACCESS:
+        raise ValueError('access must be one of %r' % (_ACCESS,))
+    if emits_changed not in _EMITS_CHANGED:
+        raise ValueError('emits_changed must be one of %r' %
+                         (_EMITS_CHANGED,))
+    if len(Signature.get(signature)) != 1:
+        raise ValueError('signature must be a single complete type')
+
+    def decorator(func):
+        return _Property(func, name, interface, signature, access,
+                         emits_changed)
+    return decorator
+
+
+class _Member:
+    # Base class of the descriptors created by the decorators.
+
+    def __init__(self, func, name, interface):
+        self.func = func
+        self.name = name or func.__name__
+        self.interface = interface
+        self.attr = None
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, attr):
+        self.attr = attr
+        if self.interface is None:
+            self.interface = owner.interface
+        if self.interface is None:
+            raise TypeError('no interface for member %r of %r' %
+                            (attr, owner.__name__))
+        validate_interface_name(self.interface)
+        validate_member_name(self.name)
+
+
+class _Method(_Member):
+
+    def __init__(self, func, name, interface, in_signature, in_types,
+                 out_signature, out_types, no_reply):
+        super().__init__(func, name, interface)
+        self.in_signature = in_signature
+        self.in_types = in_types
+        self.out_signature = out_signature
+        self.out_types = out_types
+        self.no_reply = no_reply
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self.func
+        return self.func.__get__(obj, objtype)
+
+    def xml(self):
+        lines = ['    <method name="%s">' % self.name]
+        lines.extend('      <arg direction="in" type="%s"/>' % t
+                     for t in self.in_types)
+        lines.extend('      <arg direction="out" type="%s"/>' % t
+                     for t in self.out_types)
+        if self.no_reply:
+            lines.append('      <annotation name="org.freedesktop.DBus.'
+                         'Method.NoReply" value="true"/>')
+        lines.append('    </method>')
+        return lines
+
+
+class _Signal(_Member):
+
+    def __init__(self, func, name, interface, signature, types):
+        super().__init__(func, name, interface)
+        self.signature = signature
+        self.types = types
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return partial(self.emit, obj)
+
+    def emit(self, obj, *args, **kwargs):
+        values = self.func(obj, *args, **kwargs)
+        server = obj._dbus_server
+        if server:
+            server._emit(obj._dbus_path, self.interface, self.name,
+                         self.signature, _to_args(self.types, values))
+
+    def xml(self):
+        return (['    <signal name="%s">' % self.name] +
+                ['      <arg type="%s"/>' % t for t in self.types] +
+                ['    </signal>'])
+
+
+class _Property(_Member):
+
+    def __init__(self, func, name, interface, signature, access,
+                 emits_changed):
+        super().__init__(func, name, interface)
+        self.signature = signature
+        self.access = access
+        self.emits_changed = emits_changed
+        self.fset = None
+
+    @property
+    def readable(self):
+        return 'read' in self.access
+
+    @property
+    def writable(self):
+        return 'write' in self.access and self.fset is not None
+
+    def setter(self, fset):
+        self.fset = fset
+        return self
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return self.func(obj)
+
+    def __set__(self, obj, value):
+        if self.fset is None:
+            raise AttributeError("can't set attribute %r" % self.attr)
+        self.fset(obj, value)
+        server = obj._dbus_server
+        if server:
+            server._changed(obj, self)
+
+    def xml(self):
+        line = '    <property name="%s" type="%s" access="%s"' % (
+            self.name, self.signature, self.access)
+        if self.emits_changed == 'true':
+            return [line + '/>']
+        return [line + '>',
+                '      <annotation name="org.freedesktop.DBus.Property.'
+                'EmitsChangedSignal" value="%s"/>' % self.emits_changed,
+                '    </property>']
+
+
+class ServiceObject:
+    """Base class for objects that can be exported with an
+    :class:`ObjectServer`.
+
+    The D-Bus members are declared with the decorators :func:`dbus_method`,
+    :func:`dbus_signal`, and :func:`dbus_property`. They belong to the
+    interface given to the decorator or else to the interface in the class
+    attribute :attr:`interface`. Besides its own interfaces each object
+    implements `org.freedesktop.DBus.Introspectable` and
+    `org.freedesktop.DBus.Properties`.
+
+    An object can be exported at one path of one server at a time.
+    """
+
+    interface = None  #: default interface name of the members
+    _dbus_server = None
+    _dbus_path = None
+    _dbus_interfaces = {}
+    _dbus_methods = {}
+    _dbus_xml = ''
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        interfaces = {}  # interface -> {member name: member}
+        members = {}  # attribute name -> member
+        for klass in reversed(cls.__mro__):
+            for attr, value in vars(klass).items():
+                if isinstance(value, _Member):
+                    members[attr] = value
+                else:
+                    members.pop(attr, None)
+        for member in members.values():
+            interfaces.setdefault(member.interface, {})[member.name] = member
+        cls._dbus_interfaces = interfaces
+        # for method calls without interface
+        cls._dbus_methods = {}
+        for iface in interfaces.values():
+            for member in iface.values():
+                if isinstance(member, _Method):
+                    cls._dbus_methods.setdefault(member.name, member)
+        cls._dbus_xml = ''.join(
+            '\n'.join(['  <interface name="%s">' % name] +
+                      [line for member in iface.values()
+                       for line in member.xml()] +
+                      ['  </interface>']) + '\n'
+            for name, iface in sorted(interfaces.items()))
+
+    @property
+    def dbus_path(self):
+        """Return the object path or ``None`` if the object is not
+        exported."""
+        return self._dbus_path
+
+    @property
+    def dbus_server(self):
+        """Return the :class:`ObjectServer` or ``None`` if the object is not
+        exported."""
+        return self._dbus_server
+
+    def properties_changed(self, *names, interface=None):
+        """Emit *PropertiesChanged* for properties whose values changed
+        without using their setters.
+
+        Nothing is emitted if the object is not exported.
+
+        :param str names: the names of the properties
+        :param str interface: interface name (only needed if a name is in
+                              more than one interface)
+        :raises KeyError: if a property does not exist
+        """
+        props = [_find_property(type(self), interface, name)
+                 for name in names]
+        if None in props:
+            raise KeyError(names[props.index(None)])
+        server = self._dbus_server
+        if server:
+            for prop in props:
+                server._changed(self, prop)
+
+
+class ObjectServer:
+    """Exports :class:`ServiceObject` objects on a bus.
+
+    Incoming method calls for all exported objects are dispatched through
+    one table with the object paths, so exporting an object only adds an
+    entry to this table (no handlers are registered for single methods).
+    *Introspect* is implemented for the exported objects and for all
+    paths that lead to them.
+
+    If ``manager_path`` is not ``None``, the interface
+    `org.freedesktop.DBus.ObjectManager` is implemented at this path for
+    all objects below it, and *InterfacesAdded* and *InterfacesRemoved*
+    are emitted when such objects are exported or unexported.
+
+    *PropertiesChanged* signals are batched: all changes while a method
+    call is handled or in the runtime context of :meth:`batch` are emitted
+    afterwards with one signal per object and interface.
+
+    :param dcar.Bus bus: the bus
+    :param str manager_path: object path of the object manager
+    :raises ~dcar.ValidationError: if ``manager_path`` is not valid
+    """
+
+    def __init__(self, bus, manager_path=None):
+        if manager_path is not None:
+            validate_object_path(manager_path)
+        self._bus = bus
+        self._manager_path = manager_path
+        self._manager_prefix = (manager_path.rstrip('/') + '/'
+                                if manager_path else None)
+        self._lock = threading.Lock()
+        self._objects = {}  # path -> ServiceObject
+        self._children = {}  # path -> {child name: number of objects}
+        self._local = threading.local()
+        bus._router.methods.add_fallback(self._find)
+
+    @property
+    def bus(self):
+        """Return the bus."""
+        return self._bus
+
+    @property
+    def manager_path(self):
+        """Return the object path of the object manager or ``None``."""
+        return self._manager_path
+
+    def __getitem__(self, path):
+        return self._objects[path]
+
+    def __contains__(self, path):
+        return path in self._objects
+
+    def __len__(self):
+        return len(self._objects)
+
+    def export(self, path, obj):
+        """Export an object.
+
+        :param str path: object path
+        :param ServiceObject obj: the object
+        :raises TypeError: if ``obj`` is not a :class:`ServiceObject`
+        :raises ~dcar.RegisterError: if ``obj`` is already exported or
+                                     there is already an object at ``path``
+        :raises ~dcar.ValidationError: if ``path`` is not valid
+        """
+        validate_object_path(path)
+        if not isinstance(obj, ServiceObject):
+            raise TypeError('obj must be a ServiceObject')
+        with self._lock:
+            if obj._dbus_server is not None:
+                raise RegisterError('object already exported at %r' %
+                                    obj._dbus_path)
+            if path in self._objects:
+                raise RegisterError('an object at %r already exists' % path)
+            self._objects[path] = obj
+            obj._dbus_server = self
+            obj._dbus_path = path
+            parent, _, child = path.rpartition('/')
+            while child:
+                children = self._children.setdefault(parent or '/', {})
+                children[child] = children.get(child, 0) + 1
+                parent, _, child = parent.rpartition('/')
+        if self._managed(path):
+            self._emit(self._manager_path, _OBJECT_MANAGER, 'InterfacesAdded',
+                       'oa{sa{sv}}', (path, _interfaces_and_properties(obj)))
+
+    def unexport(self, path):
+        """Unexport the object at ``path``.
+
+        :param str path: object path
+        :returns: the object
+        :rtype: ServiceObject
+        :raises KeyError: if there is no object at ``path``
+        """
+        with self._lock:
+            obj = self._objects.pop(path)
+            obj._dbus_server = None
+            obj._dbus_path = None
+            parent, _, child = path.rpartition('/')
+            while child:
+                parent = parent or '/'
+                children = self._children[parent]
+                children[child] -= 1
+                if not children[child]:
+                    del children[child]
+                    if not children:
+                        del self._children[parent]
+                parent, _, child = parent.rpartition('/')
+        if self._managed(path):
+            self._emit(self._manager_path, _OBJECT_MANAGER,
+                       'InterfacesRemoved', 'oas',
+                       (path, _interface_names(obj)))
+        return obj
+
+    def close(self):
+        """Unexport all objects and stop dispatching method calls.
+
+        No signals are emitted.
+        """
+        self._bus._router.methods.remove_fallback(self._find)
+        with self._lock:
+            for obj in self._objects.values():
+                obj._dbus_server = None
+                obj._dbus_path = None
+            self._objects.clear()
+            self._children.clear()
+
+    @contextmanager
+    def batch(self):
+        """Return a context manager that collects the *PropertiesChanged*
+        signals of this thread and emits them on exit."""
+        local = self._local
+        if getattr(local, 'changes', None) is not None:
+            yield  # nested
+            return
+        local.changes = {}  # (obj, interface) -> {name: property}
+        try:
+            yield
+        finally:
+            changes, local.changes = local.changes, None
+            for (obj, interface), props in changes.items():
+                self._emit_changed(obj, interface, props.values())
+
+    def _changed(self, obj, prop):
+        if prop.emits_changed in ('const', 'false'):
+            return
+        changes = getattr(self._local, 'changes', None)
+        if changes is None:
+            self._emit_changed(obj, prop.interface, (prop,))
+        else:
+            changes.setdefault((obj, prop.interface), {})[prop.name] = prop
+
+    def _emit_changed(self, obj, interface, props):
+        path = obj._dbus_path
+        if obj._dbus_server is not self:  # unexported in the meantime
+            return
+        changed = {}
+        invalidated = []
+        for prop in props:
+            if prop.emits_changed == 'true' and prop.readable:
+                changed[prop.name] = (prop.signature, prop.__get__(obj))
+            else:
+                invalidated.append(prop.name)
+        self._emit(path, _PROPERTIES, 'PropertiesChanged', 'sa{sv}as',
+                   (interface, changed, invalidated))
+
+    def _emit(self, path, interface, name, signature, args):
+        if self._bus.connected or self._bus.reconnecting:
+            self._bus.emit_signal(path, interface, name,
+                                  signature=signature, args=args)
+
+    def _managed(self, path):
+        return (self._manager_prefix is not None and
+                path.startswith(self._manager_prefix) and
+                path != self._manager_path)
+
+    def _find(self, msg):
+        """Return the handler and signature for a method call or
+        ``(None, None)`` (see :meth:`~dcar.router.Methods.add_fallback`).
+        """
+        fields = msg.fields
+        path = fields[HeaderField.PATH]
+        interface = fields[HeaderField.INTERFACE]
+        method_name = fields[HeaderField.MEMBER]
+        obj = self._objects.get(path)
+        if obj is not None:
+            cls = type(obj)
+            if interface is None:
+                method = cls._dbus_methods.get(method_name)
+            else:
+                method = cls._dbus_interfaces.get(interface, {}).get(
+                    method_name)
+            if isinstance(method, _Method):
+                return partial(self._call, obj, method), method.in_signature
+            if interface in (None, _PROPERTIES):
+                if method_name == 'Get':
+                    return partial(self._get, obj), 'ss'
+                if method_name == 'GetAll':
+                    return partial(self._get_all, obj), 's'
+                if method_name == 'Set':
+                    # the signature of the value is checked
+                    handler = partial(self._set, obj)
+                    handler.variant_signatures = True
+                    return handler, 'ssv'
+        elif path not in self._children and path != self._manager_path:
+            return None, None
+        if interface in (None, _INTROSPECTABLE) and method_name == 'Introspect':
+            return partial(self._introspect, path, obj), None
+        if (interface in (None, _OBJECT_MANAGER) and
+                method_name == 'GetManagedObjects' and
+                path == self._manager_path):
+            return self._get_managed_objects, None
+        return None, None
+
+    def _call(self, obj, method, bus, info):
+        with self.batch():
+            with _failed('method %s.%s' % (method.interface, method.name)):
+                values = method.__get__(obj)(*info.args)
+                if not info.no_reply_expected:
+                    bus.method_return(info.serial, info.sender,
+                                      signature=method.out_signature or None,
+                                      args=_to_args(method.out_types, values))
+
+    def _get(self, obj, bus, info):
+        interface, name = info.args
+        prop = _find_property(type(obj), interface, name)
+        if prop is None:
+            raise _unknown_property(interface, name)
+        if not prop.readable:
+            raise DBusError(_ERROR + 'AccessDenied',
+                            'property %r is not readable' % name)
+        with _failed('property %s.%s' % (prop.interface, prop.name)):
+            bus.method_return(info.serial, info.sender, signature='v',
+                              args=((prop.signature, prop.__get__(obj)),))
+
+    def _get_all(self, obj, bus, info):
+        interface, = info.args
+        if interface and interface not in _interface_names(obj):
+            raise DBusError(_ERROR + 'UnknownInterface',
+                            'interface %r not found' % interface)
+        with _failed('properties of %s' % interface):
+            bus.method_return(info.serial, info.sender, signature='a{sv}',
+                              args=(_properties(obj, interface),))
+
+    def _set(self, obj, bus, info):
+        interface, name, (signature, value) = info.args
+        prop = _find_property(type(obj), interface, name)
+        if prop is None:
+            raise _unknown_property(interface, name)
+        if not prop.writable:
+            raise DBusError(_ERROR + 'PropertyReadOnly',
+                            'property %r is not writable' % name)
+        if prop.signature == 'v':
+            value = (signature, value)
+        elif signature != prop.signature:
+            raise DBusError(_ERROR + 'InvalidArgs',
+                            'property %r has signature %r, not %r' %
+                            (name, prop.signature, signature))
+        with self.batch():
+            try:
+                prop.__set__(obj, value)
+            except DBusError:
+                raise
+            except Exception as ex:
+                raise DBusError(_ERROR + 'InvalidArgs', str(ex)) from None
+            bus.method_return(info.serial, info.sender)
+
+    def _introspect(self, path, obj, bus, info):
+        xml = [_DOCTYPE, '<node>\n', _STANDARD_XML]
+        if obj is not None:
+            xml.extend((_PROPERTIES_XML, type(obj)._dbus_xml))
+        if path == self._manager_path:
+            xml.append(_OBJECT_MANAGER_XML)
+        with self._lock:
+            children = sorted(self._children.get(path, ()))
+        xml.extend('  <node name="%s"/>\n' % child for child in children)
+        xml.append('</node>\n')
+        bus.method_return(info.serial, info.sender, signature='s',
+                          args=(''.join(xml),))
+
+    def _get_managed_objects(self, bus, info):
+        with self._lock:
+            objects = [(path, obj) for path, obj in self._objects.items()
+                       if self._managed(path)]
+        with _failed('GetManagedObjects'):
+            bus.method_return(info.serial, info.sender,
+                              signature='a{oa{sa{sv}}}',
+                              args=({path: _interfaces_and_properties(obj)
+                                     for path, obj in objects},))
+
+
+@contextmanager
+def _failed(what):
+    # errors (e.g. return values that do not match the signature) are sent
+    # as replies, otherwise the caller would wait until its timeout
+    try:
+        yield
+    except (DBusError, TransportError):
+        raise
+    except Exception as ex:
+        _logger.error('%s failed', what, exc_info=True)
+        raise DBusError(_ERROR + 'Failed', str(ex)) from None
+
+
+def _find_property(cls, interface, name):
+    if interface:
+        prop = cls._dbus_interfaces.get(interface, {}).get(name)
+    else:
+        prop = next((iface[name] for iface in cls._dbus_interfaces.values()
+                     if isinstance(iface.get(name), _Property)), None)
+    return prop if isinstance(prop, _Property) else None
+
+
+def _unknown_property(interface, name):
+    return DBusError(_ERROR + 'UnknownProperty',
+                     'property %r not found in interface %r' %
+                     (name, interface))
+
+
+def _properties(obj, interface):
+    return {member.name: (member.signature, member.__get__(obj))
+            for member in type(obj)._dbus_interfaces.get(interface,
+                                                         {}).values()
+            if isinstance(member, _Property) and member.readable}
+
+
+def _interface_names(obj):
+    return [_INTROSPECTABLE, _PROPERTIES] + sorted(type(obj)._dbus_interfaces)
+
+
+def _interfaces_and_properties(obj):
+    return {interface: _properties(obj, interface)
+            for interface in _interface_names(obj)}
+
+
+def _complete_types(signature):
+    Signature.get(signature)  # raises SignatureError
+    types = []
+    start = depth = 0
+    for i, c in enumerate(signature):
+        if c in '({':
+            depth += 1
+        elif c in ')}':
+            depth -= 1
+        if not depth and c != 'a':
+            types.append(signature[start:i + 1])
+            start = i + 1
+    return types
+
+
+def _to_args(types, values):
+    if not types:
+        return ()
+    if len(types) == 1:
+        return (values,)
+    return tuple(values)
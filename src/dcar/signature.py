@@ -1,6 +1,7 @@
 """D-Bus type signature."""
 
 from collections import Counter
+from functools import lru_cache
 
 from . import marshal
 from .const import MAX_SIGNATURE_LEN, MAX_NESTING_DEPTH
@@ -9,22 +10,30 @@ from .errors import SignatureError
 __all__ = ['Signature']
 
 
+SIGNATURE_CACHE_SIZE = 1024  #: maximum number of cached signatures
+
+
 class Signature:
     """A signature.
 
-    The signature string will be parsed into a list of complete types.
+    The signature string will be parsed into a tuple of complete types.
     Each complete type is a tuple with the fist element being its
     signature. The second element is ``None`` for all basic
-    (i.e. fixed and string-like) types, an empty list for variants,
-    and a list of complete types for arrays, structs, and dict entries.
+    (i.e. fixed and string-like) types, an empty tuple for variants,
+    and a tuple of complete types for arrays, structs, and dict entries.
 
     A :class:`Signature` object can be used as an iterator which yields
     tuples of complete types.
 
+    :class:`Signature` objects are immutable. Use :meth:`get` to get
+    a cached object instead of parsing the same signature again.
+
     :param str sig: D-Bus type signature
     :raises ~dcar.SignatureError: if there is a problem with the signature
     """
 
+    __slots__ = ('_string', '_data')
+
     def __init__(self, sig):
         if not isinstance(sig, str):
             raise SignatureError('must be of type str, not %s' %
@@ -32,12 +41,41 @@ class Signature:
         if len(sig) > MAX_SIGNATURE_LEN:
             raise SignatureError('too long: %d > %d' %
                                  (len(sig), MAX_SIGNATURE_LEN))
-        self._string = sig
         counter = Counter()
-        self._data = _parse_signature(list(sig), counter)
+        data, _ = _parse_signature(sig, 0, counter)
         if counter['r'] or counter['e']:
             raise SignatureError('unclosed: struct %d, dict entry %d' %
                                  (counter['r'], counter['e']))
+        object.__setattr__(self, '_string', sig)
+        object.__setattr__(self, '_data', data)
+
+    @classmethod
+    def get(cls, sig):
+        """Return a cached :class:`Signature` object.
+
+        At most :data:`SIGNATURE_CACHE_SIZE` signatures are cached.
+        This method is thread-safe.
+
+        :param str sig: D-Bus type signature
+        :raises ~dcar.SignatureError: if there is a problem with the signature
+        """
+        if not isinstance(sig, str):
+            return cls(sig)  # raises SignatureError
+        return _cached_signature(sig)
+
+    @staticmethod
+    def cache_info():
+        """Return statistics of the cache used by :meth:`get`.
+
+        :returns: see :func:`functools.lru_cache`
+        :rtype: named tuple with the fields ``hits``, ``misses``,
+                ``maxsize``, and ``currsize``
+        """
+        return _cached_signature.cache_info()
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%r object is immutable' %
+                             self.__class__.__name__)
 
     def __len__(self):
         return len(self._data)
@@ -45,6 +83,14 @@ class Signature:
     def __iter__(self):
         return iter(self._data)
 
+    def __eq__(self, other):
+        if isinstance(other, Signature):
+            return self._string == other._string
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._string)
+
     def __str__(self):
         return self._string
 
@@ -52,16 +98,22 @@ class Signature:
         return repr(self._data)
 
 
-def _parse_signature(sig, counter, container=None):
+@lru_cache(maxsize=SIGNATURE_CACHE_SIZE)
+def _cached_signature(sig):
+    return Signature(sig)
+
+
+def _parse_signature(sig, pos, counter, container=None):
     if counter['a'] > MAX_NESTING_DEPTH or counter['r'] > MAX_NESTING_DEPTH:
         raise SignatureError('depth: array %d, struct %d' %
                              (counter['a'], counter['r']))
     ct_lst = []  # list of complete types
-    while sig:
-        token = sig.pop(0)
+    while pos < len(sig):
+        token = sig[pos]
+        pos += 1
         if token == '(':
             counter['r'] += 1
-            lst = _parse_signature(sig, counter, 'r')
+            lst, pos = _parse_signature(sig, pos, counter, 'r')
             if not lst:
                 raise SignatureError('struct must have at least 1 element')
             ct_lst.append(('r', lst))
@@ -69,7 +121,7 @@ def _parse_signature(sig, counter, container=None):
             if container != 'a':
                 raise SignatureError('dict entry outside array')
             counter['e'] += 1
-            lst = _parse_signature(sig, counter, 'e')
+            lst, pos = _parse_signature(sig, pos, counter, 'e')
             if len(lst) != 2:
                 raise SignatureError('dict entry must have 2 elements')
             if lst[0][1] is not None:
@@ -77,12 +129,12 @@ def _parse_signature(sig, counter, container=None):
             ct_lst.append(('e', lst))
         elif token == 'a':
             counter['a'] += 1
-            lst = _parse_signature(sig, counter, 'a')
+            lst, pos = _parse_signature(sig, pos, counter, 'a')
             if not lst:
                 raise SignatureError('array without element type')
             ct_lst.append((token, lst))
         elif token == 'v':
-            ct_lst.append((token, []))
+            ct_lst.append((token, ()))
         elif token in marshal.type_codes:
             ct_lst.append((token, None))
         elif container == 'r' and token == ')':
@@ -93,8 +145,8 @@ def _parse_signature(sig, counter, container=None):
             break
         else:
             raise SignatureError('unexpected token: %r (%r %r)' %
-                                 (token, sig, ct_lst))
+                                 (token, sig[pos:], ct_lst))
         if container == 'a':
             counter['a'] -= 1
             break
-    return ct_lst
+    return tuple(ct_lst), pos
@@ -2,26 +2,58 @@
 
 import array
 import logging
+import os
 import socket
 import threading
 import time
+from collections import namedtuple
 from contextlib import suppress
+from weakref import ref
+from queue import Empty
 
-from .auth import authenticate
+from .auth import accept, authenticate
 from .const import MAX_MESSAGE_LEN, MIN_HEADER_SIZE
 from .errors import TransportError, TooLongError
 from .message import get_sizes, get_unix_fds_cnt, Message
-from .raw import RawData
+from .raw import RawReader
 
 __all__ = [
     'Transport',
     'UnixTransport',
     'TcpTransport',
     'NonceTcpTransport',
+    'ServerTransport',
+    'SendStats',
+    'RecvStats',
 ]
 
 _logger = logging.getLogger(__name__)
 
+_HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
+try:
+    IOV_MAX = os.sysconf('SC_IOV_MAX')  #: max. number of buffers for sendmsg
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 16
+
+SendStats = namedtuple('SendStats', 'messages calls bytes')
+SendStats.__doc__ += ('\nCounters of the ``send-loop``. The number of'
+                      ' messages per system call is ``messages / calls``.')
+SendStats.messages.__doc__ = 'number of sent messages'
+SendStats.calls.__doc__ = 'number of send system calls'
+SendStats.bytes.__doc__ = 'number of sent bytes'
+
+RecvStats = namedtuple('RecvStats', 'messages calls bytes')
+RecvStats.__doc__ += ('\nCounters of the ``recv-loop``. The number of'
+                      ' messages per system call is ``messages / calls``.')
+RecvStats.messages.__doc__ = 'number of received messages'
+RecvStats.calls.__doc__ = 'number of recv system calls'
+RecvStats.bytes.__doc__ = 'number of received bytes'
+
+# unix fds are received before the header of their message can be read,
+# so the buffer for ancillary data must be big enough for any message
+MAX_RECV_UNIX_FDS = 1024  #: max. number of unix fds received at once
+
 
 def check_for_known_transport(addr):
     """Check whether there is a known transport for any address.
@@ -75,6 +107,12 @@ class Transport:
         self._router = router
         self._error = None
         self._lock = threading.Lock()
+        self._sent_messages = 0
+        self._send_calls = 0
+        self._sent_bytes = 0
+        self._recv_messages = 0
+        self._recv_calls = 0
+        self._recv_bytes = 0
 
     @property
     def error(self):
@@ -112,6 +150,17 @@ class Transport:
             self._sock.close()
             self._router.incoming(None)
 
+    def detach(self):
+        """Release the socket from this transport and return it.
+
+        The transport must not be used after that. This is used by
+        :class:`~dcar.aio.AsyncBus` which takes over an authenticated
+        connection.
+        """
+        with self._lock:
+            self.connected = False
+            return self._sock
+
     def authenticate(self):
         """Authenticate to message bus."""
         self.guid, self.unix_fds_enabled = authenticate(self._sock,
@@ -119,6 +168,7 @@ class Transport:
 
     def start_loops(self):
         """Start threads with ``recv-loop`` and ``send-loop``."""
+        self._router.out_queue.open()
         self._recv_loop = threading.Thread(target=self._recv_loop,
                                            name='recv-loop', daemon=True)
         self._recv_loop.start()
@@ -144,18 +194,47 @@ class Transport:
             if r > 0:
                 self._send_loop.join(r)
 
+    @property
+    def send_stats(self):
+        """Return the counters of the ``send-loop``.
+
+        :rtype: SendStats
+        """
+        return SendStats(self._sent_messages, self._send_calls,
+                         self._sent_bytes)
+
     def _send_loop(self):
+        queue = self._router.out_queue
+        max_size = self._router.send_batch_size
+        item = None
         while self.connected:
-            b, fds = self._router.out_queue.get()
+            if item is None:
+                item = queue.get()
+            b, fds = item
             if not b:
                 break
+            # Drain the queue: messages without unix fds are sent with
+            # one call; a message with unix fds is sent on its own.
+            batch = [b]
+            size = len(b)
+            item = None
+            if not (self.unix_fds_enabled and fds):
+                fds = None
+                while len(batch) < IOV_MAX:
+                    try:
+                        item = queue.get_nowait()
+                    except Empty:
+                        item = None
+                        break
+                    b, item_fds = item
+                    if (not b or self.unix_fds_enabled and item_fds or
+                            size + len(b) > max_size):
+                        break
+                    batch.append(b)
+                    size += len(b)
+                    item = None
             try:
-                if self.unix_fds_enabled and fds:
-                    self._sock.sendmsg([b], [(socket.SOL_SOCKET,
-                                              socket.SCM_RIGHTS,
-                                              array.array('i', fds))])
-                else:
-                    self._sock.sendall(b)
+                self._send_all(batch, fds)
             except Exception as ex:
                 _logger.debug('send loop', exc_info=True)
                 self._set_error(ex)
@@ -163,40 +242,47 @@ class Transport:
                 break
         _logger.debug('EXIT send loop')
 
+    def _send_all(self, bufs, fds=None):
+        if fds:
+            anc = [(socket.SOL_SOCKET, socket.SCM_RIGHTS,
+                    array.array('i', fds))]
+        else:
+            anc = []
+        self._sent_messages += len(bufs)
+        if not _HAS_SENDMSG:
+            data = bufs[0] if len(bufs) == 1 else b''.join(bufs)
+            self._sock.sendall(data)
+            self._send_calls += 1
+            self._sent_bytes += len(data)
+            return
+        views = [memoryview(b) for b in bufs]
+        i = 0
+        while i < len(views):
+            n = self._sock.sendmsg(views[i:], anc)
+            anc = []  # unix fds are sent with the first bytes
+            self._send_calls += 1
+            self._sent_bytes += n
+            while i < len(views) and n >= len(views[i]):
+                n -= len(views[i])
+                i += 1
+            if n:
+                views[i] = views[i][n:]
+
+    @property
+    def recv_stats(self):
+        """Return the counters of the ``recv-loop``.
+
+        :rtype: RecvStats
+        """
+        return RecvStats(self._recv_messages, self._recv_calls,
+                         self._recv_bytes)
+
     def _recv_loop(self):
         try:
-            while self.connected:
-                b = self._sock.recv(MIN_HEADER_SIZE, socket.MSG_PEEK)
-                if not b:
-                    raise TransportError()
-                total_size, fields_size = get_sizes(RawData(b))
-                if total_size > MAX_MESSAGE_LEN:
-                    raise TooLongError('message too long: %d bytes' %
-                                       total_size)
-                raw = RawData(bytearray(total_size))
-                view = raw.getbuffer()
-                if self.unix_fds_enabled:
-                    b = self._sock.recv(MIN_HEADER_SIZE + fields_size,
-                                        socket.MSG_PEEK)
-                    unix_fds_cnt = get_unix_fds_cnt(RawData(b))
-                else:
-                    unix_fds_cnt = 0
-                if unix_fds_cnt:
-                    fds = array.array('i')
-                    cnt, anc, _, _ = self._sock.recvmsg_into(
-                        [view], socket.CMSG_SPACE(unix_fds_cnt * fds.itemsize))
-                    for cmsg_level, cmsg_type, cmsg_data in anc:
-                        if (cmsg_level == socket.SOL_SOCKET and
-                                cmsg_type == socket.SCM_RIGHTS):
-                            fds.frombytes(cmsg_data[:len(cmsg_data) -
-                                          (len(cmsg_data) % fds.itemsize)])
-                    raw.unix_fds = fds.tolist()
-                else:
-                    cnt = self._sock.recv_into(view)
-                view.release()
-                if not cnt:
-                    raise TransportError()
-                self._router.incoming(Message.from_bytes(raw))
+            if self._router.recv_buffer_size:
+                self._recv_buffered(self._router.recv_buffer_size)
+            else:
+                self._recv_single()
         except Exception as ex:
             if self.connected:
                 _logger.debug('recv loop', exc_info=True)
@@ -204,6 +290,135 @@ class Transport:
                 self.disconnect()
         _logger.debug('EXIT recv loop')
 
+    def _recv_single(self):
+        while self.connected:
+            b = self._sock.recv(MIN_HEADER_SIZE, socket.MSG_PEEK)
+            if not b:
+                raise TransportError()
+            total_size, fields_size = get_sizes(RawReader(b))
+            if total_size > MAX_MESSAGE_LEN:
+                raise TooLongError('message too long: %d bytes' %
+                                   total_size)
+            buf = bytearray(total_size)
+            view = memoryview(buf)
+            if self.unix_fds_enabled:
+                b = self._sock.recv(MIN_HEADER_SIZE + fields_size,
+                                    socket.MSG_PEEK)
+                self._recv_calls += 1
+                unix_fds_cnt = get_unix_fds_cnt(RawReader(b))
+            else:
+                unix_fds_cnt = 0
+            if unix_fds_cnt:
+                fds = array.array('i')
+                cnt, anc, _, _ = self._sock.recvmsg_into(
+                    [view], socket.CMSG_SPACE(unix_fds_cnt * fds.itemsize))
+                _add_unix_fds(fds, anc)
+            else:
+                cnt = self._sock.recv_into(view)
+            self._recv_calls += 2
+            while cnt and cnt < total_size:  # large messages come in parts
+                n = self._sock.recv_into(view[cnt:])
+                if not n:
+                    break
+                cnt += n
+                self._recv_calls += 1
+            view.release()
+            if cnt < total_size:
+                raise TransportError()
+            self._recv_bytes += cnt
+            self._recv_messages += 1
+            raw = RawReader(buf)
+            raw.compact_arrays = self._router.compact_arrays
+            if unix_fds_cnt:
+                raw.unix_fds = fds.tolist()
+            self._router.incoming(Message.from_bytes(raw, lazy=True))
+
+    def _recv_buffered(self, size):
+        # Reads as many bytes as available into a reusable buffer and
+        # frames all complete messages in it. The messages are created
+        # from slices of the buffer without copying; the few that are
+        # still alive are detached (see Message.detach) before the buffer
+        # is reused. Unix fds are collected in
+        # the order they are received and assigned to the messages in
+        # the order of their UNIX_FDS header fields.
+        buf = bytearray(size)
+        view = memoryview(buf)
+        start = end = 0
+        fds = array.array('i')
+        dispatched = []  # weak references to messages that use buf
+        while self.connected:
+            avail = end - start
+            need = MIN_HEADER_SIZE
+            if avail >= MIN_HEADER_SIZE:
+                need, _ = get_sizes(
+                    RawReader(view[start:start + MIN_HEADER_SIZE]))
+                if need > MAX_MESSAGE_LEN:
+                    raise TooLongError('message too long: %d bytes' % need)
+                if avail >= need:
+                    dispatched.append(ref(self._dispatch(
+                        view[start:start + need], fds)))
+                    start += need
+                    continue
+            if need > size:  # read a large message into its own buffer
+                data = bytearray(need)
+                data[:avail] = view[start:end]
+                _detach(dispatched)
+                start = end = 0
+                with memoryview(data) as data_view:
+                    while avail < need:
+                        avail += self._recv_into(data_view[avail:], fds)
+                self._dispatch(data, fds)
+                continue
+            if need > size - start:  # move the partial message to the front
+                _detach(dispatched)
+                buf[:avail] = bytes(view[start:end])
+                start, end = 0, avail
+            end += self._recv_into(view[end:], fds)
+
+    def _recv_into(self, view, fds):
+        if self.unix_fds_enabled:
+            cnt, anc, flags, _ = self._sock.recvmsg_into(
+                [view], socket.CMSG_SPACE(MAX_RECV_UNIX_FDS * fds.itemsize))
+            if flags & socket.MSG_CTRUNC:
+                raise TransportError('too many unix fds')
+            _add_unix_fds(fds, anc)
+        else:
+            cnt = self._sock.recv_into(view)
+        if not cnt:
+            raise TransportError()
+        self._recv_calls += 1
+        self._recv_bytes += cnt
+        return cnt
+
+    def _dispatch(self, data, fds):
+        raw = RawReader(data)
+        raw.compact_arrays = self._router.compact_arrays
+        if fds:
+            unix_fds_cnt = get_unix_fds_cnt(RawReader(data))
+            if unix_fds_cnt:
+                raw.unix_fds = fds[:unix_fds_cnt].tolist()
+                del fds[:unix_fds_cnt]
+        self._recv_messages += 1
+        msg = Message.from_bytes(raw, lazy=True)
+        self._router.incoming(msg)
+        return msg
+
+
+def _detach(refs):
+    for msg_ref in refs:
+        msg = msg_ref()
+        if msg is not None:
+            msg.detach()
+    refs.clear()
+
+
+def _add_unix_fds(fds, anc):
+    for cmsg_level, cmsg_type, cmsg_data in anc:
+        if (cmsg_level == socket.SOL_SOCKET and
+                cmsg_type == socket.SCM_RIGHTS):
+            fds.frombytes(cmsg_data[:len(cmsg_data) -
+                          (len(cmsg_data) % fds.itemsize)])
+
 
 class UnixTransport(Transport):
     """Transport that uses a unix domain socket.
@@ -244,6 +459,44 @@ class NonceTcpTransport(TcpTransport):
             self._sock.sendall(fh.read())
 
 
+class ServerTransport(Transport):
+    """Transport for a connection that was accepted by a server.
+
+    The server side of the authentication is done by :meth:`authenticate`.
+    Unix file descriptors that were sent are closed.
+
+    :param socket sock: the accepted socket
+    :param router: router object
+    :param str guid: the GUID of the server
+    :param bool allow_anonymous: whether ANONYMOUS authentication is
+                                 accepted
+    """
+
+    def __init__(self, sock, router, guid, allow_anonymous=False):
+        super().__init__({}, router)
+        self.guid = guid
+        self.connected = True
+        self._sock = sock
+        self._allow_anonymous = allow_anonymous
+
+    def connect(self):
+        """Do nothing (the socket is already connected)."""
+
+    def authenticate(self):
+        """Authenticate the client."""
+        self.unix_fds_enabled = accept(self._sock, self.guid,
+                                       self._sock.family == socket.AF_UNIX,
+                                       self._allow_anonymous)
+
+    def _send_all(self, bufs, fds=None):
+        try:
+            super()._send_all(bufs, fds)
+        finally:
+            for fd in fds or ():
+                with suppress(OSError):
+                    os.close(fd)
+
+
 _transports = {
     'unix': UnixTransport,
     'tcp': TcpTransport,
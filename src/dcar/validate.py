@@ -56,7 +56,7 @@ def is_valid_object_path(s):
 
 def is_valid_signature(s):
     try:
-        Signature(s)
+        Signature.get(s)
         return True
     except SignatureError:
         return False
@@ -128,7 +128,7 @@ def validate_object_path(s):
 
 def validate_signature(s):
     try:
-        Signature(s)
+        Signature.get(s)
     except SignatureError as ex:
         raise ValidationError('not a valid signature: %r' % s) from ex
     return s
@@ -0,0 +1,31 @@
+import pytest
+
+from dcar import Bus
+from dcar.server import MessageBus
+
+
+@pytest.fixture
+def message_bus():
+    with MessageBus() as message_bus:
+        yield message_bus
+
+
+@pytest.fixture
+def connect(message_bus):
+    """Return a function that connects a new bus to the message bus."""
+    buses = []
+
+    def connect(**kwargs):
+        bus = Bus(message_bus.address, **kwargs)
+        bus.connect()
+        buses.append(bus)
+        return bus
+
+    yield connect
+    for bus in buses:
+        bus.disconnect()
+
+
+@pytest.fixture
+def bus(connect):
+    return connect()
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from dcar import AsyncBus, DBusError, MatchRule
+
+
+def test_method_call(message_bus, bus):
+    bus.register_method(
+        '/obj', 'org.example.Test', 'Add',
+        lambda bus, info: bus.method_return(info.serial, info.sender,
+                                            signature='u',
+                                            args=(sum(info.args),)),
+        'uu')
+
+    async def main():
+        async with AsyncBus(message_bus.address) as abus:
+            assert abus.unique_name
+            return await abus.method_call('/obj', 'org.example.Test', 'Add',
+                                          bus.unique_name, signature='uu',
+                                          args=(2, 3))
+
+    assert asyncio.run(main()) == (5,)
+
+
+def test_coroutine_handler(message_bus, bus):
+    async def add(abus, info):
+        await asyncio.sleep(0)
+        await abus.method_return(info.serial, info.sender, signature='u',
+                                 args=(sum(info.args),))
+
+    async def main():
+        async with AsyncBus(message_bus.address) as abus:
+            abus.register_method('/obj', 'org.example.Test', 'Add', add, 'uu')
+            loop = asyncio.get_running_loop()
+            # the threaded bus must not block the event loop
+            return await loop.run_in_executor(None, lambda: bus.method_call(
+                '/obj', 'org.example.Test', 'Add', abus.unique_name,
+                signature='uu', args=(2, 3)))
+
+    assert asyncio.run(main()) == (5,)
+
+
+def test_signal(message_bus, bus):
+    async def main():
+        async with AsyncBus(message_bus.address) as abus:
+            received = asyncio.get_running_loop().create_future()
+            await abus.register_signal(
+                MatchRule(interface='org.example.Test'),
+                lambda info: received.set_result(info.args))
+            bus.emit_signal('/obj', 'org.example.Test', 'S', signature='s',
+                            args=('x',))
+            return await asyncio.wait_for(received, 5)
+
+    assert asyncio.run(main()) == ('x',)
+
+
+def test_error_reply(message_bus):
+    async def main():
+        async with AsyncBus(message_bus.address) as abus:
+            await abus.method_call('/obj', 'org.example.Test', 'M',
+                                   abus.unique_name)
+
+    with pytest.raises(DBusError) as exc_info:
+        asyncio.run(main())
+    assert exc_info.value.args[0] == 'org.freedesktop.DBus.Error.UnknownMethod'
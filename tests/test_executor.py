@@ -0,0 +1,92 @@
+from concurrent.futures import wait
+from threading import Barrier, Event
+from time import sleep
+
+import pytest
+
+from dcar import DBusError, HandlerExecutor
+
+
+def _register(bus, path, handler):
+    def method(bus, info):
+        handler(info)
+        bus.method_return(info.serial, info.sender)
+
+    bus.register_method(path, 'org.example.Test', 'M', method)
+
+
+def _call(bus, destination, path, timeout=5):
+    return bus.method_call_async(path, 'org.example.Test', 'M', destination,
+                                 timeout=timeout)
+
+
+def test_ordering(connect):
+    service = connect(handler_executor=HandlerExecutor(max_workers=2,
+                                                       ordering='path'))
+    barrier = Barrier(2, timeout=5)
+    calls = []
+
+    def handler(info):
+        if info.path == '/a':
+            barrier.wait()  # only returns if /b runs concurrently
+        else:
+            calls.append(info.serial)
+            if len(calls) == 1:
+                barrier.wait()
+
+    _register(service, '/a', handler)
+    _register(service, '/b', handler)
+    client = connect()
+    futures = [_call(client, service.unique_name, path)
+               for path in ('/b', '/b', '/a', '/b')]
+    wait(futures, 10)
+    assert all(f.result() == () for f in futures)
+    assert calls == sorted(calls) and len(calls) == 3
+
+
+def test_max_queue(connect):
+    service = connect(handler_executor=HandlerExecutor(max_queue=1))
+    started = Event()
+    release = Event()
+
+    def handler(info):
+        started.set()
+        release.wait(5)
+
+    _register(service, '/a', handler)
+    client = connect()
+    first = _call(client, service.unique_name, '/a')
+    assert started.wait(5)
+    second = _call(client, service.unique_name, '/a')  # waiting
+    third = _call(client, service.unique_name, '/a')
+    with pytest.raises(DBusError) as exc_info:
+        third.result(5)
+    assert exc_info.value.args[0] == (
+        'org.freedesktop.DBus.Error.LimitsExceeded')
+    release.set()
+    assert first.result(5) == second.result(5) == ()
+
+
+def test_shared_executor_not_shut_down(connect):
+    executor = HandlerExecutor()
+    service = connect(handler_executor=executor)
+    other = connect(handler_executor=executor)
+    started = Event()
+    release = Event()
+
+    def handler(info):
+        started.set()
+        release.wait(5)
+
+    _register(service, '/a', handler)
+    client = connect()
+    first = _call(client, service.unique_name, '/a')
+    assert started.wait(5)
+    second = _call(client, service.unique_name, '/a')
+    for _ in range(100):
+        if executor.queued:
+            break
+        sleep(0.05)
+    other.disconnect()
+    release.set()
+    assert first.result(5) == second.result(5) == ()
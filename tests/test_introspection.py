@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+from dcar import Bus
+from dcar.introspection import Cache, Data
+
+NAME = 'org.example.Test'
+XML = '''<node>
+  <interface name="org.example.A">
+    <method name="M"><arg direction="in" type="s"/></method>
+    <property name="P" type="u" access="read"/>
+  </interface>
+  <interface name="org.example.%s">
+    <signal name="S"><arg type="s"/></signal>
+  </interface>
+</node>'''
+
+
+class Service:
+    """Connection that owns NAME and counts Introspect calls."""
+
+    def __init__(self, address, version='B'):
+        self.calls = 0
+        self.bus = Bus(address)
+        self.bus.connect()
+        self.bus.register_method('/obj', 'org.freedesktop.DBus.Introspectable',
+                                 'Introspect', self._introspect)
+        self.bus.request_name(NAME)
+        self.version = version
+
+    def _introspect(self, bus, info):
+        self.calls += 1
+        bus.method_return(info.serial, info.sender, signature='s',
+                          args=(XML % self.version,))
+
+
+@pytest.fixture
+def service(message_bus):
+    service = Service(message_bus.address)
+    yield service
+    service.bus.disconnect()
+
+
+def test_shared(bus, service):
+    cache = Cache()
+    first = Data(bus, NAME, '/obj', None, cache)
+    assert service.calls == 1
+    second = Data(bus, NAME, '/obj', None, cache,
+                  ['org.example.A', 'org.example.B'])
+    assert service.calls == 1
+    assert second['M'] is first['M']
+    assert second['org.example.A', 'P'].signature == 'u'
+    assert second['S'].interface == 'org.example.B'
+    # not all interfaces are in the cache
+    Data(bus, NAME, '/obj', None, cache, ['org.example.A', 'org.example.C'])
+    assert service.calls == 2
+
+
+def test_persistent(connect, service, tmp_path):
+    other = tmp_path / 'other.json'
+    other.write_text('{}')
+    interfaces = ['org.example.A', 'org.example.B']
+    Data(connect(), NAME, '/obj', None, Cache(tmp_path))
+    assert service.calls == 1
+    data = Data(connect(), NAME, '/obj', None, Cache(tmp_path), interfaces)
+    assert service.calls == 1
+    assert data['S'].signature == 's'
+    Cache(tmp_path).clear()
+    assert os.listdir(tmp_path) == ['other.json']
+    Data(connect(), NAME, '/obj', None, Cache(tmp_path), interfaces)
+    assert service.calls == 2
+
+
+def test_owner_changed(message_bus, connect, service, tmp_path):
+    cache = Cache(tmp_path)
+    interfaces = ['org.example.A', 'org.example.C']
+    Data(connect(), NAME, '/obj', None, cache)
+    service.bus.disconnect()
+    service = Service(message_bus.address, 'C')
+    try:
+        # the same connection does not look up the owner again
+        for cache in (Cache(tmp_path), cache):
+            data = Data(connect(), NAME, '/obj', None, cache, interfaces)
+            assert data['S'].interface == 'org.example.C'
+        assert service.calls == 1
+    finally:
+        service.bus.disconnect()
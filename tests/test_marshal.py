@@ -0,0 +1,65 @@
+from array import array
+
+import pytest
+
+from dcar.marshal import compile_signature, marshal, unmarshal
+from dcar.message import Byteorder
+from dcar.raw import RawReader, RawWriter
+
+# signature, data, unmarshalled data
+DATA = [
+    ('ybnqiuxtd', (255, True, -2, 3, -4, 5, -6, 7, 0.5), None),
+    ('sog', ('text', '/a/b', 'a{sv}'), None),
+    ('ayaiad', ([1, 2], [-1, 2], [0.25]), None),
+    ('a(ius)', ([(1, 2, 'x'), (3, 4, 'y')],), None),
+    ('a{sv}', ({'a': ('u', 1), 'b': ('as', ['x'])},),
+     ({'a': 1, 'b': ['x']},)),
+    ('ya{yv}', (1, {2: ('(sb)', ('s', False))}), (1, {2: ('s', False)})),
+]
+
+
+def _round_trip(signature, data, byteorder, compact_arrays=False):
+    raw = RawWriter()
+    raw.byteorder = byteorder
+    marshal(raw, data, signature)
+    raw = RawReader(raw.getbuffer())
+    raw.byteorder = byteorder
+    raw.compact_arrays = compact_arrays
+    return unmarshal(raw, signature)
+
+
+@pytest.mark.parametrize('byteorder', [Byteorder.LITTLE, Byteorder.BIG])
+@pytest.mark.parametrize('signature, data, expected', DATA)
+def test_round_trip(signature, data, expected, byteorder):
+    assert _round_trip(signature, data, byteorder) == (expected or data)
+
+
+def test_compact_arrays():
+    result = _round_trip('ayai', ([1, 2], [3, -4]), Byteorder.NATIVE, True)
+    assert result == (b'\x01\x02', array('i', [3, -4]))
+
+
+def test_codec_cache():
+    codec = compile_signature('a{sv}', '<')
+    assert compile_signature('a{sv}', '<', False) is codec
+    assert compile_signature('a{sv}', '<', 0) is codec
+    assert compile_signature('a{sv}', '<', True) is not codec
+    assert compile_signature('a{sv}', '>') is not codec
+
+
+def test_method_call(connect):
+    service = connect()
+    signature = 'a(ius)a{sv}ad'
+    service.register_method(
+        '/obj', 'org.example.Test', 'Echo',
+        lambda bus, info: bus.method_return(
+            info.serial, info.sender, signature=signature,
+            args=(info.args[0], {k: ('s', v) for k, v in info.args[1].items()},
+                  info.args[2])),
+        signature)
+    client = connect()
+    args = ([(1, 2, 'x')], {'a': ('s', 'b')}, [0.5, 1.5])
+    assert client.method_call('/obj', 'org.example.Test', 'Echo',
+                              service.unique_name, signature=signature,
+                              args=args) == (
+                                  [(1, 2, 'x')], {'a': 'b'}, [0.5, 1.5])
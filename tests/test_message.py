@@ -0,0 +1,12 @@
+from dcar.message import Message, method_call_message
+from dcar.raw import RawReader
+
+
+def test_unix_fds_placeholder_removed():
+    msg = method_call_message('/a', 'a.b', 'M', 'a.b', None, 'sah',
+                              ('x', []), False, False)
+    buf, unix_fds = msg.to_bytes()
+    assert unix_fds == []
+    msg = Message.from_bytes(RawReader(buf))
+    assert msg.body == ('x', [])
+    assert msg.unix_fds_cnt == 0
@@ -0,0 +1,76 @@
+import os
+from queue import Queue
+from time import sleep
+
+import pytest
+
+from dcar import DBusError, MatchRule, Peer, Server, TransportError, UnixFD
+
+
+def _echo(bus, info):
+    bus.method_return(info.serial, info.sender, signature='s',
+                      args=(info.args[0],))
+
+
+def _read(bus, info):
+    with open(info.args[0], 'rb') as fh:
+        data = fh.read()
+    bus.method_return(info.serial, info.sender, signature='ay', args=(data,))
+
+
+def _new_peer(peer):
+    peer.register_method('/obj', 'org.example.Test', 'Echo', _echo, 's')
+    peer.register_method('/obj', 'org.example.Test', 'Read', _read, 'h')
+
+
+def _wait_for(func):
+    for _ in range(100):
+        if func():
+            return True
+        sleep(0.05)
+    return False
+
+
+def test_method_call():
+    with Server(_new_peer) as server, Peer(server.address) as peer:
+        assert peer.unique_name is None
+        assert peer.guid == server.guid
+        assert peer.method_call('/obj', 'org.example.Test', 'Echo', None,
+                                signature='s', args=('x',)) == ('x',)
+        with pytest.raises(DBusError) as exc_info:
+            peer.method_call('/obj', 'org.example.Test', 'None', None)
+        assert exc_info.value.args[0] == (
+            'org.freedesktop.DBus.Error.UnknownMethod')
+
+
+def test_unix_fds():
+    with Server(_new_peer) as server, Peer(server.address) as peer:
+        assert peer.unix_fds_enabled
+        r, w = os.pipe()
+        os.write(w, b'data')
+        os.close(w)
+        try:
+            assert peer.method_call('/obj', 'org.example.Test', 'Read', None,
+                                    signature='h',
+                                    args=(UnixFD(r),)) == ([100, 97, 116, 97],)
+        finally:
+            os.close(r)
+
+
+def test_server_side():
+    with Server(_new_peer) as server, Peer(server.address) as peer:
+        peer.register_method('/obj', 'org.example.Test', 'Echo', _echo, 's')
+        signals = Queue()
+        peer.register_signal(MatchRule(interface='org.example.Test'),
+                             lambda info: signals.put(info.args))
+        assert _wait_for(lambda: server.peers)
+        server_peer, = server.peers
+        assert server_peer.method_call('/obj', 'org.example.Test', 'Echo',
+                                       None, signature='s',
+                                       args=('y',)) == ('y',)
+        server_peer.emit_signal('/obj', 'org.example.Test', 'S',
+                                signature='s', args=('z',))
+        assert signals.get(timeout=5) == ('z',)
+    assert not server.peers
+    with pytest.raises(TransportError):
+        server_peer.connect()
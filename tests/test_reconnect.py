@@ -0,0 +1,99 @@
+from queue import Queue
+from time import sleep
+
+import pytest
+
+from dcar import (Bus, DBusError, MatchRule, QueueFullError, ReconnectPolicy,
+                  TransportError)
+from dcar.server import MessageBus
+
+DBUS = ('/org/freedesktop/DBus', 'org.freedesktop.DBus')
+
+
+@pytest.fixture
+def address(tmp_path):
+    return 'unix:path=%s' % (tmp_path / 'bus')
+
+
+def _get_name_owner(bus, name):
+    return bus.method_call_async(*DBUS, 'GetNameOwner', DBUS[1],
+                                 signature='s', args=(name,), timeout=10)
+
+
+def _wait_for(func):
+    for _ in range(100):
+        if func():
+            return True
+        sleep(0.05)
+    return False
+
+
+def _lose_connection(message_bus, bus):
+    message_bus.stop()
+    assert _wait_for(lambda: bus.reconnecting)
+
+
+def test_session_restored(address):
+    message_bus = MessageBus(address)
+    message_bus.start()
+    bus = Bus(address, reconnect=ReconnectPolicy(initial_delay=0.05))
+    try:
+        bus.connect()
+        bus.request_name('org.example.Test')
+        signals = Queue()
+        bus.register_signal(MatchRule(interface='org.example.Test'),
+                            lambda info: signals.put(info.args))
+        _lose_connection(message_bus, bus)
+        held = _get_name_owner(bus, 'org.example.Test')
+        assert not held.done()
+        message_bus = MessageBus(address)
+        message_bus.start()
+        assert held.result(10) == (bus.unique_name,)
+        assert not bus.reconnecting
+        with Bus(address) as other:
+            other.emit_signal('/obj', 'org.example.Test', 'S', signature='s',
+                              args=('x',))
+            assert signals.get(timeout=5) == ('x',)
+    finally:
+        bus.disconnect()
+        message_bus.stop()
+
+
+def test_held_messages_limit(address):
+    message_bus = MessageBus(address)
+    message_bus.start()
+    policy = ReconnectPolicy(initial_delay=0.05, max_held_bytes=200)
+    bus = Bus(address, reconnect=policy)
+    try:
+        bus.connect()
+        _lose_connection(message_bus, bus)
+        held = _get_name_owner(bus, 'org.example.Test')
+        with pytest.raises(QueueFullError):
+            for _ in range(10):
+                _get_name_owner(bus, 'org.example.Test')
+        message_bus = MessageBus(address)
+        message_bus.start()
+        with pytest.raises(DBusError) as exc_info:
+            held.result(10)
+        assert exc_info.value.args[0] == (
+            'org.freedesktop.DBus.Error.NameHasNoOwner')
+    finally:
+        bus.disconnect()
+        message_bus.stop()
+
+
+def test_reconnect_failed(address):
+    message_bus = MessageBus(address)
+    message_bus.start()
+    policy = ReconnectPolicy(initial_delay=0.05, max_attempts=2)
+    bus = Bus(address, reconnect=policy)
+    try:
+        bus.connect()
+        _lose_connection(message_bus, bus)
+        held = _get_name_owner(bus, 'org.example.Test')
+        with pytest.raises(TransportError):
+            held.result(10)
+        assert _wait_for(lambda: not bus.reconnecting)
+        assert not bus.connected
+    finally:
+        bus.disconnect()
@@ -0,0 +1,158 @@
+from collections import Counter
+from time import sleep
+
+import pytest
+
+from dcar import (ObjectServer, RemoteObject, RemoteObjectManager,
+                  ServiceObject, dbus_property)
+
+NAME = 'org.example.Test'
+
+
+class Thing(ServiceObject):
+    interface = NAME
+
+    def __init__(self):
+        self.reads = Counter()
+        self._values = {'Value': 1, 'Label': 'a', 'Kind': 'thing', 'Raw': 0}
+
+    def _get(self, name):
+        self.reads[name] += 1
+        return self._values[name]
+
+    @dbus_property('u', access='readwrite')
+    def Value(self):
+        return self._get('Value')
+
+    @Value.setter
+    def Value(self, value):
+        self._values['Value'] = value
+
+    @dbus_property('s', emits_changed='invalidates')
+    def Label(self):
+        return self._get('Label')
+
+    @Label.setter
+    def Label(self, value):
+        self._values['Label'] = value
+
+    @dbus_property('s', emits_changed='const')
+    def Kind(self):
+        return self._get('Kind')
+
+    @dbus_property('u', emits_changed='false')
+    def Raw(self):
+        return self._get('Raw')
+
+
+def _wait_for(func):
+    for _ in range(100):
+        if func():
+            return True
+        sleep(0.05)
+    return False
+
+
+def _export(service):
+    thing = Thing()
+    ObjectServer(service).export('/obj', thing)
+    service.request_name(NAME)
+    return thing
+
+
+@pytest.fixture
+def service(connect):
+    return connect()
+
+
+@pytest.fixture
+def thing(service):
+    return _export(service)
+
+
+def test_property_cache(bus, thing):
+    def calls():
+        return bus.send_stats.messages - start
+
+    obj = RemoteObject(bus, NAME, '/obj', cache_properties=True)
+    assert obj.Value == 1  # GetAll
+    start = bus.send_stats.messages
+    assert (obj.Value, obj.Label, obj.Kind) == (1, 'a', 'thing')
+    assert calls() == 0
+    assert obj.Raw == obj.Raw == 0  # never cached
+    assert calls() == 2
+    thing.Value = 5  # PropertiesChanged with the value
+    assert _wait_for(lambda: obj.Value == 5)
+    assert calls() == 2
+    thing.Label = 'b'  # PropertiesChanged without the value
+    assert _wait_for(lambda: obj.Label == 'b')
+    assert obj.Label == 'b'
+    assert calls() == 3
+    obj.Value = 7  # Set
+    assert obj.Value == obj.Value == 7
+    obj.close()
+    thing.Value = 8
+    assert obj.Value == 8  # loaded again
+
+
+def test_no_property_cache(bus, thing):
+    obj = RemoteObject(bus, NAME, '/obj')
+    assert obj.Value == obj.Value == 1
+    assert obj.Kind == obj.Kind == 'thing'
+    assert thing.reads == {'Value': 2, 'Kind': 1}
+
+
+def test_owner_changed(connect, bus, service, thing):
+    obj = RemoteObject(bus, NAME, '/obj', cache_properties=True)
+    assert obj.Kind == 'thing'
+    assert obj.Value == 1
+    service.disconnect()
+    new_thing = _export(connect())
+    new_thing.Value = 2
+    assert _wait_for(lambda: obj.Value == 2)
+    assert obj.Kind == 'thing'
+
+
+def _export_many(service, paths):
+    server = ObjectServer(service, manager_path='/m')
+    things = {}
+    for path in paths:
+        things[path] = Thing()
+        server.export(path, things[path])
+    service.request_name(NAME)
+    return server, things
+
+
+def test_object_manager(bus, service):
+    server, things = _export_many(service, ['/m/a', '/m/b'])
+    manager = RemoteObjectManager(bus, NAME, '/m')
+    assert sorted(manager) == ['/m/a', '/m/b'] and len(manager) == 2
+    start = bus.send_stats.messages
+    assert manager['/m/a'].Value == manager['/m/b'].Value == 1
+    assert bus.send_stats.messages == start  # preloaded properties
+    assert (manager['/m/a']['org.example.Test', 'Value'] is
+            manager['/m/b']['org.example.Test', 'Value'])
+    things['/m/a'].Value = 3
+    assert _wait_for(lambda: manager['/m/a'].Value == 3)
+    server.export('/m/c', Thing())
+    assert _wait_for(lambda: '/m/c' in manager)
+    server.unexport('/m/a')
+    assert _wait_for(lambda: '/m/a' not in manager)
+    assert sorted(manager.objects) == ['/m/b', '/m/c']
+    manager.close()
+    server.export('/m/d', Thing())
+    sleep(0.2)
+    assert '/m/d' not in manager
+
+
+def test_object_manager_owner_changed(connect, bus, service):
+    _export_many(service, ['/m/a'])
+    manager = RemoteObjectManager(bus, NAME, '/m')
+    assert list(manager) == ['/m/a']
+    service.disconnect()
+    assert _wait_for(lambda: not manager)
+    _, things = _export_many(connect(), ['/m/b', '/m/c'])
+    things['/m/b'].Value = 2
+    assert _wait_for(lambda: len(manager) == 2)
+    assert sorted(manager) == ['/m/b', '/m/c']
+    assert manager['/m/b'].Value == 2
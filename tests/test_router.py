@@ -0,0 +1,160 @@
+from functools import partial
+from queue import Empty, Queue
+from threading import Thread
+
+import pytest
+
+from dcar import DBusError, MatchRule, QueueFullError, TransportError
+from dcar.router import OutQueue, OutQueueStats
+
+
+def _put(queue, item, info):
+    queue.put(item)
+
+
+def _receive(queue):
+    items = []
+    while True:
+        item = queue.get(timeout=5)
+        if item == 'done':
+            return items
+        items.append(item)
+
+
+def test_signal_dispatch(connect):
+    emitter = connect()
+    receiver = connect()
+    queue = Queue()
+    arg0 = MatchRule(interface='org.example.Test', signal_name='A')
+    arg0.add_arg(0, 'x')
+    rules = {
+        'interface': MatchRule(interface='org.example.Test'),
+        'member': MatchRule(signal_name='B'),
+        'path': MatchRule('/a', 'org.example.Test', 'A'),
+        'namespace': MatchRule(path_namespace='/b'),
+        'arg0': arg0,
+        'sender': MatchRule(sender=emitter.unique_name,
+                            interface='org.example.Other'),
+    }
+    for label, rule in rules.items():
+        receiver.register_signal(rule, partial(_put, queue, label))
+    receiver.register_signal(MatchRule(interface='org.example.Done'),
+                             lambda info: queue.put('done'))
+
+    def emit(path, interface, member, arg):
+        emitter.emit_signal(path, interface, member, signature='s',
+                            args=(arg,))
+        emitter.emit_signal('/', 'org.example.Done', 'Done')
+        return sorted(_receive(queue))
+
+    assert emit('/a', 'org.example.Test', 'A', 'x') == [
+        'arg0', 'interface', 'path']
+    assert emit('/b/c', 'org.example.Test', 'B', 'y') == [
+        'interface', 'member', 'namespace']
+    assert emit('/c', 'org.example.Other', 'C', 'x') == ['sender']
+    assert emit('/c', 'org.example.None', 'C', 'x') == []
+
+
+def test_unregister_signal(connect):
+    emitter = connect()
+    receiver = connect()
+    queue = Queue()
+    reg_id = receiver.register_signal(
+        MatchRule(interface='org.example.Test'), partial(_put, queue, 'x'))
+    receiver.register_signal(MatchRule(interface='org.example.Done'),
+                             lambda info: queue.put('done'))
+    emitter.emit_signal('/a', 'org.example.Test', 'A')
+    emitter.emit_signal('/', 'org.example.Done', 'Done')
+    assert len(_receive(queue)) == 1
+    receiver.unregister_signal(reg_id)
+    emitter.emit_signal('/a', 'org.example.Test', 'A')
+    emitter.emit_signal('/', 'org.example.Done', 'Done')
+    assert _receive(queue) == []
+
+
+def _reply(value):
+    def handler(bus, info):
+        bus.method_return(info.serial, info.sender, signature='s',
+                          args=(value,))
+    return handler
+
+
+def test_method_without_interface(connect):
+    service = connect()
+    first = service.register_method('/obj', 'org.example.A', 'M', _reply('a'))
+    service.register_method('/obj', 'org.example.B', 'M', _reply('b'))
+    service.register_method('/obj', 'org.example.B', 'N', _reply('n'), 's')
+    client = connect()
+
+    def call(interface, method_name='M', **kwargs):
+        try:
+            return client.method_call('/obj', interface, method_name,
+                                      service.unique_name, **kwargs)[0]
+        except DBusError as ex:
+            return ex.args[0].rpartition('.')[2]
+
+    assert call(None) == 'a'
+    assert call('org.example.B') == 'b'
+    assert call(None, 'N') == 'InvalidArgs'
+    assert call(None, 'N', signature='s', args=('x',)) == 'n'
+    service.unregister_method(first)
+    assert call(None) == 'b'
+    assert call('org.example.A') == 'UnknownMethod'
+
+
+def _item(n):
+    return bytes(n), []
+
+
+def test_out_queue_raise():
+    queue = OutQueue(10, 'raise')
+    queue.put(_item(6))
+    with pytest.raises(QueueFullError):
+        queue.put(_item(6))
+    assert queue.get() == _item(6)
+    queue.put(_item(20))  # accepted if the queue is empty
+    assert queue.stats == OutQueueStats(1, 20, 20, 0)
+
+
+def test_out_queue_drop_oldest():
+    queue = OutQueue(10, 'drop-oldest')
+    queue.put((b'a' * 4, []), droppable=True)
+    queue.put((b'b' * 4, []))
+    queue.put((b'c' * 4, []), droppable=True)
+    assert queue.stats.dropped == 1
+    queue.put((b'd' * 4, []), block=False)
+    assert queue.stats.dropped == 2
+    with pytest.raises(QueueFullError):  # nothing left to drop
+        queue.put(_item(4), block=False)
+    assert [queue.get_nowait()[0] for _ in range(2)] == [b'bbbb', b'dddd']
+    with pytest.raises(Empty):
+        queue.get_nowait()
+
+
+def test_out_queue_block():
+    queue = OutQueue(10)
+    queue.put(_item(6))
+    thread = Thread(target=queue.put, args=(_item(6),))
+    thread.start()
+    thread.join(0.1)
+    assert thread.is_alive()
+    assert queue.get() == _item(6)
+    thread.join(5)
+    assert queue.stats.messages == 1
+    queue.close()
+    assert queue.get() == (None, None)
+    with pytest.raises(TransportError):
+        queue.put(_item(1))
+
+
+def test_out_queue_bus(connect):
+    emitter = connect(out_queue_size=256)
+    receiver = connect()
+    queue = Queue()
+    receiver.register_signal(MatchRule(interface='org.example.Test'),
+                             lambda info: queue.put(info.args[0]))
+    for i in range(200):
+        emitter.emit_signal('/obj', 'org.example.Test', 'S', signature='u',
+                            args=(i,))
+    assert [queue.get(timeout=5) for _ in range(200)] == list(range(200))
+    assert 0 < emitter.out_queue_stats.peak_bytes <= 256
@@ -0,0 +1,59 @@
+from queue import Queue
+
+import pytest
+
+from dcar import DBusError, MatchRule
+
+DBUS = ('/org/freedesktop/DBus', 'org.freedesktop.DBus')
+
+
+def test_method_call_between_clients(connect):
+    service = connect()
+    service.request_name('org.example.Test')
+    service.register_method(
+        '/obj', 'org.example.Test', 'Add',
+        lambda bus, info: bus.method_return(info.serial, info.sender,
+                                            signature='u',
+                                            args=(sum(info.args),)),
+        'uu')
+    client = connect()
+    assert client.unique_name != service.unique_name
+    assert client.method_call('/obj', 'org.example.Test', 'Add',
+                              'org.example.Test', signature='uu',
+                              args=(2, 3)) == (5,)
+    assert client.method_call(*DBUS, 'GetNameOwner', DBUS[1], signature='s',
+                              args=('org.example.Test',)) == (
+                                  service.unique_name,)
+
+
+def test_unknown_destination(bus):
+    with pytest.raises(DBusError) as exc_info:
+        bus.method_call('/obj', 'org.example.Test', 'M', 'org.example.None')
+    assert exc_info.value.args[0] == 'org.freedesktop.DBus.Error.ServiceUnknown'
+
+
+def test_signal_broadcast(connect):
+    emitter = connect()
+    receiver = connect()
+    signals = Queue()
+    receiver.register_signal(MatchRule(interface='org.example.Test'),
+                             lambda info: signals.put(info.args))
+    emitter.emit_signal('/obj', 'org.example.Other', 'S', signature='s',
+                        args=('not matched',))
+    emitter.emit_signal('/obj', 'org.example.Test', 'S', signature='s',
+                        args=('matched',))
+    assert signals.get(timeout=5) == ('matched',)
+    assert signals.empty()
+
+
+def test_name_owner_changed_on_disconnect(connect):
+    service = connect()
+    service.request_name('org.example.Test')
+    watcher = connect()
+    changes = Queue()
+    rule = MatchRule(*DBUS, 'NameOwnerChanged', DBUS[1])
+    rule.add_arg(0, 'org.example.Test')
+    watcher.register_signal(rule, lambda info: changes.put(info.args))
+    owner = service.unique_name
+    service.disconnect()
+    assert changes.get(timeout=5) == ('org.example.Test', owner, '')
@@ -0,0 +1,175 @@
+import xml.etree.ElementTree as ET
+from queue import Queue
+
+import pytest
+
+from dcar import (DBusError, MatchRule, ObjectServer, RemoteObject,
+                  ServiceObject, dbus_method, dbus_property, dbus_signal)
+
+NAME = 'org.example.Test'
+PROPERTIES = 'org.freedesktop.DBus.Properties'
+ERROR = 'org.freedesktop.DBus.Error.'
+
+
+class Counter(ServiceObject):
+    interface = NAME
+
+    def __init__(self):
+        self._value = 0
+        self._any = ('s', 'x')
+
+    @dbus_method('u', 'u')
+    def Add(self, n):
+        self.Value = self._value + n
+        if self._value > 10:
+            self.Overflow(self._value)
+        return self._value
+
+    @dbus_method('', 'us')
+    def Both(self):
+        return self._value, 'text'
+
+    @dbus_method('s')
+    def Fail(self, kind):
+        if kind == 'dbus':
+            raise DBusError('org.example.Error.Custom', 'custom')
+        raise ValueError('bad')
+
+    @dbus_method('', 's', interface='org.example.Other')
+    def Hello(self):
+        return 'hello'
+
+    @dbus_signal('u')
+    def Overflow(self, value):
+        return value
+
+    @dbus_property('u', access='readwrite')
+    def Value(self):
+        return self._value
+
+    @Value.setter
+    def Value(self, value):
+        self._value = value
+
+    @dbus_property('v', access='readwrite')
+    def Any(self):
+        return self._any
+
+    @Any.setter
+    def Any(self, value):
+        self._any = value
+
+    @dbus_property('s', emits_changed='const')
+    def Kind(self):
+        return 'counter'
+
+
+@pytest.fixture
+def counter():
+    return Counter()
+
+
+@pytest.fixture
+def server(connect, counter):
+    service = connect()
+    service.request_name(NAME)
+    server = ObjectServer(service, manager_path='/m')
+    server.export('/m/c', counter)
+    return server
+
+
+def _call(bus, interface, method_name, signature=None, args=(), path='/m/c'):
+    try:
+        return bus.method_call(path, interface, method_name, NAME,
+                               signature=signature, args=args)
+    except DBusError as ex:
+        return ex.args[0]
+
+
+def test_methods(bus, server):
+    obj = RemoteObject(bus, NAME, '/m/c')
+    assert obj.Add(3) == 3
+    assert obj.Both() == (3, 'text')
+    assert obj.Hello() == 'hello'
+    assert _call(bus, None, 'Hello') == ('hello',)
+    assert _call(bus, NAME, 'Fail', 's', ('dbus',)) == (
+        'org.example.Error.Custom')
+    assert _call(bus, NAME, 'Fail', 's', ('py',)) == ERROR + 'Failed'
+    assert _call(bus, NAME, 'Add', 's', ('x',)) == ERROR + 'InvalidArgs'
+    assert _call(bus, NAME, 'None') == ERROR + 'UnknownMethod'
+    assert _call(bus, NAME, 'Both', path='/m/x') == ERROR + 'UnknownMethod'
+
+
+def test_signals(bus, server, counter):
+    signals = Queue()
+    bus.register_signal(MatchRule('/m/c'),
+                        lambda info: signals.put((info.member, info.args)))
+    obj = RemoteObject(bus, NAME, '/m/c')
+    obj.Add(11)
+    # the changes are emitted after the method call
+    assert signals.get(timeout=5) == ('Overflow', (11,))
+    assert signals.get(timeout=5) == ('PropertiesChanged',
+                                      (NAME, {'Value': 11}, []))
+    with server.batch():
+        counter.Value = 1
+        counter.Value = 2
+    assert signals.get(timeout=5) == ('PropertiesChanged',
+                                      (NAME, {'Value': 2}, []))
+
+
+def test_properties(bus, server):
+    obj = RemoteObject(bus, NAME, '/m/c')
+    obj.Value = 5
+    assert obj.Value == 5
+    assert obj.Kind == 'counter'
+    assert _call(bus, PROPERTIES, 'GetAll', 's', (NAME,)) == (
+        {'Value': 5, 'Any': 'x', 'Kind': 'counter'},)
+    assert _call(bus, PROPERTIES, 'GetAll', 's', ('org.example.None',)) == (
+        ERROR + 'UnknownInterface')
+    assert _call(bus, PROPERTIES, 'GetAll', 's', (PROPERTIES,)) == ({},)
+    assert _call(bus, PROPERTIES, 'Set', 'ssv',
+                 (NAME, 'Value', ('s', 'x'))) == ERROR + 'InvalidArgs'
+    assert _call(bus, PROPERTIES, 'Set', 'ssv',
+                 (NAME, 'Kind', ('s', 'x'))) == ERROR + 'PropertyReadOnly'
+    assert _call(bus, PROPERTIES, 'Get', 'ss',
+                 (NAME, 'None')) == ERROR + 'UnknownProperty'
+
+
+def test_variant_property(bus, server, counter):
+    assert _call(bus, PROPERTIES, 'Set', 'ssv',
+                 (NAME, 'Any', ('as', ['a', 'b']))) == ()
+    assert counter.Any == ('as', ['a', 'b'])
+    assert _call(bus, PROPERTIES, 'Get', 'ss', (NAME, 'Any')) == (
+        ['a', 'b'],)
+
+
+def test_introspect(bus, server):
+    xml = _call(bus, 'org.freedesktop.DBus.Introspectable', 'Introspect',
+                path='/')[0]
+    assert [node.get('name') for node in ET.fromstring(xml)
+            if node.tag == 'node'] == ['m']
+    xml = _call(bus, 'org.freedesktop.DBus.Introspectable', 'Introspect')[0]
+    assert sorted(node.get('name') for node in ET.fromstring(xml)
+                  if node.tag == 'interface') == [
+                      'org.example.Other', NAME,
+                      'org.freedesktop.DBus.Introspectable', PROPERTIES]
+
+
+def test_object_manager(bus, server):
+    objects = Queue()
+    bus.register_signal(
+        MatchRule('/m', 'org.freedesktop.DBus.ObjectManager'),
+        lambda info: objects.put((info.member, info.args[0])))
+
+    def managed_objects():
+        return sorted(_call(bus, 'org.freedesktop.DBus.ObjectManager',
+                            'GetManagedObjects', path='/m')[0])
+
+    assert managed_objects() == ['/m/c']
+    server.export('/m/d', Counter())
+    assert objects.get(timeout=5) == ('InterfacesAdded', '/m/d')
+    assert managed_objects() == ['/m/c', '/m/d']
+    server.unexport('/m/c')
+    assert objects.get(timeout=5) == ('InterfacesRemoved', '/m/c')
+    assert managed_objects() == ['/m/d']
+    assert _call(bus, NAME, 'Both') == ERROR + 'UnknownMethod'
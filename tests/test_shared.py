@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from dcar import Bus
+
+
+def test_shared(message_bus):
+    address = message_bus.address
+    with Bus.shared(address) as bus:
+        assert bus.connected
+        with Bus.shared(address) as other:
+            assert other is bus
+            assert bus.shared_users == 2
+        assert bus.connected and bus.shared_users == 1
+        with Bus.shared(address, compact_arrays=True) as other:
+            assert other is not bus
+    assert not bus.connected and not other.connected
+    with Bus.shared(address) as new:
+        assert new is not bus
+
+
+def test_pool(message_bus):
+    address = message_bus.address
+    buses = [Bus.shared(address, pool_size=2) for _ in range(4)]
+    try:
+        assert len(set(buses)) == 2
+        assert sorted(bus.shared_users for bus in set(buses)) == [2, 2]
+        buses[0].disconnect()
+        buses[0] = Bus.shared(address, pool_size=2)
+        assert buses[0] is buses[2]  # the bus with the fewest users
+    finally:
+        for bus in buses:
+            bus.disconnect()
+    assert not any(bus.connected for bus in buses)
+
+
+def test_concurrent_users(message_bus):
+    address = message_bus.address
+
+    def call(_):
+        with Bus.shared(address) as bus:
+            return bus, bus.method_call('/org/freedesktop/DBus',
+                                        'org.freedesktop.DBus', 'GetId',
+                                        'org.freedesktop.DBus')
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(call, range(32)))
+    assert all(reply == (message_bus.guid,) for _, reply in results)
+    assert not any(bus.connected for bus, _ in results)
+
+
+def test_invalid_pool_size(message_bus):
+    with pytest.raises(ValueError):
+        Bus.shared(message_bus.address, pool_size=0)
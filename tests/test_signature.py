@@ -0,0 +1,46 @@
+import pytest
+
+from dcar import SignatureError
+from dcar.signature import Signature
+
+
+def test_parse():
+    assert list(Signature('ua{sv}(i)')) == [
+        ('u', None),
+        ('a', (('e', (('s', None), ('v', ()))),)),
+        ('r', (('i', None),)),
+    ]
+
+
+@pytest.mark.parametrize('sig', ['a', '(i', 'a{vs}', 'x)', 'z', 'a' * 33 + 'i'])
+def test_invalid(sig):
+    with pytest.raises(SignatureError):
+        Signature.get(sig)
+
+
+def test_cache():
+    sig = Signature.get('a(ssu)')
+    hits = Signature.cache_info().hits
+    assert Signature.get('a(ssu)') is sig
+    assert Signature.cache_info().hits == hits + 1
+    assert Signature('a(ssu)') == sig
+    assert str(sig) == 'a(ssu)'
+
+
+def test_method_call(connect):
+    service = connect()
+    service.register_method(
+        '/obj', 'org.example.Test', 'Echo',
+        lambda bus, info: bus.method_return(info.serial, info.sender,
+                                            signature='a(ssu)',
+                                            args=info.args),
+        'a(ssu)')
+    client = connect()
+    Signature.get('a(ssu)')
+    hits = Signature.cache_info().hits
+    args = ([('a', 'b', 1)],)
+    for _ in range(3):
+        assert client.method_call('/obj', 'org.example.Test', 'Echo',
+                                  service.unique_name, signature='a(ssu)',
+                                  args=args) == args
+    assert Signature.cache_info().hits > hits
@@ -0,0 +1,64 @@
+from queue import Queue
+
+import pytest
+
+from dcar import Bus, MatchRule
+from dcar.const import MIN_HEADER_SIZE
+
+COUNT = 500
+
+
+def _signals(emitter, receiver, args):
+    queue = Queue()
+    receiver.register_signal(MatchRule(interface='org.example.Test'),
+                             lambda info: queue.put(info.args))
+    for arg in args:
+        emitter.emit_signal('/obj', 'org.example.Test', 'S', signature='s',
+                            args=(arg,))
+    return [queue.get(timeout=5) for _ in args]
+
+
+def test_batched_send(connect):
+    emitter = connect()
+    receiver = connect()
+    args = ['arg %d' % i for i in range(COUNT)]
+    messages, calls, _ = emitter.send_stats
+    assert _signals(emitter, receiver, args) == [(arg,) for arg in args]
+    stats = emitter.send_stats
+    assert stats.messages - messages == COUNT
+    assert stats.calls - calls < COUNT
+
+
+def test_small_send_batch(connect):
+    emitter = connect(send_batch_size=1)
+    receiver = connect()
+    args = ['arg %d' % i for i in range(10)]
+    messages, calls, _ = emitter.send_stats
+    assert _signals(emitter, receiver, args) == [(arg,) for arg in args]
+    stats = emitter.send_stats
+    assert stats.calls - calls == stats.messages - messages == 10
+
+
+def test_buffered_receive(connect):
+    emitter = connect()
+    receiver = connect()
+    args = ['arg %d' % i for i in range(COUNT)]
+    messages, calls, _ = receiver.recv_stats
+    assert _signals(emitter, receiver, args) == [(arg,) for arg in args]
+    stats = receiver.recv_stats
+    assert stats.messages - messages >= COUNT
+    assert stats.calls - calls < COUNT
+
+
+@pytest.mark.parametrize('recv_buffer_size', [0, MIN_HEADER_SIZE, 100, 1000])
+def test_receive_buffer_sizes(connect, recv_buffer_size):
+    # messages larger than the buffer and messages across its end
+    emitter = connect()
+    receiver = connect(recv_buffer_size=recv_buffer_size)
+    args = ['x' * (i * 37 % 300) for i in range(100)]
+    assert _signals(emitter, receiver, args) == [(arg,) for arg in args]
+
+
+def test_invalid_recv_buffer_size(message_bus):
+    with pytest.raises(ValueError):
+        Bus(message_bus.address, recv_buffer_size=MIN_HEADER_SIZE - 1)